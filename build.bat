@@ -14,6 +14,14 @@ if %errorlevel% neq 0 (
     pip install pyinstaller
 )
 
+rem 检查启动耗时，超出预算时停止构建
+python -m utils.startup_check
+if %errorlevel% neq 0 (
+    echo 启动耗时超出预算，构建已停止
+    pause
+    exit /b 1
+)
+
 rem 编译项目
 pyinstaller --onefile --distpath=dist/exe --add-data="core;core" --add-data="data;data" --add-data="ui;ui" --add-data="utils;utils" --add-data="data\ai_memory.json;data" --add-data="data\ideas.db;data" --add-data="config.json;." --hidden-import=requests  --noconsole main.py
 pause
@@ -1,19 +1,65 @@
-import openai
 from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
 import threading
 import time
 import json
 import os
+import re
 from datetime import datetime
-openai.api_base = "http://127.0.0.1:1234/v1"
+from core.llm_backend import LLMBackend, create_backend
+from core.llm_router import create_router, TASK_TAGS, TASK_SUMMARY, TASK_INSIGHTS, TASK_CHAT
+from core.llm_limiter import create_admission_controller, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from core.token_budget import create_token_budget
+from core.chunker import split_into_chunks, chunk_hash
+from core.conversation import ConversationMemory
+from core.answer_cache import AnswerCache, is_follow_up
+
+
 class AIProcessor:
-    def __init__(self, db_handler, openai_api_key: str = ""):
+    def __init__(self, db_handler, openai_api_key: str = "", backend: Optional[LLMBackend] = None,
+                 config: Optional[Dict] = None):
+        """
+        初始化AI处理器
+
+        Args:
+            db_handler: 数据库处理器实例
+            openai_api_key: API密钥
+            backend: LLM后端实例，为None时根据config创建
+            config: 配置字典，用于创建后端、模型池路由和读取模型名
+        """
+        config = config or {}
+        self.config = config
         self.db_handler = db_handler
-        self.openai_api_key = openai_api_key
+        self.openai_api_key = openai_api_key or config.get('openai_api_key', '')
         self.is_processing = False
         self.scheduled_task = None
+        self.analysis_listener = None
         self.memory_file = "data/ai_memory.json"
-        self.model="gpt-3.5-turbo"
+        self.model = config.get('ai_model', "gpt-3.5-turbo")
+        if backend is None:
+            backend = create_backend(dict(config, openai_api_key=self.openai_api_key))
+        self.backend = backend
+        self.router = create_router(self.config, self.backend, self.model)
+        # 所有LLM请求共享的准入控制器，交互对话优先于后台批量分析
+        self.admission = create_admission_controller(self.config)
+        # token用量记账和每日上限
+        self.budget = create_token_budget(self.db_handler, self.config)
+        # 长文本分块：每块的token上限和并行处理的线程数
+        self.chunk_tokens = config.get('chunk_tokens', 1500)
+        self.chunk_workers = config.get('chunk_workers', 3)
+        # 多轮对话上下文：最近几轮原样保留，更早的对话并入滚动摘要
+        self.conversation = ConversationMemory(
+            self.db_handler,
+            self._chat,
+            recent_turns=config.get('chat_recent_turns', 3),
+            context_tokens=config.get('chat_context_tokens', 2000)
+        )
+        # AI对话的回答缓存，想法或见解变化后失效
+        self.answer_cache = AnswerCache(
+            max_entries=config.get('answer_cache_size', 200),
+            threshold=config.get('answer_cache_similarity', 0.8),
+            min_chars=config.get('answer_cache_min_chars', 6)
+        )
         
         # 确保数据目录存在
         os.makedirs('data', exist_ok=True)
@@ -26,12 +72,84 @@ class AIProcessor:
                 "insights": [],
                 "reminders": []
             })
-    def update_config(self,api_key=None,model=None):
+    def update_config(self, api_key=None, model=None, backend: Optional[LLMBackend] = None,
+                      config: Optional[Dict] = None):
         #更新配置信息，于ui中调用并刷新
         if api_key is not None:
-            self.openai_api_key=api_key
+            self.openai_api_key = api_key
+            self.backend.update_credentials(api_key)
         if model is not None:
             self.model = model
+        if config is not None:
+            self.config = config
+            self.budget.update_caps(
+                daily_batch_cap=config.get('daily_token_cap', 0),
+                daily_chat_cap=config.get('daily_chat_token_cap', 0)
+            )
+            self.chunk_tokens = config.get('chunk_tokens', 1500)
+            self.chunk_workers = config.get('chunk_workers', 3)
+            self.conversation.update_settings(
+                recent_turns=config.get('chat_recent_turns', 3),
+                context_tokens=config.get('chat_context_tokens', 2000)
+            )
+            self.answer_cache.update_settings(
+                max_entries=config.get('answer_cache_size', 200),
+                threshold=config.get('answer_cache_similarity', 0.8),
+                min_chars=config.get('answer_cache_min_chars', 6)
+            )
+        # 模型或后端可能已经改变，之前的回答不再复用
+        self.answer_cache.clear()
+        old_backend = self.backend
+        if backend is not None:
+            self.backend = backend
+        # 重建模型池路由，使新的模型和端点配置生效
+        old_router = self.router
+        self.router = create_router(self.config, self.backend, self.model)
+        old_router.close(keep=self.backend)
+        if old_backend is not self.backend:
+            old_backend.close()
+
+    def _chat(self, task: str, messages: List[Dict], max_tokens: int, temperature: float) -> str:
+        """
+        通过模型路由发送一次对话请求
+
+        Args:
+            task: 任务类型，决定使用哪个模型池
+            messages: OpenAI格式的消息列表
+            max_tokens: 最大生成token数
+            temperature: 采样温度
+
+        Returns:
+            去除首尾空白后的回复文本
+
+        Raises:
+            BudgetExceededError: 当日对应类别的token预算已用尽
+        """
+        self.budget.check(task)
+        priority = PRIORITY_INTERACTIVE if task == TASK_CHAT else PRIORITY_BATCH
+        with self.admission.slot(priority):
+            result = self.router.chat(
+                task,
+                messages,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+        self.budget.record(task, messages, result)
+        return result["content"].strip()
+
+    def set_analysis_listener(self, listener):
+        """
+        设置分析结果监听器，某个想法的标签或摘要写入后以该想法的ID列表调用
+        
+        Args:
+            listener: 监听函数，在AI处理线程中调用
+        """
+        self.analysis_listener = listener
+
+    def get_token_usage(self, days: int = 1) -> List[Dict]:
+        """获取最近几天按任务类型汇总的token用量"""
+        return self.budget.usage_breakdown(days)
+
     def process_ideas(self):
         """处理所有想法，生成标签、摘要和关联"""
         if not self.openai_api_key:
@@ -44,20 +162,29 @@ class AIProcessor:
             
         self.is_processing = True
         try:
-            openai.api_key = self.openai_api_key
             ideas = self.db_handler.get_all_ideas()
             
             # 为没有标签的想法生成标签
             for idea in ideas:
+                if self.budget.batch_exhausted():
+                    print("今日批量分析的token预算已用尽，暂停AI处理")
+                    return
+                
+                updated = False
                 if not idea.get('tags'):
                     tags = self.generate_tags(idea['content'])
                     if tags:
                         self.db_handler.update_idea_tags(idea['id'], tags)
+                        updated = True
                 
                 if not idea.get('summary'):
                     summary = self.generate_summary(idea['content'])
                     if summary:
                         self.db_handler.update_idea_summary(idea['id'], summary)
+                        updated = True
+                
+                if updated and self.analysis_listener is not None:
+                    self.analysis_listener([idea['id']])
             
             # 生成整体摘要和见解
             self.generate_insights(ideas)
@@ -74,7 +201,7 @@ class AIProcessor:
 
     def generate_tags(self, idea: str) -> List[str]:
         """
-        生成想法的标签
+        生成想法的标签，长文本会分块生成标签后合并
         
         Args:
             idea: 想法内容
@@ -83,52 +210,81 @@ class AIProcessor:
             标签列表
         """
         try:
-            # 使用OpenAI API生成标签
-            response = openai.ChatCompletion.create(
-                #model="gpt-3.5-turbo",
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "你是一个标签生成助手。请为下面的内容生成3-5个关键标签，每个标签应该是单个词或短语，能够概括内容的主题或要点。返回格式应为JSON数组。"},
-                    {"role": "user", "content": idea}
-                ],
-                max_tokens=100,
-                temperature=0.3
-            )
+            chunks = split_into_chunks(idea, self.chunk_tokens)
+            if len(chunks) <= 1:
+                return self._generate_chunk_tags(idea)
             
-            # 解析回复
-            content = response.choices[0].message.content.strip()
-            # 尝试直接解析JSON
-            try:
-                tags = json.loads(content)
-                if isinstance(tags, list):
-                    return tags
-            except:
-                pass
-                
-            # 如果不是直接的JSON，尝试找到JSON数组的部分
-            import re
-            match = re.search(r'\[(.*?)\]', content.replace('\n', ' '), re.DOTALL)
-            if match:
-                try:
-                    tags = json.loads(f"[{match.group(1)}]")
-                    return tags
-                except:
-                    pass
-            
-            # 最后的备选方案，按逗号分割
-            if ',' in content:
-                return [tag.strip().strip('"\'') for tag in content.split(',')]
-                
-            # 如果都失败了，返回单个标签
-            return [content.strip().strip('"\'')]
+            # 分块生成标签，按出现次数合并，保留最常见的5个
+            counts = {}
+            for tags in self._map_chunks(TASK_TAGS, chunks, self._generate_chunk_tags_cached):
+                for tag in tags:
+                    key = tag.lower()
+                    if key not in counts:
+                        counts[key] = [tag, 0]
+                    counts[key][1] += 1
+            merged = sorted(counts.values(), key=lambda item: item[1], reverse=True)
+            return [tag for tag, _ in merged[:5]]
             
         except Exception as e:
             print(f"生成标签时出错: {e}")
             return []
 
+    def _generate_chunk_tags(self, text: str) -> List[str]:
+        """为一段文本生成标签"""
+        # 使用LLM后端生成标签
+        content = self._chat(
+            TASK_TAGS,
+            [
+                {"role": "system", "content": "你是一个标签生成助手。请为下面的内容生成3-5个关键标签，每个标签应该是单个词或短语，能够概括内容的主题或要点。返回格式应为JSON数组。"},
+                {"role": "user", "content": text}
+            ],
+            max_tokens=100,
+            temperature=0.3
+        )
+        
+        # 解析回复
+        # 尝试直接解析JSON
+        try:
+            tags = json.loads(content)
+            if isinstance(tags, list):
+                return tags
+        except:
+            pass
+            
+        # 如果不是直接的JSON，尝试找到JSON数组的部分
+        match = re.search(r'\[(.*?)\]', content.replace('\n', ' '), re.DOTALL)
+        if match:
+            try:
+                tags = json.loads(f"[{match.group(1)}]")
+                return tags
+            except:
+                pass
+        
+        # 最后的备选方案，按逗号分割
+        if ',' in content:
+            return [tag.strip().strip('"\'') for tag in content.split(',')]
+            
+        # 如果都失败了，返回单个标签
+        return [content.strip().strip('"\'')]
+
+    def _model_key(self, task: str) -> str:
+        """处理该任务的模型池及其中的模型，作为分块结果缓存键的一部分"""
+        pool = self.router.pool_for(task)
+        return f"{pool.name}:{','.join(sorted({endpoint.model for endpoint in pool.endpoints}))}"
+
+    def _generate_chunk_tags_cached(self, chunk: str) -> List[str]:
+        """为一个分块生成标签，结果按分块哈希缓存"""
+        key = chunk_hash(TASK_TAGS, chunk, self._model_key(TASK_TAGS))
+        cached = self.db_handler.get_chunk_result(key)
+        if cached is not None:
+            return json.loads(cached)
+        tags = self._generate_chunk_tags(chunk)
+        self.db_handler.store_chunk_result(key, TASK_TAGS, json.dumps(tags, ensure_ascii=False))
+        return tags
+
     def generate_summary(self, idea: str) -> str:
         """
-        生成想法的摘要
+        生成想法的摘要，长文本会先分块摘要再汇总（map-reduce）
         
         Args:
             idea: 想法内容
@@ -137,11 +293,16 @@ class AIProcessor:
             摘要内容
         """
         try:
-            # 使用OpenAI API生成摘要
-            response = openai.ChatCompletion.create(
-                #model="gpt-3.5-turbo",
-                model=self.model,
-                messages=[
+            chunks = split_into_chunks(idea, self.chunk_tokens)
+            if len(chunks) > 1:
+                # 先为每个分块生成要点，再对要点生成整体摘要
+                partials = self._map_chunks(TASK_SUMMARY, chunks, self._summarize_chunk_cached)
+                idea = "\n".join(f"{i + 1}. {partial}" for i, partial in enumerate(partials))
+            
+            # 使用LLM后端生成摘要
+            return self._chat(
+                TASK_SUMMARY,
+                [
                     {"role": "system", "content": "你是一个摘要生成助手。请为下面的内容生成一个简短的摘要，不超过30个字。"},
                     {"role": "user", "content": idea}
                 ],
@@ -149,13 +310,46 @@ class AIProcessor:
                 temperature=0.3
             )
             
-            # 返回摘要
-            return response.choices[0].message.content.strip()
-            
         except Exception as e:
             print(f"生成摘要时出错: {e}")
             return ""
 
+    def _summarize_chunk_cached(self, chunk: str) -> str:
+        """概括一个分块的要点，结果按分块哈希缓存"""
+        key = chunk_hash(TASK_SUMMARY, chunk, self._model_key(TASK_SUMMARY))
+        cached = self.db_handler.get_chunk_result(key)
+        if cached is not None:
+            return cached
+        partial = self._chat(
+            TASK_SUMMARY,
+            [
+                {"role": "system", "content": "你是一个摘要生成助手。下面是一篇长文中的一部分，请用不超过100个字概括这部分的要点。"},
+                {"role": "user", "content": chunk}
+            ],
+            max_tokens=200,
+            temperature=0.3
+        )
+        self.db_handler.store_chunk_result(key, TASK_SUMMARY, partial)
+        return partial
+
+    def _map_chunks(self, task: str, chunks: List[str], func) -> List:
+        """
+        并行处理多个分块，结果顺序与分块顺序一致
+
+        Args:
+            task: 任务类型，用于命名工作线程
+            chunks: 分块列表
+            func: 处理单个分块的函数
+
+        Returns:
+            各分块的处理结果
+        """
+        if self.chunk_workers <= 1:
+            return [func(chunk) for chunk in chunks]
+        with ThreadPoolExecutor(max_workers=min(self.chunk_workers, len(chunks)),
+                                thread_name_prefix=f"chunk-{task}") as executor:
+            return list(executor.map(func, chunks))
+
     def generate_insights(self, ideas: List[Dict]):
         """
         根据所有想法生成整体见解和提醒
@@ -181,11 +375,10 @@ class AIProcessor:
             # 加载现有记忆
             memory = self.load_memory()
             
-            # 使用OpenAI API生成见解
-            response = openai.ChatCompletion.create(
-                #model="gpt-3.5-turbo-16k",
-                model=self.model,
-                messages=[
+            # 使用LLM后端生成见解
+            content = self._chat(
+                TASK_INSIGHTS,
+                [
                     {"role": "system", "content": f"""你是一个智能想法分析助手。
 请根据用户的想法历史，生成有价值的见解和建议。这些见解应该能帮助用户发现隐藏的模式、主题和机会。
 你应当分析最近的想法趋势，识别重要主题，并提供相关的建议和提醒。
@@ -203,9 +396,6 @@ class AIProcessor:
                 temperature=0.7
             )
             
-            # 解析回复
-            content = response.choices[0].message.content.strip()
-            
             try:
                 # 尝试解析JSON
                 result = json.loads(content)
@@ -219,9 +409,9 @@ class AIProcessor:
                     for insight in result["insights"]:
                         insight["timestamp"] = datetime.now().isoformat()
                     
-                    # 合并见解，保留最近的10条
+                    # 合并见解，保留最近的若干条作为历史
                     memory["insights"] = result["insights"] + memory.get("insights", [])
-                    memory["insights"] = memory["insights"][:10]
+                    memory["insights"] = memory["insights"][:self.config.get('insight_history_limit', 500)]
                 
                 if "reminders" in result and isinstance(result["reminders"], list):
                     # 处理提醒
@@ -253,12 +443,16 @@ class AIProcessor:
         except Exception as e:
             print(f"生成见解时出错: {e}")
 
-    def query_ai(self, query: str) -> str:
+    def query_ai(self, query: str, before_id: Optional[int] = None) -> str:
         """
         向AI提问，关于用户的想法和见解
         
+        提示词包含之前的对话：最近几轮原样附上，更早的对话以滚动摘要的形式放入系统提示。
+        数据没有变化时，相同或相近的独立问题直接返回缓存的回答；依赖上文的追问还要求之前的对话相同。
+        
         Args:
             query: 用户的问题
+            before_id: 当前问题在对话记录中的消息ID，只有它之前的对话会作为上下文
             
         Returns:
             AI的回答
@@ -266,9 +460,17 @@ class AIProcessor:
         if not self.openai_api_key:
             return "OpenAI API密钥未设置，无法处理查询。"
         
+        # 数据版本在调用LLM之前读取，提问期间数据发生变化时回答不会被当作最新结果缓存
+        data_version = self.db_handler.get_change_version()
+        # 独立的问题只以问题和数据版本为键，每轮对话都会改变上下文，带上它就不会再命中；
+        # 依赖上文的追问的缓存键包含提示词中的对话上下文，不会命中其他对话中的回答
+        conversation = self.conversation.build_context(before_id)
+        cache_context = conversation["state"] if is_follow_up(query) else ()
+        cached = self.answer_cache.lookup(query, data_version, cache_context)
+        if cached is not None:
+            return cached
+        
         try:
-            openai.api_key = self.openai_api_key
-            
             # 获取记忆
             memory = self.load_memory()
             
@@ -290,29 +492,38 @@ class AIProcessor:
             for i, reminder in enumerate(upcoming_reminders[:3]):
                 context += f"{i+1}. {reminder.get('due_date', '无日期')}: {reminder.get('content', '无内容')}\n"
             
+            # 之前的对话
+            if conversation["summary"]:
+                context += f"\n之前对话的摘要:\n{conversation['summary']}\n"
+            
             # 查询AI
-            response = openai.ChatCompletion.create(
-                #model="gpt-3.5-turbo",
-                model=self.model,
-                messages=[
+            answer = self._chat(
+                TASK_CHAT,
+                [
                     {"role": "system", "content": f"""你是一个智能想法分析助手。
 你有关于用户想法历史的上下文知识，并且你的任务是回答用户关于他们想法的问题。
 基于以下上下文，以友好、有帮助的方式回答用户的问题。如果问题超出了你的上下文知识范围，请诚实说明。
 
 上下文信息:
 {context}"""},
+                    *conversation["messages"],
                     {"role": "user", "content": query}
                 ],
                 max_tokens=500,
                 temperature=0.7
             )
-            
-            return response.choices[0].message.content.strip()
+            self.answer_cache.store(query, data_version, answer, cache_context)
+            return answer
             
         except Exception as e:
             print(f"查询AI时出错: {e}")
             return f"处理查询时出错: {str(e)}"
 
+    def fold_conversation(self):
+        """在后台把较早的对话并入滚动摘要"""
+        if self.openai_api_key:
+            self.conversation.schedule_fold()
+
     def schedule_ai_task(self, interval: int):
         """
         设置定时任务，定期处理想法
@@ -351,6 +562,8 @@ class AIProcessor:
         try:
             with open(self.memory_file, 'w', encoding='utf-8') as f:
                 json.dump(memory, f, ensure_ascii=False, indent=4)
+            # 在变更日志中记录见解已更新，见解页面据此刷新
+            self.db_handler.log_change('insights_updated')
         except Exception as e:
             print(f"保存AI记忆时出错: {e}")
     
@@ -0,0 +1,162 @@
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Hashable, Optional, Set, Tuple
+
+
+# 规范化时去掉的字符：空白和标点（中英文）
+_STRIP_RE = re.compile(r'[\s\W_]+', re.UNICODE)
+# 否定词：否定词不同的两个问题即使字面很接近，意思也可能相反
+_NEGATION_RE = re.compile(r"不|没|无|未|别|非|否|n't\b|\b(?:not|no|never|none|nor|without|cannot)\b")
+# 指代上文的说法：含有这些说法的问题依赖之前的对话，缓存时需要区分对话上下文
+_REFERENCE_RE = re.compile(
+    r"它|他们|她们|这个|那个|这些|那些|这点|那点|这条|那条|这样|那样|上面|上述|上文|刚才|刚刚|前面|"
+    r"你说|你提到|第[一二三四五六七八九十\d]+[点条个项]|继续|展开|详细|再说|还有呢|然后呢|"
+    r"\b(?:it|its|they|them|these|those|above|previous|earlier|more|continue|elaborate|expand)\b"
+)
+# 规范化后少于该字符数的问题视为追问（如"为什么这么说"），缓存时需要区分对话上下文
+FOLLOW_UP_MAX_CHARS = 8
+
+
+def normalize_question(question: str) -> str:
+    """规范化问题文本：全角转半角、统一小写、去掉空白和标点"""
+    text = unicodedata.normalize('NFKC', question).lower()
+    return _STRIP_RE.sub('', text)
+
+
+def negation_signature(question: str) -> Tuple[str, ...]:
+    """问题中出现的否定词（排序后），用于防止把否定的问法当作同一个问题"""
+    text = unicodedata.normalize('NFKC', question).lower().replace("’", "'")
+    return tuple(sorted(_NEGATION_RE.findall(text)))
+
+
+def is_follow_up(question: str) -> bool:
+    """问题是否依赖之前的对话：很短，或含有指代上文的说法"""
+    if len(normalize_question(question)) < FOLLOW_UP_MAX_CHARS:
+        return True
+    text = unicodedata.normalize('NFKC', question).lower()
+    return _REFERENCE_RE.search(text) is not None
+
+
+def _bigrams(text: str) -> Set[str]:
+    """字符二元组集合，中文不需要分词即可比较相似度"""
+    if len(text) < 2:
+        return {text}
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    """两个二元组集合的Dice系数"""
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+class AnswerCache:
+    """
+    AI对话的回答缓存
+
+    以规范化后的问题、对话上下文和数据版本（变更日志版本号）为键，想法或见解发生任何变化后数据版本增加，
+    旧版本的缓存随之失效。独立的问题不带对话上下文，在之后的任何对话中再次提出都能命中；
+    依赖上文的追问（见is_follow_up，如"展开说说第二点"）由调用方传入对话上下文的标识，
+    在不同的对话中不会命中彼此的回答。
+    措辞略有不同的问题通过字符二元组相似度匹配，但否定词不同的问题不视为同一问题。
+    很短的问题多是依赖上文的追问（如"继续"、"为什么?"），不使用缓存。
+    """
+
+    def __init__(self, max_entries: int = 200, threshold: float = 0.8, min_chars: int = 6):
+        """
+        Args:
+            max_entries: 最多缓存的回答数
+            threshold: 视为同一问题的最低相似度，1表示只接受规范化后完全相同的问题
+            min_chars: 使用缓存的问题在规范化后的最少字符数
+        """
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.min_chars = min_chars
+        self._version = None
+        # (对话上下文, 规范化问题) -> (二元组集合, 否定词, 回答)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def update_settings(self, max_entries: int, threshold: float, min_chars: int):
+        with self._lock:
+            self.max_entries = max_entries
+            self.threshold = threshold
+            self.min_chars = min_chars
+
+    def _sync_version(self, version: int):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def lookup(self, question: str, version: int, context: Hashable = ()) -> Optional[str]:
+        """
+        查找缓存的回答
+
+        Args:
+            question: 用户的问题
+            version: 当前的数据版本
+            context: 提示词中对话上下文的标识，只匹配在相同上下文中缓存的回答
+
+        Returns:
+            缓存的回答，未命中时返回None
+        """
+        normalized = normalize_question(question)
+        if self.max_entries <= 0 or len(normalized) < self.min_chars:
+            return None
+
+        with self._lock:
+            self._sync_version(version)
+            key = (context, normalized)
+            entry = self._entries.get(key)
+            if entry is None and self.threshold < 1:
+                grams = _bigrams(normalized)
+                negations = negation_signature(question)
+                best_score = self.threshold
+                for candidate_key, candidate in self._entries.items():
+                    if candidate_key[0] != context or candidate[1] != negations:
+                        continue
+                    score = similarity(grams, candidate[0])
+                    if score >= best_score:
+                        best_score = score
+                        key, entry = candidate_key, candidate
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def store(self, question: str, version: int, answer: str, context: Hashable = ()):
+        """
+        缓存回答
+
+        Args:
+            question: 用户的问题
+            version: 提问时的数据版本（应在调用LLM之前读取，避免把过期回答记在新版本下）
+            answer: AI的回答
+            context: 提示词中对话上下文的标识，与lookup相同
+        """
+        normalized = normalize_question(question)
+        if self.max_entries <= 0 or len(normalized) < self.min_chars:
+            return
+
+        with self._lock:
+            # 提问期间数据已经变化，回答基于旧数据，不再缓存
+            if self._version is not None and version < self._version:
+                return
+            self._sync_version(version)
+            key = (context, normalized)
+            self._entries[key] = (_bigrams(normalized), negation_signature(question), answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,165 @@
+"""
+数据库的在线备份和定时轮换备份
+
+备份使用SQLite在线备份接口（DBHandler.backup_to），程序运行、正在写入时也能得到一致的副本，
+不要直接复制 data/ideas.db。
+
+命令行用法（在程序目录下运行，备份到配置的备份目录并轮换）：
+
+    python -m core.backup
+"""
+import datetime
+import glob
+import os
+import sys
+import threading
+import time
+from typing import Callable, List, Optional
+
+# 备份文件名的前缀和时间格式，按文件名排序即按时间排序
+BACKUP_PREFIX = "ideas-"
+BACKUP_TIME_FORMAT = "%Y%m%d-%H%M%S"
+# 默认备份目录和保留的备份数
+DEFAULT_BACKUP_DIR = "data/backups"
+DEFAULT_BACKUP_KEEP = 7
+# 程序启动后至少等待这么多秒再进行到期的定时备份，不与启动争用数据库
+STARTUP_DELAY = 60
+
+
+class BackupManager:
+    """
+    定时备份数据库，只保留最近的若干份
+
+    定时备份在后台线程中进行，间隔以最近一份备份文件的修改时间为准，
+    因此程序重启不会推迟到期的备份。
+    """
+
+    def __init__(self, db_handler, backup_dir: str = DEFAULT_BACKUP_DIR):
+        """
+        Args:
+            db_handler: 数据库处理器实例
+            backup_dir: 备份目录
+        """
+        self.db_handler = db_handler
+        self.backup_dir = backup_dir
+        self.keep = DEFAULT_BACKUP_KEEP
+        self.interval_hours = 0
+        self._backup_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def list_backups(self) -> List[str]:
+        """已有的备份文件，从旧到新"""
+        return sorted(glob.glob(os.path.join(self.backup_dir, f"{BACKUP_PREFIX}*.db")))
+
+    def backup_now(self, progress: Optional[Callable[[int, int], None]] = None) -> str:
+        """
+        立即备份并删除超出保留数的旧备份
+
+        Args:
+            progress: 备份进度回调，参数为(已复制页数, 总页数)
+
+        Returns:
+            备份文件路径
+        """
+        with self._backup_lock:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            name = f"{BACKUP_PREFIX}{datetime.datetime.now().strftime(BACKUP_TIME_FORMAT)}.db"
+            path = os.path.join(self.backup_dir, name)
+            self.db_handler.backup_to(path, progress)
+            self.rotate()
+            return path
+
+    def rotate(self):
+        """只保留最近的keep份备份"""
+        backups = self.list_backups()
+        for path in backups[:max(0, len(backups) - max(1, self.keep))]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"删除旧备份时出错: {e}")
+
+    def schedule(self, interval_hours: float, keep: int = DEFAULT_BACKUP_KEEP):
+        """
+        设置定时备份，可以重复调用以修改设置
+
+        Args:
+            interval_hours: 备份间隔（小时），0表示不定时备份
+            keep: 保留的备份数
+        """
+        self.interval_hours = interval_hours
+        self.keep = keep
+        self._wakeup.set()
+        if self._stopped.is_set():
+            return
+        if interval_hours > 0 and (self._thread is None or not self._thread.is_alive()):
+            self._thread = threading.Thread(target=self._run, name="backup", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """停止定时备份（关闭数据库前调用），正在进行的备份完成后才返回"""
+        self._stopped.set()
+        self._wakeup.set()
+        with self._backup_lock:
+            pass
+
+    def seconds_until_due(self) -> Optional[float]:
+        """距离下一次定时备份的秒数，不定时备份时返回None"""
+        if self.interval_hours <= 0:
+            return None
+        backups = self.list_backups()
+        if not backups:
+            return 0
+        try:
+            elapsed = time.time() - os.path.getmtime(backups[-1])
+        except OSError:
+            return 0
+        return max(0.0, self.interval_hours * 3600 - elapsed)
+
+    def _run(self):
+        if self._stopped.wait(STARTUP_DELAY):
+            return
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            wait = self.seconds_until_due()
+            if wait is None:
+                # 定时备份已关闭，等待重新设置
+                self._wakeup.wait()
+                continue
+            if wait > 0:
+                self._wakeup.wait(wait)
+                continue
+            if self._stopped.is_set():
+                return
+            try:
+                self.backup_now()
+            except Exception as e:
+                print(f"定时备份时出错: {e}")
+                # 出错后过一段时间再试，避免连续重试
+                self._wakeup.wait(min(3600, self.interval_hours * 3600))
+
+
+def main() -> int:
+    from core.db_handler import DBHandler
+    from utils.config_manager import ConfigManager
+
+    config = ConfigManager().read_config()
+    db_handler = DBHandler()
+    manager = BackupManager(db_handler, config.get('backup_dir', DEFAULT_BACKUP_DIR))
+    manager.keep = config.get('backup_keep', DEFAULT_BACKUP_KEEP)
+    try:
+        path = manager.backup_now(
+            lambda done, total: print(f"\r已备份 {done}/{total} 页", end="", flush=True)
+        )
+    except Exception as e:
+        print(f"备份失败: {e}")
+        return 1
+    finally:
+        db_handler.close()
+    print(f"\n已备份到 {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
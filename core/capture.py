@@ -0,0 +1,299 @@
+"""
+不启动界面的快速记录：正在运行的程序中的本地IPC服务和命令行客户端
+
+程序运行时在本地套接字（Windows为命名管道）上监听，命令行把想法发送给它，
+由程序放入写后队列，整个过程只需几毫秒，也不会出现第二个写数据库的进程。
+程序未运行时，命令行直接通过写后队列写入数据库。
+
+连接需要密钥认证，密钥由程序启动时生成并保存在 data/capture.key，只有能读取该文件的用户可以发送想法。
+同一数据目录只运行一个程序实例：再次启动程序时会通知已运行的实例显示主窗口，然后退出。
+
+命令行用法（在程序目录下运行，可以绑定到系统的全局快捷键）：
+
+    python -m core.capture "想法内容"
+    echo 想法内容 | python -m core.capture -
+    python -m core.capture --input      # 在正在运行的程序中打开想法输入窗口
+"""
+import argparse
+import hashlib
+import os
+import secrets
+import socket
+import sys
+import tempfile
+import threading
+from multiprocessing.connection import (
+    Client, Listener, AuthenticationError, answer_challenge, deliver_challenge
+)
+from typing import Callable, Dict, List, Optional
+
+# 认证密钥文件
+CAPTURE_KEY_FILE = "data/capture.key"
+# 等待对方发送请求或回复的秒数，也是服务端完成一次连接（认证和请求）的期限
+IPC_TIMEOUT = 5
+# 服务端同时处理的连接数上限
+MAX_CONNECTIONS = 8
+
+# 支持的命令
+CMD_CAPTURE = 'capture'
+CMD_SHOW = 'show'
+CMD_INPUT = 'input'
+
+
+def ipc_address(key_file: str = CAPTURE_KEY_FILE):
+    """
+    本地IPC地址，按数据目录区分，不同目录下的程序互不干扰
+
+    Returns:
+        (地址, 地址类型)
+    """
+    digest = hashlib.sha1(os.path.abspath(key_file).lower().encode('utf-8')).hexdigest()[:12]
+    if sys.platform == 'win32':
+        return rf"\\.\pipe\ideaSystemXS-{digest}", 'AF_PIPE'
+    return os.path.join(tempfile.gettempdir(), f"ideaSystemXS-{os.getuid()}-{digest}.sock"), 'AF_UNIX'
+
+
+def _read_key(key_file: str) -> Optional[bytes]:
+    try:
+        with open(key_file, 'rb') as f:
+            return f.read() or None
+    except OSError:
+        return None
+
+
+def _socket_alive(address: str) -> bool:
+    with socket.socket(socket.AF_UNIX) as sock:
+        try:
+            sock.connect(address)
+            return True
+        except OSError:
+            return False
+
+
+def _abort(conn):
+    """关闭连接的底层套接字，唤醒阻塞在读取上的线程（Windows命名管道不支持，只能等对方断开）"""
+    try:
+        sock = socket.socket(fileno=os.dup(conn.fileno()))
+    except (OSError, ValueError):
+        return
+    with sock:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def send_command(cmd: str, content: Optional[str] = None, key_file: str = CAPTURE_KEY_FILE) -> Dict:
+    """
+    把命令发送给正在运行的程序
+
+    Returns:
+        程序的回复，{'ok': 是否成功, 'error': 失败原因}
+
+    Raises:
+        ConnectionError: 程序未运行或无法连接
+    """
+    authkey = _read_key(key_file)
+    if authkey is None:
+        raise ConnectionError("程序未运行")
+    address, family = ipc_address(key_file)
+    try:
+        with Client(address, family, authkey=authkey) as conn:
+            conn.send({'cmd': cmd, 'content': content})
+            if not conn.poll(IPC_TIMEOUT):
+                raise ConnectionError("程序没有响应")
+            return conn.recv()
+    except (OSError, EOFError, AuthenticationError) as e:
+        # 没有监听的地址、残留的套接字文件或旧的密钥都说明程序没有在运行
+        raise ConnectionError(f"无法连接到程序: {e}") from e
+
+
+def instance_running(key_file: str = CAPTURE_KEY_FILE) -> bool:
+    """有正在运行的实例时请它显示主窗口并返回True"""
+    try:
+        return send_command(CMD_SHOW, key_file=key_file).get('ok', False)
+    except ConnectionError:
+        return False
+
+
+class CaptureServer:
+    """
+    在后台线程中接收命令行发送的想法和命令
+
+    监听线程只接受连接，认证和请求在每个连接各自的线程中处理，且必须在IPC_TIMEOUT秒内完成，
+    连上后不发送任何数据的客户端不会阻塞其他连接。
+    处理函数在连接线程中调用，必须很快返回；需要操作界面的处理函数应通过信号转到界面线程。
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[[Optional[str]], None]],
+                 key_file: str = CAPTURE_KEY_FILE):
+        """
+        Args:
+            handlers: 命令 -> 处理函数，参数为命令附带的内容
+            key_file: 认证密钥文件
+        """
+        self.handlers = handlers
+        self.key_file = key_file
+        self._listener = None
+        self._authkey = None
+        self._stopping = False
+        self._slots = threading.BoundedSemaphore(MAX_CONNECTIONS)
+
+    def start(self) -> bool:
+        """开始监听，失败时（例如已有实例在监听）返回False"""
+        address, family = ipc_address(self.key_file)
+        self._authkey = secrets.token_bytes(32)
+        try:
+            if family == 'AF_UNIX' and os.path.exists(address):
+                if _socket_alive(address):
+                    print("快速记录服务已由另一个实例运行")
+                    return False
+                # 上次异常退出留下的套接字文件
+                os.remove(address)
+            # 不在accept中认证（认证会阻塞监听线程），由连接线程认证
+            self._listener = Listener(address, family)
+            os.makedirs(os.path.dirname(self.key_file) or '.', exist_ok=True)
+            fd = os.open(self.key_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._authkey)
+        except OSError as e:
+            print(f"启动快速记录服务时出错: {e}")
+            if self._listener is not None:
+                self._listener.close()
+                self._listener = None
+            return False
+        threading.Thread(target=self._run, name="capture-server", daemon=True).start()
+        return True
+
+    def close(self):
+        """停止监听并删除密钥文件"""
+        if self._listener is None:
+            return
+        self._stopping = True
+        if _read_key(self.key_file) == self._authkey:
+            try:
+                os.remove(self.key_file)
+            except OSError:
+                pass
+        # 连接一次以唤醒阻塞在accept中的监听线程
+        try:
+            Client(self._listener.address).close()
+        except OSError:
+            pass
+        self._listener.close()
+        self._listener = None
+
+    def _run(self):
+        listener = self._listener
+        while not self._stopping:
+            try:
+                conn = listener.accept()
+            except OSError as e:
+                if self._stopping:
+                    return
+                print(f"快速记录连接出错: {e}")
+                continue
+            if self._stopping:
+                conn.close()
+                return
+            if not self._slots.acquire(blocking=False):
+                # 同时处理的连接过多，直接断开
+                conn.close()
+                continue
+            threading.Thread(target=self._serve, args=(conn,), name="capture-conn", daemon=True).start()
+
+    def _serve(self, conn):
+        """认证并处理一个连接，超过IPC_TIMEOUT秒时中断"""
+        deadline = threading.Timer(IPC_TIMEOUT, _abort, args=(conn,))
+        deadline.start()
+        try:
+            with conn:
+                try:
+                    deliver_challenge(conn, self._authkey)
+                    answer_challenge(conn, self._authkey)
+                    if conn.poll(IPC_TIMEOUT):
+                        conn.send(self._handle(conn.recv()))
+                finally:
+                    deadline.cancel()
+        except (ConnectionError, EOFError):
+            # 对方在完成前断开，例如其他实例检测套接字是否有效，或超时被中断
+            pass
+        except (OSError, AuthenticationError) as e:
+            if not self._stopping:
+                print(f"快速记录连接出错: {e}")
+        finally:
+            self._slots.release()
+
+    def _handle(self, request) -> Dict:
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': "无效的请求"}
+        handler = self.handlers.get(request.get('cmd'))
+        if handler is None:
+            return {'ok': False, 'error': f"不支持的命令: {request.get('cmd')}"}
+        try:
+            handler(request.get('content'))
+        except Exception as e:
+            print(f"处理快速记录命令时出错: {e}")
+            return {'ok': False, 'error': str(e)}
+        return {'ok': True}
+
+
+def append_directly(content: str) -> int:
+    """程序未运行时通过写后队列直接写入数据库，返回新想法的ID"""
+    from core.db_handler import DBHandler
+    from core.write_behind import WriteBehindQueue
+
+    db_handler = DBHandler()
+    written = []
+    try:
+        write_queue = WriteBehindQueue(db_handler)
+        write_queue.put(content, written.append)
+        write_queue.close()
+    finally:
+        db_handler.close()
+    if not written:
+        raise RuntimeError("写入数据库失败，想法已保存在 data/unsaved_ideas.jsonl 中，下次启动程序时写入")
+    return written[0]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m core.capture", description="快速记录想法")
+    parser.add_argument('content', nargs='*', help="想法内容，为 - 时从标准输入读取")
+    parser.add_argument('--input', action='store_true', help="在正在运行的程序中打开想法输入窗口")
+    args = parser.parse_args(argv)
+
+    if args.input:
+        try:
+            send_command(CMD_INPUT)
+        except ConnectionError as e:
+            print(e)
+            return 1
+        return 0
+
+    content = sys.stdin.read() if args.content == ['-'] else " ".join(args.content)
+    content = content.strip()
+    if not content:
+        parser.error("想法内容不能为空")
+
+    try:
+        reply = send_command(CMD_CAPTURE, content)
+    except ConnectionError:
+        reply = None
+    if reply is not None:
+        if not reply.get('ok'):
+            print(f"记录失败: {reply.get('error')}")
+            return 1
+        print("已记录")
+        return 0
+
+    try:
+        idea_id = append_directly(content)
+    except Exception as e:
+        print(f"记录失败: {e}")
+        return 1
+    print(f"程序未运行，已直接写入数据库（ID {idea_id}）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
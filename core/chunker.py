@@ -0,0 +1,84 @@
+import hashlib
+import re
+from typing import List
+
+from core.token_budget import estimate_tokens
+
+
+# 句子结束标点（中英文），切分后保留标点
+_SENTENCE_RE = re.compile(r'(?<=[。！？!?；;.\n])')
+# 段落分隔：一个或多个空行
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+
+
+def chunk_hash(task: str, chunk: str, model: str = "") -> str:
+    """
+    计算分块结果的缓存键，同一段文本在不同任务或由不同模型处理时结果不同
+
+    Args:
+        task: 任务类型
+        chunk: 分块文本
+        model: 处理该任务的模型标识（模型池及其中的模型），更换模型后旧结果不再命中
+    """
+    return hashlib.sha256(f"{task}\n{model}\n{chunk}".encode("utf-8")).hexdigest()
+
+
+def _split_oversized(text: str, max_tokens: int) -> List[str]:
+    """把超过上限的段落按句子切分，单句仍然超长时按字符硬切"""
+    pieces = []
+    for sentence in _SENTENCE_RE.split(text):
+        if not sentence:
+            continue
+        if estimate_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        # 估算每个字符约一个token，按字符数硬切
+        for start in range(0, len(sentence), max_tokens):
+            pieces.append(sentence[start:start + max_tokens])
+    return pieces
+
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """
+    按token上限把长文本切分成块
+
+    优先在段落边界切分，并把相邻的短段落合并到同一块中；单个段落超长时再按句子切分。
+    切分只依赖文本本身，因此修改某一段时，其他段落所在的块通常保持不变，可以命中缓存。
+
+    Args:
+        text: 文本内容
+        max_tokens: 每块的最大估算token数
+
+    Returns:
+        文本块列表，文本不超过上限时只有一块
+    """
+    text = text.strip()
+    if estimate_tokens(text) <= max_tokens:
+        return [text] if text else []
+
+    # 每个片段记录是否为段落开头，合并时段落之间用空行分隔，同一段落内的句子直接拼接
+    pieces = []
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append((paragraph, True))
+        else:
+            sentences = [p for p in _split_oversized(paragraph, max_tokens) if p.strip()]
+            pieces.extend((sentence, i == 0) for i, sentence in enumerate(sentences))
+
+    chunks = []
+    current = ""
+    current_tokens = 0
+    for piece, starts_paragraph in pieces:
+        tokens = estimate_tokens(piece)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(current.strip())
+            current = ""
+            current_tokens = 0
+        current += ("\n\n" if starts_paragraph and current else "") + piece
+        current_tokens += tokens
+    if current:
+        chunks.append(current.strip())
+    return chunks
@@ -0,0 +1,131 @@
+import importlib.util
+import re
+import threading
+import unicodedata
+
+# pypinyin是可选依赖，没有时中文按GBK编码排序。导入它（含词典）需要两三百毫秒，
+# 因此启动时只检查是否安装，第一次需要汉字的拼音时才导入（或由preload在后台预先导入）
+HAS_PINYIN = importlib.util.find_spec('pypinyin') is not None
+_pinyin_func = None
+_pinyin_lock = threading.Lock()
+
+
+# 排序键只取内容的前若干个字符，足以区分绝大多数想法，也让索引保持紧凑
+SORT_KEY_CHARS = 32
+
+# 排序键的生成方式，变化时数据库中已有的排序键需要重新生成
+SORT_KEY_VERSION = f"1-{'pinyin' if HAS_PINYIN else 'gbk'}"
+
+# 连续的中日韩文字，或连续的字母数字（标点和空白不参与排序）
+_CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+_TOKEN_RE = re.compile(f'([{_CJK_CHARS}]+)|[^\\W_]+')
+
+# 排序键只需规范化内容开头的这些字符；标点和空白很多、不够SORT_KEY_CHARS个字符时再处理全文
+SORT_KEY_PREFIX = SORT_KEY_CHARS * 4
+
+# 汉字的码位 -> 拼音，逐字缓存（按词组注音的速度慢几十倍，不适合在写入和批量回填时使用），
+# 整段汉字用str.translate一次替换；_pinyin_known为已缓存的汉字
+_pinyin_table = {}
+_pinyin_known = set()
+
+# 没有pypinyin时，GBK编码的汉字映射到补充私用区，排在所有字母和数字之后
+_GBK_BASE = 0xF0000
+
+
+def _gbk_key(run: str) -> str:
+    """GBK一级汉字按拼音排列，把编码映射为保持相同顺序的字符"""
+    chars = []
+    for ch in run:
+        try:
+            encoded = ch.encode('gbk')
+        except UnicodeEncodeError:
+            chars.append(ch)
+            continue
+        if len(encoded) == 2:
+            chars.append(chr(_GBK_BASE + (encoded[0] << 8 | encoded[1])))
+        else:
+            chars.append(ch)
+    return ''.join(chars)
+
+
+def preload():
+    """
+    导入pypinyin，在后台线程中调用可以避免第一次写入时等待导入
+
+    Returns:
+        逐字注音的函数，没有安装pypinyin时返回None
+    """
+    global _pinyin_func
+    if not HAS_PINYIN:
+        return None
+    with _pinyin_lock:
+        if _pinyin_func is None:
+            from pypinyin import Style, lazy_pinyin
+
+            def pinyin(ch: str) -> str:
+                return lazy_pinyin(ch, style=Style.TONE3, neutral_tone_with_five=True)[0]
+
+            _pinyin_func = pinyin
+    return _pinyin_func
+
+
+def _pinyin_key(run: str) -> str:
+    if not _pinyin_known.issuperset(run):
+        pinyin = _pinyin_func or preload()
+        for ch in set(run).difference(_pinyin_known):
+            _pinyin_table[ord(ch)] = pinyin(ch)
+            _pinyin_known.add(ch)
+    return run.translate(_pinyin_table)
+
+
+def _latin_key(token: str) -> str:
+    """去掉变音符号，使"Å"与"a"排在一起"""
+    if token.isascii():
+        return token
+    decomposed = unicodedata.normalize('NFKD', token)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def sort_key(text: str) -> str:
+    """
+    生成按关键词排序使用的排序键
+
+    拉丁字母统一为小写（casefold）并去掉变音符号，汉字逐字转为带声调数字的拼音
+    （如"苹果"为"ping2guo3"，多音字取最常用的读音），因此中英文混排时按拼音和字母的顺序排列；
+    没有安装pypinyin时汉字按GBK编码排在字母之后（常用汉字在GBK中按拼音排列）。
+    标点和空白不参与排序，只取前SORT_KEY_CHARS个字符。
+
+    Args:
+        text: 想法内容
+
+    Returns:
+        排序键，按二进制顺序比较即为期望的顺序
+    """
+    text = text or ''
+    if len(text) > SORT_KEY_PREFIX:
+        key = _sort_key(text[:SORT_KEY_PREFIX], True)
+        if key is not None:
+            return key
+    return _sort_key(text, False)
+
+
+def _sort_key(text: str, is_prefix: bool):
+    """生成text的排序键；is_prefix为True时text只是内容的开头，不足以确定排序键时返回None"""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    parts = []
+    remaining = SORT_KEY_CHARS
+    end = len(text)
+    for match in _TOKEN_RE.finditer(text):
+        # 截断处的词语可能在全文中更长，或与后面的字符组合成不同的规范化结果
+        if is_prefix and match.end() >= end - 1 and len(match.group(0)) <= remaining:
+            return None
+        token = match.group(0)[:remaining]
+        remaining -= len(token)
+        if match.lastindex:
+            token = _pinyin_key(token) if HAS_PINYIN else _gbk_key(token)
+        else:
+            token = _latin_key(token)
+        parts.append(token)
+        if remaining <= 0:
+            return ' '.join(parts)
+    return None if is_prefix else ' '.join(parts)
@@ -0,0 +1,139 @@
+import threading
+from typing import Callable, Dict, Optional
+
+from core.llm_router import TASK_SUMMARY
+from core.token_budget import estimate_tokens
+
+
+# 滚动摘要中单条消息最多保留的字符数，避免一条超长回复撑大摘要提示词
+FOLD_MESSAGE_CHARS = 1000
+# 每次并入摘要的最多消息数
+FOLD_BATCH_SIZE = 20
+
+
+class ConversationMemory:
+    """
+    多轮对话的上下文管理
+
+    最近几轮对话原样放入提示词，更早的对话由后台线程增量并入一份滚动摘要，
+    摘要按覆盖到的消息ID保存在数据库中。提问时只读取已有的摘要，不会同步等待摘要生成，
+    因此提示词大小和首个token的等待时间都不随对话长度增长。
+    """
+
+    def __init__(self, db_handler, chat_func: Callable[..., str],
+                 recent_turns: int = 3, context_tokens: int = 2000):
+        """
+        Args:
+            db_handler: 数据库处理器实例
+            chat_func: 发送LLM请求的函数，参数与AIProcessor._chat相同
+            recent_turns: 原样保留的最近对话轮数（一问一答为一轮）
+            context_tokens: 原样保留的对话最多占用的token数
+        """
+        self.db_handler = db_handler
+        self.chat_func = chat_func
+        self.recent_turns = recent_turns
+        self.context_tokens = context_tokens
+        self._fold_lock = threading.Lock()
+        self._fold_pending = False
+
+    def update_settings(self, recent_turns: int, context_tokens: int):
+        self.recent_turns = recent_turns
+        self.context_tokens = context_tokens
+
+    @property
+    def recent_messages(self) -> int:
+        return max(0, self.recent_turns * 2)
+
+    def build_context(self, before_id: Optional[int] = None) -> Dict:
+        """
+        组装某个问题之前的对话上下文
+
+        Args:
+            before_id: 当前问题消息的ID，只使用它之前的对话；为None时使用全部对话
+
+        Returns:
+            {'summary': 更早对话的摘要（可能为空）, 'messages': 原样保留的消息列表,
+             'state': 上下文的标识（摘要覆盖到的消息ID和原样保留的消息ID），追问的回答缓存键包含该标识}
+        """
+        stored = self.db_handler.get_chat_summary()
+        upto_id, summary = stored if stored else (None, "")
+        if upto_id is not None and before_id is not None and upto_id >= before_id:
+            # 摘要已经覆盖了当前问题之后的对话（例如重新回答旧问题），不使用摘要
+            upto_id, summary = None, ""
+
+        # 摘要尚未覆盖的消息中取最新的几条，后台摘要稍有滞后时多出的部分直接丢弃
+        rows = self.db_handler.get_chat_messages(
+            before_id=before_id, limit=self.recent_messages, after_id=upto_id
+        )
+
+        messages = []
+        message_ids = []
+        used = 0
+        for message_id, role, content, _ in reversed(rows):
+            tokens = estimate_tokens(content)
+            if messages and used + tokens > self.context_tokens:
+                break
+            messages.append({"role": role, "content": content})
+            message_ids.append(message_id)
+            used += tokens
+        messages.reverse()
+        message_ids.reverse()
+        return {
+            "summary": summary,
+            "messages": messages,
+            "state": (upto_id if summary else None, tuple(message_ids)),
+        }
+
+    def schedule_fold(self):
+        """在后台把超出最近几轮的对话并入滚动摘要，已有任务排队时不重复提交"""
+        with self._fold_lock:
+            if self._fold_pending:
+                return
+            self._fold_pending = True
+        threading.Thread(target=self._fold, name="chat-summary", daemon=True).start()
+
+    def _fold(self):
+        try:
+            while self._fold_batch():
+                pass
+        except Exception as e:
+            print(f"更新对话摘要时出错: {e}")
+        finally:
+            with self._fold_lock:
+                self._fold_pending = False
+
+    def _fold_batch(self) -> bool:
+        """把一批尚未并入摘要的旧消息并入摘要，没有需要并入的消息时返回False"""
+        recent = self.db_handler.get_chat_messages(limit=self.recent_messages + 1)
+        if len(recent) <= self.recent_messages:
+            return False
+        # recent[0]之后的消息原样保留，摘要只需覆盖到recent[0]（含）
+        boundary_id = recent[0][0]
+
+        stored = self.db_handler.get_chat_summary()
+        upto_id, summary = stored if stored else (None, "")
+        if upto_id is not None and upto_id >= boundary_id:
+            return False
+
+        rows = self.db_handler.get_chat_messages(
+            before_id=boundary_id + 1, limit=FOLD_BATCH_SIZE, after_id=upto_id, oldest_first=True
+        )
+        if not rows:
+            return False
+
+        transcript = "\n".join(
+            f"{'用户' if role == 'user' else 'AI'}: {content[:FOLD_MESSAGE_CHARS]}"
+            for _, role, content, _ in rows
+        )
+        new_summary = self.chat_func(
+            TASK_SUMMARY,
+            [
+                {"role": "system", "content": "你是一个对话摘要助手。请把新的对话内容并入已有的对话摘要，"
+                                              "保留用户关心的问题、AI给出的结论和尚未解决的事项，不超过300个字。"},
+                {"role": "user", "content": f"已有摘要:\n{summary or '无'}\n\n新的对话:\n{transcript}"}
+            ],
+            max_tokens=500,
+            temperature=0.3
+        )
+        self.db_handler.store_chat_summary(rows[-1][0], new_summary)
+        return True
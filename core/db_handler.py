@@ -1,8 +1,210 @@
 import sqlite3
 import datetime
 import json
-from typing import List, Dict, Tuple, Optional
+import threading
+import time
+import zlib
+from typing import List, Dict, Tuple, Optional, Iterator, Callable
 import os
+from core.collation import sort_key, SORT_KEY_VERSION
+from core.search_query import (
+    parse_query, compile_predicates, plan_clauses, build_where, fts_match_expression,
+    HIGHLIGHT_START, HIGHLIGHT_END, CONTENT_SQL
+)
+
+
+# 数据库文件中保存的触发器只使用SQLite内置函数，sqlite3命令行、外部工具和其他进程
+# 不注册idea_text也能照常读写ideas表。需要解压内容的维护（全文索引、改变编码的内容修改）
+# 由每个DBHandler连接创建的临时触发器完成，见CONNECTION_TRIGGERS。
+
+# 变更日志触发器，kind 与 IdeaManager 中的变更类型一致
+CHANGE_LOG_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_ideas_insert AFTER INSERT ON ideas
+    BEGIN
+        INSERT INTO change_log (idea_id, kind) VALUES (NEW.id, 'inserted');
+    END
+    ''',
+    # 编码不变时比较保存的值即可；编码改变（重新压缩或修改后跨过压缩阈值）由临时触发器比较解压后的文本
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_ideas_content AFTER UPDATE OF content ON ideas
+    WHEN NEW.codec IS OLD.codec AND NEW.content IS NOT OLD.content
+    BEGIN
+        INSERT INTO change_log (idea_id, kind) VALUES (NEW.id, 'content_updated');
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_ideas_analysis AFTER UPDATE OF tags, summary ON ideas
+    WHEN NEW.tags IS NOT OLD.tags OR NEW.summary IS NOT OLD.summary
+    BEGIN
+        INSERT INTO change_log (idea_id, kind) VALUES (NEW.id, 'analysis_updated');
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_ideas_delete AFTER DELETE ON ideas
+    BEGIN
+        INSERT INTO change_log (idea_id, kind) VALUES (OLD.id, 'deleted');
+    END
+    '''
+]
+
+# ideas表上的普通索引，大批量导入时先删除、导入完成后重建，比逐行维护快
+IDEA_INDEXES = {
+    'idx_ideas_timestamp': "CREATE INDEX IF NOT EXISTS idx_ideas_timestamp ON ideas (timestamp)",
+    'idx_ideas_sort_key': "CREATE INDEX IF NOT EXISTS idx_ideas_sort_key ON ideas (sort_key, id)",
+}
+
+# 变更日志最多保留的条数，更早的记录在启动时清理
+CHANGE_LOG_RETENTION = 50000
+# 分块结果缓存最多保留的条数，超出时淘汰最久未使用的结果
+CHUNK_CACHE_MAX = 5000
+
+# 标签索引表的维护触发器，标签以JSON数组保存在ideas.tags中
+IDEA_TAGS_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_idea_tags_insert AFTER INSERT ON ideas
+    WHEN json_valid(NEW.tags)
+    BEGIN
+        INSERT INTO idea_tags (idea_id, tag) SELECT NEW.id, value FROM json_each(NEW.tags);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_idea_tags_update AFTER UPDATE OF tags ON ideas
+    WHEN NEW.tags IS NOT OLD.tags
+    BEGIN
+        DELETE FROM idea_tags WHERE idea_id = OLD.id;
+        INSERT INTO idea_tags (idea_id, tag)
+            SELECT NEW.id, value FROM json_each(CASE WHEN json_valid(NEW.tags) THEN NEW.tags ELSE '[]' END);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_idea_tags_delete AFTER DELETE ON ideas
+    BEGIN
+        DELETE FROM idea_tags WHERE idea_id = OLD.id;
+    END
+    '''
+]
+
+# 列表中显示的内容预览的最大字符数
+PREVIEW_CHARS = 100
+# 想法列表查询的列：(时间戳, 内容预览, ID, 标签文本, 摘要, 显示时间, 排序键)
+LIST_COLUMNS = "timestamp, preview, id, tags_display, summary, display_time, sort_key"
+
+# 插入想法的语句，参数由DBHandler._insert_values生成
+INSERT_IDEA_SQL = (
+    "INSERT INTO ideas (content, codec, timestamp, preview, tags_display, display_time, sort_key) "
+    "VALUES (?, ?, ?, ?, '', ?, ?)"
+)
+
+# 批量导入想法的语句，参数由DBHandler._import_values生成
+IMPORT_IDEA_SQL = (
+    "INSERT INTO ideas (content, codec, timestamp, tags, summary, preview, tags_display, display_time, sort_key) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# 按相关度排序时bm25对内容、标签、摘要三列的权重，标签命中比正文命中更能说明想法的主题
+BM25_WEIGHTS = (1.0, 2.0, 1.0)
+# 搜索结果摘录的最大词数（trigram分词下约为字符数）
+SNIPPET_TOKENS = 40
+
+# 全文索引（外部内容表，trigram分词以支持中文子串搜索）的维护触发器，
+# 索引的是解压后的文本；只改变内容编码（重新压缩）时文本不变，不需要更新索引
+FTS_TRIGGERS = [
+    '''
+    CREATE TEMP TRIGGER IF NOT EXISTS trg_ideas_fts_insert AFTER INSERT ON main.ideas
+    BEGIN
+        INSERT INTO ideas_fts (rowid, content, tags, summary)
+            VALUES (NEW.id, idea_text(NEW.content, NEW.codec), NEW.tags, NEW.summary);
+    END
+    ''',
+    '''
+    CREATE TEMP TRIGGER IF NOT EXISTS trg_ideas_fts_update AFTER UPDATE OF content, tags, summary ON main.ideas
+    WHEN NEW.tags IS NOT OLD.tags OR NEW.summary IS NOT OLD.summary
+        OR idea_text(NEW.content, NEW.codec) IS NOT idea_text(OLD.content, OLD.codec)
+    BEGIN
+        INSERT INTO ideas_fts (ideas_fts, rowid, content, tags, summary)
+            VALUES ('delete', OLD.id, idea_text(OLD.content, OLD.codec), OLD.tags, OLD.summary);
+        INSERT INTO ideas_fts (rowid, content, tags, summary)
+            VALUES (NEW.id, idea_text(NEW.content, NEW.codec), NEW.tags, NEW.summary);
+    END
+    ''',
+    '''
+    CREATE TEMP TRIGGER IF NOT EXISTS trg_ideas_fts_delete AFTER DELETE ON main.ideas
+    BEGIN
+        INSERT INTO ideas_fts (ideas_fts, rowid, content, tags, summary)
+            VALUES ('delete', OLD.id, idea_text(OLD.content, OLD.codec), OLD.tags, OLD.summary);
+    END
+    '''
+]
+FTS_TRIGGER_NAMES = ['trg_ideas_fts_insert', 'trg_ideas_fts_update', 'trg_ideas_fts_delete']
+
+# 只存在于DBHandler连接上的临时触发器（其他连接没有idea_text函数）：
+# 记录改变了编码的内容修改；本连接写入变更日志时推进own_change_version，
+# 变更日志中超出该版本的记录说明有其他连接（没有这些临时触发器）写入过，见repair_external_writes
+CONNECTION_TRIGGERS = [
+    '''
+    CREATE TEMP TRIGGER IF NOT EXISTS trg_ideas_content_codec AFTER UPDATE OF content ON main.ideas
+    WHEN NEW.codec IS NOT OLD.codec
+        AND idea_text(NEW.content, NEW.codec) IS NOT idea_text(OLD.content, OLD.codec)
+    BEGIN
+        INSERT INTO change_log (idea_id, kind) VALUES (NEW.id, 'content_updated');
+    END
+    ''',
+    '''
+    CREATE TEMP TRIGGER IF NOT EXISTS trg_change_log_own AFTER INSERT ON main.change_log
+    WHEN NEW.version = (SELECT CAST(value AS INTEGER) FROM db_meta WHERE key = 'own_change_version') + 1
+    BEGIN
+        UPDATE db_meta SET value = NEW.version WHERE key = 'own_change_version';
+    END
+    '''
+]
+
+# 批量导入时暂停的逐行插入触发器，每批插入后改为按ID范围一次性维护变更日志、标签索引和全文索引
+IMPORT_DEFERRED_TRIGGERS = [
+    ('trg_ideas_insert', CHANGE_LOG_TRIGGERS[0]),
+    ('trg_idea_tags_insert', IDEA_TAGS_TRIGGERS[0]),
+    ('trg_ideas_fts_insert', FTS_TRIGGERS[0]),
+]
+
+# 想法内容的编码：0为普通文本，1为zlib压缩的UTF-8字节
+CODEC_PLAIN = 0
+CODEC_ZLIB = 1
+# zlib压缩级别
+ZLIB_LEVEL = 6
+# 后台重新压缩时每批处理的想法数，每批之间释放数据库锁
+RECOMPRESS_BATCH = 200
+
+# 在线备份每一步复制的页数（默认页大小下约2MB），以及两步之间释放数据库锁的时间（秒）
+BACKUP_STEP_PAGES = 512
+BACKUP_STEP_PAUSE = 0.005
+# 逐批读取全部想法（导出）时每批的条数
+ITER_BATCH = 1000
+
+
+def make_preview(content: str) -> str:
+    """生成列表中显示的内容预览"""
+    return content if len(content) <= PREVIEW_CHARS else content[:PREVIEW_CHARS] + "..."
+
+
+def format_display_time(timestamp: str) -> str:
+    """把ISO格式的时间戳格式化为列表中显示的时间"""
+    # datetime.isoformat()生成的时间戳直接截取，批量导入时省去解析
+    if len(timestamp) >= 16 and timestamp[10] == 'T' and timestamp[13] == ':':
+        return f"{timestamp[:10]} {timestamp[11:16]}"
+    try:
+        return datetime.datetime.fromisoformat(timestamp).strftime("%Y-%m-%d %H:%M")
+    except Exception:
+        return timestamp
+
+
+def format_tags_display(tags_json: Optional[str]) -> str:
+    """把JSON数组形式的标签格式化为列表中显示的文本"""
+    if not tags_json:
+        return ""
+    try:
+        return ", ".join(json.loads(tags_json))
+    except Exception:
+        return str(tags_json)
 
 
 class DBHandler:
@@ -10,9 +212,24 @@ class DBHandler:
         # 确保数据目录存在
         os.makedirs('data', exist_ok=True)
         
-        # 连接到SQLite数据库
-        self.conn = sqlite3.connect('data/ideas.db')
+        # 连接到SQLite数据库，AI处理在后台线程中进行，因此允许跨线程使用并用锁串行化访问
+        self.conn = sqlite3.connect('data/ideas.db', check_same_thread=False)
         self.cursor = self.conn.cursor()
+        self._lock = threading.RLock()
+        # 为True时，每次搜索打印编译后的SQL、驱动条件的选择和查询计划
+        self.search_debug = False
+        
+        # 内容的UTF-8字节数达到该值时压缩保存，0表示不压缩
+        self.compress_threshold = 0
+        # 解压的次数和总耗时，用于统计压缩带来的读取开销
+        self.decode_count = 0
+        self.decode_seconds = 0.0
+        self._recompress_lock = threading.Lock()
+        self._recompress_running = False
+        self._recompress_again = False
+        self._closed = False
+        # 触发器和查询通过idea_text(内容, 编码)读取解压后的文本
+        self.conn.create_function("idea_text", 2, self._decode_content, deterministic=True)
         
         # 创建想法表（如果不存在）
         self.cursor.execute('''
@@ -21,11 +238,338 @@ class DBHandler:
             content TEXT NOT NULL,
             timestamp TEXT NOT NULL,
             tags TEXT,
-            summary TEXT
+            summary TEXT,
+            preview TEXT,
+            tags_display TEXT,
+            display_time TEXT
+        )
+        ''')
+        self.create_display_columns()
+        self.create_codec_column()
+        
+        # 创建元数据表（如果不存在），保存派生数据的生成方式等键值
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS db_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+        ''')
+        self.create_sort_keys()
+        
+        # 创建token用量表（如果不存在），每次LLM调用记录一行
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS token_usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            day TEXT NOT NULL,
+            task TEXT NOT NULL,
+            model TEXT,
+            endpoint TEXT,
+            prompt_tokens INTEGER NOT NULL,
+            completion_tokens INTEGER NOT NULL,
+            estimated INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_token_usage_day ON token_usage (day, task)"
+        )
+        
+        # 创建变更日志表（如果不存在），由触发器记录每次想法的插入、修改和删除，
+        # version单调递增，视图可以据此只获取某个版本之后的变化
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            idea_id INTEGER,
+            kind TEXT NOT NULL
         )
         ''')
+        for trigger_sql in CHANGE_LOG_TRIGGERS:
+            self.cursor.execute(trigger_sql)
+        self.prune_change_log()
+        
+        # 搜索使用的索引：时间戳索引、标签索引表和全文索引
+        self.cursor.execute(IDEA_INDEXES['idx_ideas_timestamp'])
+        self.create_tag_index()
+        self.fts_enabled = self.create_fts_index()
+        self.create_connection_triggers()
+        
+        # 创建长文本分块结果缓存表（如果不存在），以分块内容的哈希为键
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chunk_cache (
+            hash TEXT PRIMARY KEY,
+            task TEXT NOT NULL,
+            result TEXT NOT NULL,
+            timestamp TEXT NOT NULL
+        )
+        ''')
+        # timestamp为最近一次使用的时间，按它淘汰最久未使用的结果
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_chunk_cache_timestamp ON chunk_cache(timestamp)")
+        
+        # 创建AI对话记录表（如果不存在），完整的对话历史保存在磁盘上，界面只保留最近的若干条
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TEXT NOT NULL
+        )
+        ''')
+        
+        # 创建对话滚动摘要表（如果不存在），每行是截至某条消息（含）的全部对话的摘要
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_summaries (
+            upto_id INTEGER PRIMARY KEY,
+            summary TEXT NOT NULL,
+            timestamp TEXT NOT NULL
+        )
+        ''')
+        self.conn.commit()
+
+    def create_display_columns(self):
+        """
+        为旧数据库添加列表显示用的冗余列（内容预览、标签文本、显示时间）并填充
+        
+        这些列在写入想法时一并更新，列表查询只读取它们，不必读取完整内容、解析标签JSON和格式化时间
+        """
+        self.cursor.execute("PRAGMA table_info(ideas)")
+        columns = {row[1] for row in self.cursor.fetchall()}
+        missing = [column for column in ('preview', 'tags_display', 'display_time') if column not in columns]
+        if not missing:
+            return
+        for column in missing:
+            self.cursor.execute(f"ALTER TABLE ideas ADD COLUMN {column} TEXT")
+        self.cursor.execute("SELECT id, content, timestamp, tags FROM ideas")
+        self.cursor.executemany(
+            "UPDATE ideas SET preview = ?, tags_display = ?, display_time = ? WHERE id = ?",
+            [
+                (make_preview(content), format_tags_display(tags), format_display_time(timestamp), idea_id)
+                for idea_id, content, timestamp, tags in self.cursor.fetchall()
+            ]
+        )
         self.conn.commit()
 
+    def create_codec_column(self):
+        """为旧数据库添加内容编码列，并删除旧版本的触发器（随后按新定义重建）"""
+        self.cursor.execute("PRAGMA table_info(ideas)")
+        if 'codec' not in {row[1] for row in self.cursor.fetchall()}:
+            self.cursor.execute("ALTER TABLE ideas ADD COLUMN codec INTEGER NOT NULL DEFAULT 0")
+        # 不识别压缩内容的旧触发器，以及调用idea_text、使其他连接无法写入的旧触发器；
+        # 全文索引触发器现在是每个连接的临时触发器，数据库文件中不再保存
+        self.cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'ideas'")
+        for name, sql in self.cursor.fetchall():
+            if ('idea_text(' in sql or name in FTS_TRIGGER_NAMES
+                    or (name == 'trg_ideas_content' and 'codec' not in sql)):
+                self.cursor.execute(f"DROP TRIGGER main.{name}")
+
+    def create_sort_keys(self):
+        """
+        添加按关键词排序使用的排序键列和索引
+        
+        排序键的生成方式变化（首次创建，或安装/卸载了pypinyin）时重新生成全部排序键
+        """
+        self.cursor.execute("PRAGMA table_info(ideas)")
+        if 'sort_key' not in {row[1] for row in self.cursor.fetchall()}:
+            self.cursor.execute("ALTER TABLE ideas ADD COLUMN sort_key TEXT")
+        self.cursor.execute(IDEA_INDEXES['idx_ideas_sort_key'])
+        
+        self.cursor.execute("SELECT value FROM db_meta WHERE key = 'sort_key_version'")
+        row = self.cursor.fetchone()
+        if row is None or row[0] != SORT_KEY_VERSION:
+            self.cursor.execute(f"SELECT id, {CONTENT_SQL} FROM ideas")
+            self.cursor.executemany(
+                "UPDATE ideas SET sort_key = ? WHERE id = ?",
+                [(sort_key(content), idea_id) for idea_id, content in self.cursor.fetchall()]
+            )
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO db_meta (key, value) VALUES ('sort_key_version', ?)",
+                (SORT_KEY_VERSION,)
+            )
+        self.conn.commit()
+
+    def _drop_outdated(self, kind: str, name: str, marker: str) -> bool:
+        """
+        删除定义中不含marker的旧表或触发器
+        
+        Returns:
+            是否删除了旧定义
+        """
+        self.cursor.execute("SELECT sql FROM sqlite_master WHERE type = ? AND name = ?", (kind, name))
+        row = self.cursor.fetchone()
+        if row is None or marker in row[0]:
+            return False
+        self.cursor.execute(f"DROP {'TABLE' if kind == 'table' else 'TRIGGER'} {name}")
+        return True
+
+    def create_tag_index(self):
+        """创建标签索引表，首次创建时从已有想法的标签填充"""
+        self.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'idea_tags'"
+        )
+        exists = self.cursor.fetchone() is not None
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS idea_tags (
+            idea_id INTEGER NOT NULL,
+            tag TEXT NOT NULL COLLATE NOCASE
+        )
+        ''')
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_idea_tags_tag ON idea_tags (tag, idea_id)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_idea_tags_idea ON idea_tags (idea_id)")
+        for trigger_sql in IDEA_TAGS_TRIGGERS:
+            self.cursor.execute(trigger_sql)
+        if not exists:
+            self.cursor.execute(
+                "INSERT INTO idea_tags (idea_id, tag) "
+                "SELECT ideas.id, json_each.value FROM ideas, json_each(ideas.tags) "
+                "WHERE json_valid(ideas.tags)"
+            )
+
+    def create_fts_index(self) -> bool:
+        """
+        创建全文索引，首次创建时为已有想法建立索引
+        
+        Returns:
+            全文索引是否可用（SQLite版本过旧、不支持FTS5 trigram分词时为False，搜索退回LIKE）
+        """
+        # 旧版本的全文索引直接读取ideas.content，无法处理压缩内容，删除后重建
+        self._drop_outdated('table', 'ideas_fts', 'ideas_text')
+        self.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ideas_fts'"
+        )
+        exists = self.cursor.fetchone() is not None
+        # 全文索引的外部内容表为解压内容的视图，生成摘录和重建索引时读取的是文本
+        self.cursor.execute(
+            "CREATE VIEW IF NOT EXISTS ideas_text AS "
+            "SELECT id, idea_text(content, codec) AS content, tags, summary FROM ideas"
+        )
+        try:
+            self.cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS ideas_fts USING fts5("
+                "content, tags, summary, content='ideas_text', content_rowid='id', tokenize='trigram')"
+            )
+            for trigger_sql in FTS_TRIGGERS:
+                self.cursor.execute(trigger_sql)
+            # 推迟了全文索引的批量导入没有完成最后的重建（如进程被结束）时，在此补建
+            self.cursor.execute("SELECT 1 FROM db_meta WHERE key = 'fts_rebuild_pending'")
+            if not exists or self.cursor.fetchone() is not None:
+                self.cursor.execute("INSERT INTO ideas_fts (ideas_fts) VALUES ('rebuild')")
+                self.cursor.execute("DELETE FROM db_meta WHERE key = 'fts_rebuild_pending'")
+            return True
+        except sqlite3.OperationalError as e:
+            print(f"全文索引不可用，搜索将使用逐行匹配: {e}")
+            return False
+
+    def create_connection_triggers(self):
+        """
+        创建本连接的临时触发器，首次运行时把变更日志的当前版本记为本连接（DBHandler）写入的版本
+        """
+        self.cursor.execute(
+            "INSERT OR IGNORE INTO db_meta (key, value) "
+            "SELECT 'own_change_version', COALESCE(MAX(version), 0) FROM change_log"
+        )
+        for trigger_sql in CONNECTION_TRIGGERS:
+            self.cursor.execute(trigger_sql)
+
+    def has_external_writes(self) -> bool:
+        """变更日志中是否有其他连接写入、尚未修复的变更，只需一次简单查询"""
+        with self._lock:
+            self.cursor.execute(
+                "SELECT (SELECT COALESCE(MAX(version), 0) FROM change_log) > "
+                "(SELECT CAST(value AS INTEGER) FROM db_meta WHERE key = 'own_change_version')"
+            )
+            return bool(self.cursor.fetchone()[0])
+
+    def repair_external_writes(self) -> bool:
+        """
+        修复其他连接（sqlite3命令行、外部工具等没有idea_text函数的连接）写入后过期的派生数据
+        
+        其他连接的写入照常记录在变更日志中，标签索引也由数据库中的触发器维护，但不会更新
+        全文索引、内容预览、显示时间和排序键。本方法重新生成这些想法的派生列并重建全文索引；
+        没有外部写入时只需一次简单查询。
+        
+        Returns:
+            是否进行了修复
+        """
+        with self._lock:
+            self.cursor.execute(
+                "SELECT CAST(value AS INTEGER) FROM db_meta WHERE key = 'own_change_version'"
+            )
+            own_version = self.cursor.fetchone()[0]
+            self.cursor.execute("SELECT COALESCE(MAX(version), 0), MIN(version) FROM change_log")
+            latest, oldest = self.cursor.fetchone()
+            if latest <= own_version:
+                return False
+            
+            start = time.perf_counter()
+            try:
+                if oldest is not None and own_version >= oldest - 1:
+                    self.cursor.execute(
+                        "SELECT DISTINCT idea_id FROM change_log WHERE version > ? AND idea_id IS NOT NULL",
+                        (own_version,)
+                    )
+                    idea_ids = [row[0] for row in self.cursor.fetchall()]
+                else:
+                    # 所需的变更日志已被清理，重新生成全部想法的派生列
+                    self.cursor.execute("SELECT id FROM ideas")
+                    idea_ids = [row[0] for row in self.cursor.fetchall()]
+                for begin in range(0, len(idea_ids), 500):
+                    batch = idea_ids[begin:begin + 500]
+                    self.cursor.execute(
+                        f"SELECT id, {CONTENT_SQL}, timestamp, tags FROM ideas "
+                        f"WHERE id IN ({','.join('?' * len(batch))})",
+                        batch
+                    )
+                    self.cursor.executemany(
+                        "UPDATE ideas SET preview = ?, tags_display = ?, display_time = ?, sort_key = ? "
+                        "WHERE id = ?",
+                        [
+                            (make_preview(content), format_tags_display(tags), format_display_time(timestamp),
+                             sort_key(content), idea_id)
+                            for idea_id, content, timestamp, tags in self.cursor.fetchall()
+                        ]
+                    )
+                if self.fts_enabled:
+                    self.cursor.execute("INSERT INTO ideas_fts (ideas_fts) VALUES ('rebuild')")
+                self.cursor.execute(
+                    "UPDATE db_meta SET value = (SELECT MAX(version) FROM change_log) "
+                    "WHERE key = 'own_change_version'"
+                )
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        print(f"已修复其他程序写入的 {len(idea_ids)} 条想法的索引，耗时 {time.perf_counter() - start:.1f} 秒")
+        return True
+
+    def _encode_content(self, content: str) -> Tuple[object, int]:
+        """
+        按压缩阈值编码想法内容
+        
+        Returns:
+            (保存到数据库的值, 编码)，压缩后没有变小的内容按普通文本保存
+        """
+        if self.compress_threshold > 0:
+            raw = content.encode('utf-8')
+            if len(raw) >= self.compress_threshold:
+                compressed = zlib.compress(raw, ZLIB_LEVEL)
+                if len(compressed) < len(raw):
+                    return compressed, CODEC_ZLIB
+        return content, CODEC_PLAIN
+
+    def _decode_content(self, value, codec: int) -> str:
+        """解码数据库中保存的想法内容，同时注册为SQL函数idea_text"""
+        if codec != CODEC_ZLIB:
+            return value
+        start = time.perf_counter()
+        text = zlib.decompress(value).decode('utf-8')
+        self.decode_count += 1
+        self.decode_seconds += time.perf_counter() - start
+        return text
+
+    def _insert_values(self, content: str, timestamp: str) -> Tuple:
+        """生成INSERT_IDEA_SQL的参数：编码后的内容和写入时预先生成的显示列、排序键"""
+        return (*self._encode_content(content), timestamp, make_preview(content),
+                format_display_time(timestamp), sort_key(content))
+
     def store_idea(self, idea: str) -> int:
         """
         将想法存储到数据库中
@@ -37,12 +581,160 @@ class DBHandler:
             新插入想法的ID
         """
         timestamp = datetime.datetime.now().isoformat()
-        self.cursor.execute(
-            "INSERT INTO ideas (content, timestamp) VALUES (?, ?)",
-            (idea, timestamp)
-        )
-        self.conn.commit()
-        return self.cursor.lastrowid
+        with self._lock:
+            self.cursor.execute(INSERT_IDEA_SQL, self._insert_values(idea, timestamp))
+            self.conn.commit()
+            return self.cursor.lastrowid
+
+    def store_ideas(self, items: List[Tuple[str, str]]) -> List[int]:
+        """
+        在一个事务中批量存储想法
+        
+        Args:
+            items: 想法列表，每项为(内容, ISO格式时间戳)
+            
+        Returns:
+            新插入想法的ID列表，顺序与items一致
+        """
+        ids = []
+        with self._lock:
+            try:
+                for content, timestamp in items:
+                    self.cursor.execute(INSERT_IDEA_SQL, self._insert_values(content, timestamp))
+                    ids.append(self.cursor.lastrowid)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        return ids
+
+    def _import_values(self, content: str, timestamp: str, tags: Optional[List[str]],
+                       summary: Optional[str]) -> Tuple:
+        """生成IMPORT_IDEA_SQL的参数"""
+        tags_json = json.dumps(tags, ensure_ascii=False) if tags else None
+        return (*self._encode_content(content), timestamp, tags_json, summary or None,
+                make_preview(content), ", ".join(tags) if tags else "",
+                format_display_time(timestamp), sort_key(content))
+
+    def import_ideas(self, items: List[Tuple], state_key: str, state: str,
+                     defer_fts: bool = False) -> Tuple[int, int]:
+        """
+        在一个事务中批量导入想法，并保存导入进度
+        
+        事务中先暂停逐行插入触发器，用executemany插入后按新ID范围一次性补写变更日志、
+        标签索引和全文索引，再恢复触发器；进度与想法在同一事务中提交，中断后从进度处继续不会重复导入。
+        
+        Args:
+            items: 想法列表，每项为(内容, ISO格式时间戳, 标签列表或None, 摘要或None)
+            state_key: 保存导入进度的db_meta键
+            state: 导入进度
+            defer_fts: 不为本批想法建立全文索引，导入结束后必须调用rebuild_fts_index；
+                       在此之前进程退出时，下次启动时重建
+            
+        Returns:
+            新想法的ID范围(first_id, last_id)，first_id不含、last_id含
+        """
+        values = [self._import_values(*item) for item in items]
+        with self._lock:
+            try:
+                self.cursor.execute("BEGIN IMMEDIATE")
+                for name, _ in IMPORT_DEFERRED_TRIGGERS:
+                    self.cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+                first_id = self._last_idea_id()
+                self.cursor.executemany(IMPORT_IDEA_SQL, values)
+                last_id = self._last_idea_id()
+                
+                id_range = (first_id, last_id)
+                self.cursor.execute(
+                    "INSERT INTO change_log (idea_id, kind) "
+                    "SELECT id, 'inserted' FROM ideas WHERE id > ? AND id <= ? ORDER BY id",
+                    id_range
+                )
+                self.cursor.execute(
+                    "INSERT INTO idea_tags (idea_id, tag) "
+                    "SELECT ideas.id, json_each.value FROM ideas, json_each(ideas.tags) "
+                    "WHERE ideas.id > ? AND ideas.id <= ? AND json_valid(ideas.tags)",
+                    id_range
+                )
+                if self.fts_enabled and defer_fts:
+                    self.cursor.execute(
+                        "INSERT OR REPLACE INTO db_meta (key, value) VALUES ('fts_rebuild_pending', '1')"
+                    )
+                elif self.fts_enabled:
+                    self.cursor.execute(
+                        "INSERT INTO ideas_fts (rowid, content, tags, summary) "
+                        "SELECT id, content, tags, summary FROM ideas_text WHERE id > ? AND id <= ?",
+                        id_range
+                    )
+                
+                for name, trigger_sql in IMPORT_DEFERRED_TRIGGERS:
+                    if self.fts_enabled or name not in FTS_TRIGGER_NAMES:
+                        self.cursor.execute(trigger_sql)
+                self.cursor.execute(
+                    "INSERT OR REPLACE INTO db_meta (key, value) VALUES (?, ?)", (state_key, state)
+                )
+                self.conn.commit()
+            except BaseException:
+                # 回滚同时恢复被暂停的触发器（包括Ctrl+C中断时）
+                self.conn.rollback()
+                raise
+        return first_id, last_id
+
+    def rebuild_fts_index(self):
+        """重建全文索引（推迟了全文索引的批量导入结束后），没有推迟时不做任何事"""
+        with self._lock:
+            self.cursor.execute("SELECT 1 FROM db_meta WHERE key = 'fts_rebuild_pending'")
+            if self.cursor.fetchone() is None:
+                return
+            try:
+                if self.fts_enabled:
+                    self.cursor.execute("INSERT INTO ideas_fts (ideas_fts) VALUES ('rebuild')")
+                self.cursor.execute("DELETE FROM db_meta WHERE key = 'fts_rebuild_pending'")
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+
+    def drop_idea_indexes(self):
+        """删除ideas表上的普通索引（大批量导入前），之后必须调用create_idea_indexes重建"""
+        with self._lock:
+            for name in IDEA_INDEXES:
+                self.cursor.execute(f"DROP INDEX IF EXISTS {name}")
+            self.conn.commit()
+
+    def create_idea_indexes(self):
+        """重建ideas表上的普通索引；启动时也会创建，因此导入中断后索引不会一直缺失"""
+        with self._lock:
+            for index_sql in IDEA_INDEXES.values():
+                self.cursor.execute(index_sql)
+            self.conn.commit()
+
+    def get_idea_count(self) -> int:
+        """想法总数"""
+        with self._lock:
+            self.cursor.execute("SELECT COUNT(*) FROM ideas")
+            return self.cursor.fetchone()[0]
+
+    def _last_idea_id(self) -> int:
+        """AUTOINCREMENT分配过的最大想法ID"""
+        self.cursor.execute("SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'ideas'), 0)")
+        return self.cursor.fetchone()[0]
+
+    def get_meta(self, key: str) -> Optional[str]:
+        """读取db_meta中的值，不存在时返回None"""
+        with self._lock:
+            self.cursor.execute("SELECT value FROM db_meta WHERE key = ?", (key,))
+            row = self.cursor.fetchone()
+            return row[0] if row else None
+
+    def set_meta(self, key: str, value: Optional[str]):
+        """写入db_meta中的值，value为None时删除该键"""
+        with self._lock:
+            if value is None:
+                self.cursor.execute("DELETE FROM db_meta WHERE key = ?", (key,))
+            else:
+                self.cursor.execute("INSERT OR REPLACE INTO db_meta (key, value) VALUES (?, ?)", (key, value))
+            self.conn.commit()
 
     def update_idea_tags(self, idea_id: int, tags: List[str]):
         """
@@ -53,11 +745,12 @@ class DBHandler:
             tags: 标签列表
         """
         tags_json = json.dumps(tags, ensure_ascii=False)
-        self.cursor.execute(
-            "UPDATE ideas SET tags = ? WHERE id = ?",
-            (tags_json, idea_id)
-        )
-        self.conn.commit()
+        with self._lock:
+            self.cursor.execute(
+                "UPDATE ideas SET tags = ?, tags_display = ? WHERE id = ?",
+                (tags_json, ", ".join(tags), idea_id)
+            )
+            self.conn.commit()
 
     def update_idea_summary(self, idea_id: int, summary: str):
         """
@@ -67,11 +760,12 @@ class DBHandler:
             idea_id: 想法ID
             summary: 摘要内容
         """
-        self.cursor.execute(
-            "UPDATE ideas SET summary = ? WHERE id = ?",
-            (summary, idea_id)
-        )
-        self.conn.commit()
+        with self._lock:
+            self.cursor.execute(
+                "UPDATE ideas SET summary = ? WHERE id = ?",
+                (summary, idea_id)
+            )
+            self.conn.commit()
         
     def update_idea_content(self, idea_id: int, content: str):
         """
@@ -81,38 +775,148 @@ class DBHandler:
             idea_id: 想法ID
             content: 新的想法内容
         """
-        self.cursor.execute(
-            "UPDATE ideas SET content = ? WHERE id = ?",
-            (content, idea_id)
-        )
-        self.conn.commit()
+        with self._lock:
+            self.cursor.execute(
+                "UPDATE ideas SET content = ?, codec = ?, preview = ?, sort_key = ? WHERE id = ?",
+                (*self._encode_content(content), make_preview(content), sort_key(content), idea_id)
+            )
+            self.conn.commit()
 
-    def query_ideas(self, query: str = None, sort_by: str = 'time') -> List[Tuple]:
+    def query_ideas(self, query: str = None, sort_by: str = 'time',
+                    limit: Optional[int] = None, offset: int = 0) -> List[Tuple]:
         """
         查询想法
         
         Args:
-            query: 查询关键词，如果为None则查询所有想法
-            sort_by: 排序方式，'time'按时间排序，'keyword'按关键词排序
+            query: 查询语句，支持 tag:、after:、before:、has:、"短语" 和 - 排除（见core.search_query），
+                   如果为None则查询所有想法
+            sort_by: 排序方式，'time'按时间排序，'keyword'按关键词排序，
+                     'relevance'按BM25相关度排序（查询中没有可走全文索引的词语时按时间排序）
+            limit: 最多返回的条数，None表示不限制
+            offset: 跳过的条数，与limit配合用于分页
             
         Returns:
-            想法列表，每个想法为一个元组，包含(时间, 内容, ID, 标签, 摘要)
+            想法列表，每个想法为一个元组，包含(时间戳, 内容预览, ID, 标签文本, 摘要, 显示时间, 排序键)；
+            按相关度排序时内容预览为匹配词附近的摘录，匹配词以HIGHLIGHT_START和HIGHLIGHT_END标记
         """
-        sql_query = "SELECT timestamp, content, id, tags, summary FROM ideas"
-        params = []
+        with self._lock:
+            sql_query, params, notes, match = self._build_query(query, sort_by)
+            if limit is not None:
+                sql_query += " LIMIT ? OFFSET ?"
+                params = params + [limit, offset]
+            
+            if self.search_debug and query:
+                self._print_query_plan(query, notes, sql_query, params)
+            self.cursor.execute(sql_query, params)
+            rows = self.cursor.fetchall()
+            if match is None:
+                return rows
+            
+            # 只为当前这一页生成摘录，不把完整内容读入界面
+            snippets = self._get_snippets(match, [row[2] for row in rows])
+            return [
+                (row[0], snippets.get(row[2], row[1])) + row[2:]
+                for row in rows
+            ]
+
+    def idea_matches(self, query: str, idea_id: int) -> bool:
+        """
+        判断某个想法是否符合查询条件
+        
+        Args:
+            query: 查询语句，为空时任何想法都符合
+            idea_id: 想法ID
+        """
+        if not query:
+            return True
+        with self._lock:
+            where, params, _ = self._compile_search(query)
+            where = f"{where} AND id = ?" if where else " WHERE id = ?"
+            self.cursor.execute(f"SELECT 1 FROM ideas{where}", params + [idea_id])
+            return self.cursor.fetchone() is not None
+
+    def explain_query(self, query: str, sort_by: str = 'time') -> List[str]:
+        """
+        获取搜索的执行计划，用于调试
+        
+        Returns:
+            驱动条件的选择说明和SQLite的查询计划
+        """
+        with self._lock:
+            sql_query, params, notes, _ = self._build_query(query, sort_by)
+            self.cursor.execute("EXPLAIN QUERY PLAN " + sql_query, params)
+            return notes + [row[-1] for row in self.cursor.fetchall()]
+
+    def _build_query(self, query: Optional[str], sort_by: str) -> Tuple[str, list, List[str], Optional[str]]:
+        """
+        生成查询想法的SQL
         
-        if query:
-            sql_query += " WHERE content LIKE ? OR tags LIKE ?"
-            params = [f'%{query}%', f'%{query}%']
+        Returns:
+            (SQL, 参数, 规划说明, 全文MATCH表达式)，SQL返回LIST_COLUMNS；
+            MATCH表达式不为None时按相关度排序，内容预览需替换为摘录
+        """
+        if sort_by == 'relevance':
+            predicates = parse_query(query or "")
+            match = fts_match_expression(predicates, self.fts_enabled)
+            if match is not None:
+                # 全文索引作为驱动条件计算bm25，其余条件只作过滤
+                where, params = build_where(None, compile_predicates(predicates, self.fts_enabled,
+                                                                     include_fts=False))
+                weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+                sql_query = (
+                    f"SELECT {LIST_COLUMNS} FROM "
+                    f"(SELECT rowid AS fts_id, bm25(ideas_fts, {weights}) AS score "
+                    "FROM ideas_fts WHERE ideas_fts MATCH ?) "
+                    "JOIN ideas ON ideas.id = fts_id" + where +
+                    " ORDER BY score, id DESC"
+                )
+                return sql_query, [match] + params, [f"按相关度排序: {match}"], match
+            sort_by = 'time'
         
+        where, params, notes = self._compile_search(query)
+        sql_query = f"SELECT {LIST_COLUMNS} FROM ideas" + where
         if sort_by == 'time':
-            sql_query += " ORDER BY timestamp DESC"
+            sql_query += " ORDER BY timestamp DESC, id DESC"
         elif sort_by == 'keyword':
-            # 按关键词排序时，我们将按内容的字母顺序排序
-            sql_query += " ORDER BY content"
-        
-        self.cursor.execute(sql_query, params)
-        return self.cursor.fetchall()
+            # 按写入时生成的排序键（拼音/字母顺序）排序，沿排序键索引扫描，不需要对全表排序
+            sql_query += " ORDER BY sort_key, id"
+        return sql_query, params, notes, None
+
+    def _get_snippets(self, match: str, idea_ids: List[int]) -> Dict[int, str]:
+        """由全文索引生成想法内容中匹配词附近的摘录，返回{想法ID: 摘录}"""
+        snippets = {}
+        for start in range(0, len(idea_ids), 500):
+            batch = idea_ids[start:start + 500]
+            self.cursor.execute(
+                "SELECT rowid, snippet(ideas_fts, 0, ?, ?, '…', ?) FROM ideas_fts "
+                f"WHERE ideas_fts MATCH ? AND rowid IN ({','.join('?' * len(batch))})",
+                [HIGHLIGHT_START, HIGHLIGHT_END, SNIPPET_TOKENS, match] + batch
+            )
+            snippets.update(self.cursor.fetchall())
+        return snippets
+
+    def _compile_search(self, query: Optional[str]) -> Tuple[str, list, List[str]]:
+        """把查询语句编译为WHERE子句，返回(WHERE子句, 参数, 规划说明)"""
+        if not query:
+            return "", [], []
+        clauses = compile_predicates(parse_query(query), self.fts_enabled)
+        driver, filters, notes = plan_clauses(clauses, self._estimate_rows)
+        where, params = build_where(driver, filters)
+        return where, params, notes
+
+    def _estimate_rows(self, sql: str, params: list) -> int:
+        self.cursor.execute(sql, params)
+        return self.cursor.fetchone()[0]
+
+    def _print_query_plan(self, query: str, notes: List[str], sql_query: str, params: list):
+        print(f"[搜索] {query}")
+        for note in notes:
+            print(f"  {note}")
+        print(f"  SQL: {sql_query}")
+        print(f"  参数: {params}")
+        self.cursor.execute("EXPLAIN QUERY PLAN " + sql_query, params)
+        for row in self.cursor.fetchall():
+            print(f"  计划: {row[-1]}")
     
     def get_all_ideas(self) -> List[Dict]:
         """
@@ -121,9 +925,11 @@ class DBHandler:
         Returns:
             想法列表，每个想法为一个字典，包含id、content、timestamp、tags和summary字段
         """
-        self.cursor.execute("SELECT id, content, timestamp, tags, summary FROM ideas")
+        with self._lock:
+            self.cursor.execute(f"SELECT id, {CONTENT_SQL}, timestamp, tags, summary FROM ideas")
+            rows = self.cursor.fetchall()
         ideas = []
-        for row in self.cursor.fetchall():
+        for row in rows:
             idea = {
                 'id': row[0],
                 'content': row[1],
@@ -134,6 +940,169 @@ class DBHandler:
             ideas.append(idea)
         return ideas
     
+    def iter_ideas(self, batch_size: int = ITER_BATCH) -> Iterator[Tuple]:
+        """
+        按ID顺序逐批读取全部想法，每批单独加锁，内存占用与想法总数无关
+        
+        Yields:
+            (ID, 内容, 时间戳, 标签JSON, 摘要)
+        """
+        last_id = 0
+        while True:
+            with self._lock:
+                self.cursor.execute(
+                    f"SELECT id, {CONTENT_SQL}, timestamp, tags, summary FROM ideas "
+                    "WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                )
+                rows = self.cursor.fetchall()
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
+
+    def find_idea(self, content: str, timestamp: str) -> Optional[int]:
+        """
+        查找内容和时间戳都相同的想法（按时间戳索引查找）
+
+        Returns:
+            想法ID，不存在时返回None
+        """
+        with self._lock:
+            self.cursor.execute(
+                f"SELECT id FROM ideas WHERE timestamp = ? AND {CONTENT_SQL} = ? LIMIT 1",
+                (timestamp, content)
+            )
+            row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def get_idea_rows(self, idea_ids: List[int]) -> List[Tuple]:
+        """
+        获取多个想法的完整数据，每批单独加锁
+
+        Args:
+            idea_ids: 想法ID列表
+
+        Returns:
+            列表，每项格式同iter_ideas，不保证顺序
+        """
+        rows = []
+        for start in range(0, len(idea_ids), 500):
+            batch = idea_ids[start:start + 500]
+            with self._lock:
+                self.cursor.execute(
+                    f"SELECT id, {CONTENT_SQL}, timestamp, tags, summary FROM ideas "
+                    f"WHERE id IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+                rows.extend(self.cursor.fetchall())
+        return rows
+
+    def backup_to(self, path: str, progress: Optional[Callable[[int, int], None]] = None):
+        """
+        使用SQLite在线备份接口把数据库复制到path
+        
+        每一步只复制BACKUP_STEP_PAGES页，两步之间释放数据库锁，界面和后台任务可以照常读写；
+        备份期间通过同一连接写入的修改会由SQLite自动同步到备份中。先写入临时文件，完成后再替换，
+        备份中断不会留下不完整的文件。
+        
+        Args:
+            path: 备份文件路径
+            progress: 每一步后调用，参数为(已复制页数, 总页数)
+        """
+        temp_path = path + ".tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        target = sqlite3.connect(temp_path)
+        
+        def on_step(status, remaining, total):
+            if progress is not None:
+                progress(total - remaining, total)
+            self._lock.release()
+            try:
+                time.sleep(BACKUP_STEP_PAUSE)
+            finally:
+                self._lock.acquire()
+        
+        try:
+            with self._lock:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("数据库已关闭")
+                self.conn.backup(target, pages=BACKUP_STEP_PAGES, progress=on_step)
+        finally:
+            target.close()
+        os.replace(temp_path, path)
+
+    def get_idea_texts(self, idea_ids: Optional[List[int]] = None) -> List[Tuple]:
+        """
+        获取想法的内容和摘要，用于建立搜索索引
+        
+        Args:
+            idea_ids: 想法ID列表，为None时返回全部想法
+            
+        Returns:
+            列表，每项为(ID, 内容, 摘要)
+        """
+        with self._lock:
+            if idea_ids is None:
+                self.cursor.execute(f"SELECT id, {CONTENT_SQL}, summary FROM ideas")
+                return self.cursor.fetchall()
+            rows = []
+            # 分批查询，避免超过SQLite的参数个数上限
+            for start in range(0, len(idea_ids), 500):
+                batch = idea_ids[start:start + 500]
+                self.cursor.execute(
+                    f"SELECT id, {CONTENT_SQL}, summary FROM ideas WHERE id IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+                rows.extend(self.cursor.fetchall())
+            return rows
+
+    def get_idea_metadata(self, idea_ids: Optional[List[int]] = None) -> List[Tuple]:
+        """
+        获取想法的元数据，用于建立内存中的元数据缓存
+        
+        Args:
+            idea_ids: 想法ID列表，为None时返回全部想法
+            
+        Returns:
+            列表，每项为(ID, 时间戳, 排序键, 内容字符数, 标签JSON)
+        """
+        sql = f"SELECT id, timestamp, sort_key, length({CONTENT_SQL}), tags FROM ideas"
+        with self._lock:
+            if idea_ids is None:
+                self.cursor.execute(sql)
+                return self.cursor.fetchall()
+            rows = []
+            for start in range(0, len(idea_ids), 500):
+                batch = idea_ids[start:start + 500]
+                self.cursor.execute(f"{sql} WHERE id IN ({','.join('?' * len(batch))})", batch)
+                rows.extend(self.cursor.fetchall())
+            return rows
+
+    def get_ideas_by_ids(self, idea_ids: List[int]) -> List[Tuple]:
+        """
+        按给定的顺序获取多个想法的列表显示数据
+        
+        Args:
+            idea_ids: 想法ID列表
+            
+        Returns:
+            想法列表，每个想法为一个元组，格式同query_ideas，顺序与idea_ids一致
+        """
+        rows = {}
+        with self._lock:
+            for start in range(0, len(idea_ids), 500):
+                batch = idea_ids[start:start + 500]
+                self.cursor.execute(
+                    f"SELECT {LIST_COLUMNS} FROM ideas "
+                    f"WHERE id IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+                for row in self.cursor.fetchall():
+                    rows[row[2]] = row
+        return [rows[idea_id] for idea_id in idea_ids if idea_id in rows]
+
     def get_idea_by_id(self, idea_id: int) -> Optional[Dict]:
         """
         根据ID获取想法
@@ -144,11 +1113,12 @@ class DBHandler:
         Returns:
             想法数据字典，如果找不到则返回None
         """
-        self.cursor.execute(
-            "SELECT id, content, timestamp, tags, summary FROM ideas WHERE id = ?", 
-            (idea_id,)
-        )
-        row = self.cursor.fetchone()
+        with self._lock:
+            self.cursor.execute(
+                f"SELECT id, {CONTENT_SQL}, timestamp, tags, summary FROM ideas WHERE id = ?",
+                (idea_id,)
+            )
+            row = self.cursor.fetchone()
         if not row:
             return None
             
@@ -160,7 +1130,364 @@ class DBHandler:
             'summary': row[4]
         }
         
+    def record_token_usage(self, task: str, model: str, endpoint: str,
+                           prompt_tokens: int, completion_tokens: int, estimated: bool = False):
+        """
+        记录一次LLM调用的token用量
+        
+        Args:
+            task: 任务类型
+            model: 使用的模型
+            endpoint: 处理请求的端点
+            prompt_tokens: 提示词token数
+            completion_tokens: 生成token数
+            estimated: 用量是否为本地估算值（后端未返回usage时）
+        """
+        now = datetime.datetime.now()
+        with self._lock:
+            self.cursor.execute(
+                "INSERT INTO token_usage (timestamp, day, task, model, endpoint, prompt_tokens, completion_tokens, estimated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (now.isoformat(), now.strftime("%Y-%m-%d"), task, model, endpoint,
+                 prompt_tokens, completion_tokens, int(estimated))
+            )
+            self.conn.commit()
+
+    def get_token_usage(self, since_day: str) -> List[Tuple]:
+        """
+        按天和任务类型汇总token用量
+        
+        Args:
+            since_day: 起始日期（含），格式为YYYY-MM-DD
+            
+        Returns:
+            用量列表，每项为一个元组，包含(日期, 任务类型, 调用次数, 提示词token数, 生成token数)
+        """
+        with self._lock:
+            self.cursor.execute(
+                "SELECT day, task, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens) "
+                "FROM token_usage WHERE day >= ? GROUP BY day, task ORDER BY day DESC, task",
+                (since_day,)
+            )
+            return self.cursor.fetchall()
+        
+    def log_change(self, kind: str, idea_id: Optional[int] = None):
+        """
+        手动记录一条变更（用于不在ideas表中的数据，如AI见解）
+        
+        Args:
+            kind: 变更类型
+            idea_id: 相关想法ID，没有时为None
+        """
+        with self._lock:
+            self.cursor.execute(
+                "INSERT INTO change_log (idea_id, kind) VALUES (?, ?)",
+                (idea_id, kind)
+            )
+            self.conn.commit()
+
+    def get_change_version(self) -> int:
+        """
+        获取当前的数据版本号
+        
+        Returns:
+            变更日志中最新的版本号，没有变更时为0
+        """
+        with self._lock:
+            self.cursor.execute("SELECT COALESCE(MAX(version), 0) FROM change_log")
+            return self.cursor.fetchone()[0]
+
+    def get_changes_since(self, version: int) -> Optional[List[Tuple]]:
+        """
+        获取某个版本之后的所有变更
+        
+        Args:
+            version: 起始版本号（不含）
+            
+        Returns:
+            变更列表，每项为一个元组，包含(版本号, 想法ID, 变更类型)；
+            如果所需的记录已被清理，返回None，调用方需要完整重新加载
+        """
+        with self._lock:
+            self.cursor.execute("SELECT MIN(version) FROM change_log")
+            oldest = self.cursor.fetchone()[0]
+            if oldest is not None and version < oldest - 1:
+                return None
+            self.cursor.execute(
+                "SELECT version, idea_id, kind FROM change_log WHERE version > ? ORDER BY version",
+                (version,)
+            )
+            return self.cursor.fetchall()
+
+    def get_data_token(self) -> Tuple[int, int]:
+        """
+        获取轻量的数据变化标记，用于轮询
+        
+        PRAGMA data_version 在其他连接（如其他进程）提交修改后变化，
+        total_changes 在本连接修改数据后变化，两者都不需要读取任何表。
+        
+        Returns:
+            (data_version, total_changes)，与上次不同说明数据库可能已变化
+        """
+        with self._lock:
+            self.cursor.execute("PRAGMA data_version")
+            return self.cursor.fetchone()[0], self.conn.total_changes
+
+    def prune_change_log(self, keep: int = CHANGE_LOG_RETENTION):
+        """
+        清理过旧的变更日志，只保留最近的keep条
+        
+        Args:
+            keep: 保留的条数
+        """
+        with self._lock:
+            self.cursor.execute(
+                "DELETE FROM change_log WHERE version <= (SELECT MAX(version) FROM change_log) - ?",
+                (keep,)
+            )
+            self.conn.commit()
+
+    def get_chunk_result(self, chunk_hash: str) -> Optional[str]:
+        """
+        获取缓存的分块处理结果
+        
+        Args:
+            chunk_hash: 分块缓存键
+            
+        Returns:
+            缓存的结果，如果没有缓存则返回None
+        """
+        with self._lock:
+            self.cursor.execute("SELECT result FROM chunk_cache WHERE hash = ?", (chunk_hash,))
+            row = self.cursor.fetchone()
+            if row:
+                # 记录使用时间，淘汰时保留常用的结果
+                self.cursor.execute(
+                    "UPDATE chunk_cache SET timestamp = ? WHERE hash = ?",
+                    (datetime.datetime.now().isoformat(), chunk_hash)
+                )
+                self.conn.commit()
+        return row[0] if row else None
+
+    def store_chunk_result(self, chunk_hash: str, task: str, result: str):
+        """
+        缓存分块处理结果，缓存超过CHUNK_CACHE_MAX条时淘汰最久未使用的结果
+        
+        Args:
+            chunk_hash: 分块缓存键
+            task: 任务类型
+            result: 处理结果
+        """
+        with self._lock:
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO chunk_cache (hash, task, result, timestamp) VALUES (?, ?, ?, ?)",
+                (chunk_hash, task, result, datetime.datetime.now().isoformat())
+            )
+            self.cursor.execute(
+                "DELETE FROM chunk_cache WHERE hash IN "
+                "(SELECT hash FROM chunk_cache ORDER BY timestamp DESC LIMIT -1 OFFSET ?)",
+                (CHUNK_CACHE_MAX,)
+            )
+            self.conn.commit()
+
+    def store_chat_message(self, role: str, content: str) -> int:
+        """
+        保存一条AI对话消息
+        
+        Args:
+            role: 消息角色，user或assistant
+            content: 消息内容
+            
+        Returns:
+            新消息的ID
+        """
+        with self._lock:
+            self.cursor.execute(
+                "INSERT INTO chat_messages (role, content, timestamp) VALUES (?, ?, ?)",
+                (role, content, datetime.datetime.now().isoformat())
+            )
+            self.conn.commit()
+            return self.cursor.lastrowid
+
+    def get_chat_messages(self, before_id: Optional[int] = None, limit: int = 50,
+                          after_id: Optional[int] = None, oldest_first: bool = False) -> List[Tuple]:
+        """
+        按页获取AI对话消息
+        
+        Args:
+            before_id: 只返回ID小于该值的消息，为None时不限制
+            limit: 返回的最大条数
+            after_id: 只返回ID大于该值的消息，为None时不限制
+            oldest_first: 为True时返回范围内最早的limit条，否则返回最新的limit条
+            
+        Returns:
+            消息列表，每项为(id, role, content, timestamp)，按时间从早到晚排列
+        """
+        conditions = []
+        params = []
+        if before_id is not None:
+            conditions.append("id < ?")
+            params.append(before_id)
+        if after_id is not None:
+            conditions.append("id > ?")
+            params.append(after_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = "ASC" if oldest_first else "DESC"
+        with self._lock:
+            self.cursor.execute(
+                f"SELECT id, role, content, timestamp FROM chat_messages {where} ORDER BY id {order} LIMIT ?",
+                params + [limit]
+            )
+            rows = self.cursor.fetchall()
+        if not oldest_first:
+            rows.reverse()
+        return rows
+
+    def get_chat_summary(self) -> Optional[Tuple[int, str]]:
+        """
+        获取最新的对话滚动摘要
+        
+        Returns:
+            (摘要覆盖到的最后一条消息ID, 摘要)，没有摘要时返回None
+        """
+        with self._lock:
+            self.cursor.execute(
+                "SELECT upto_id, summary FROM chat_summaries ORDER BY upto_id DESC LIMIT 1"
+            )
+            row = self.cursor.fetchone()
+        return (row[0], row[1]) if row else None
+
+    def store_chat_summary(self, upto_id: int, summary: str):
+        """
+        保存对话滚动摘要
+        
+        Args:
+            upto_id: 摘要覆盖到的最后一条消息ID（含）
+            summary: 摘要内容
+        """
+        with self._lock:
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO chat_summaries (upto_id, summary, timestamp) VALUES (?, ?, ?)",
+                (upto_id, summary, datetime.datetime.now().isoformat())
+            )
+            self.conn.commit()
+        
+    def start_recompression(self):
+        """
+        在后台按当前的压缩阈值重新编码已有想法：压缩达到阈值的普通内容，关闭压缩时解压全部内容
+        
+        只改变内容的保存方式，文本不变，因此不会记录变更日志或更新全文索引。
+        已有任务在运行时，该任务结束后再执行一遍。
+        """
+        with self._recompress_lock:
+            if self._recompress_running:
+                self._recompress_again = True
+                return
+            self._recompress_running = True
+        threading.Thread(target=self._recompress, name="recompress", daemon=True).start()
+
+    def _recompress(self):
+        try:
+            while True:
+                after_id, changed_total = 0, 0
+                while not self._closed and after_id is not None:
+                    after_id, changed = self.recompress_batch(after_id)
+                    changed_total += changed
+                if changed_total:
+                    print(f"重新压缩了 {changed_total} 条想法的内容")
+                with self._recompress_lock:
+                    if not self._recompress_again or self._closed:
+                        break
+                    self._recompress_again = False
+        except Exception as e:
+            print(f"重新压缩想法内容时出错: {e}")
+        finally:
+            with self._recompress_lock:
+                self._recompress_running = False
+
+    def recompress_batch(self, after_id: int = 0, limit: int = RECOMPRESS_BATCH) -> Tuple[Optional[int], int]:
+        """
+        重新编码ID大于after_id的一批需要变化的想法
+        
+        Returns:
+            (本批最后一个想法的ID（已处理完时为None）, 实际改变编码的想法数)
+        """
+        with self._lock:
+            threshold = self.compress_threshold
+            if threshold > 0:
+                self.cursor.execute(
+                    "SELECT id, content, codec FROM ideas "
+                    "WHERE id > ? AND codec = 0 AND length(CAST(content AS BLOB)) >= ? ORDER BY id LIMIT ?",
+                    (after_id, threshold, limit)
+                )
+            else:
+                self.cursor.execute(
+                    "SELECT id, content, codec FROM ideas WHERE id > ? AND codec != 0 ORDER BY id LIMIT ?",
+                    (after_id, limit)
+                )
+            rows = self.cursor.fetchall()
+            updates = []
+            for idea_id, value, codec in rows:
+                new_value, new_codec = self._encode_content(self._decode_content(value, codec))
+                if new_codec != codec:
+                    updates.append((new_value, new_codec, idea_id))
+            if updates:
+                self.cursor.executemany("UPDATE ideas SET content = ?, codec = ? WHERE id = ?", updates)
+                self.conn.commit()
+        last_id = rows[-1][0] if len(rows) == limit else None
+        return last_id, len(updates)
+
+    def get_compression_stats(self) -> Dict:
+        """
+        统计内容压缩的效果
+        
+        会逐批解压全部压缩内容以计算原始大小，同时测得每条的解压耗时
+        
+        Returns:
+            字典，包含rows（想法数）、compressed_rows（压缩保存的想法数）、stored_bytes（内容实际占用字节数）、
+            raw_bytes（不压缩时的字节数）、saved_bytes（节省的字节数）、decode_ms_per_row（本次统计测得的
+            每条平均解压毫秒数）、decode_count和decode_ms（启动以来读取时的解压次数和总毫秒数）
+        """
+        with self._lock:
+            self.cursor.execute(
+                "SELECT COUNT(*), IFNULL(SUM(codec != 0), 0), IFNULL(SUM(length(CAST(content AS BLOB))), 0), "
+                "IFNULL(SUM(CASE codec WHEN 0 THEN length(CAST(content AS BLOB)) ELSE 0 END), 0) FROM ideas"
+            )
+            rows, compressed_rows, stored_bytes, raw_bytes = self.cursor.fetchone()
+
+        decoded = 0
+        decode_seconds = 0.0
+        after_id = 0
+        while True:
+            with self._lock:
+                self.cursor.execute(
+                    "SELECT id, content FROM ideas WHERE id > ? AND codec = ? ORDER BY id LIMIT ?",
+                    (after_id, CODEC_ZLIB, RECOMPRESS_BATCH)
+                )
+                batch = self.cursor.fetchall()
+            if not batch:
+                break
+            start = time.perf_counter()
+            for _, value in batch:
+                raw_bytes += len(zlib.decompress(value))
+            decode_seconds += time.perf_counter() - start
+            decoded += len(batch)
+            after_id = batch[-1][0]
+
+        return {
+            'rows': rows,
+            'compressed_rows': compressed_rows,
+            'stored_bytes': stored_bytes,
+            'raw_bytes': raw_bytes,
+            'saved_bytes': raw_bytes - stored_bytes,
+            'decode_ms_per_row': decode_seconds * 1000 / decoded if decoded else 0.0,
+            'decode_count': self.decode_count,
+            'decode_ms': self.decode_seconds * 1000
+        }
+
     def close(self):
         """关闭数据库连接"""
+        self._closed = True
         if self.conn:
-            self.conn.close()
\ No newline at end of file
+            with self._lock:
+                self.conn.close()
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""
+想法的流式导出
+
+按ID顺序逐批读取想法并立即写入文件，内存占用与想法总数无关。导出的文件可以用core.importer重新导入：
+
+- JSONL：每行一个JSON对象，字段为id、content、timestamp、tags、summary
+- Markdown：每条想法以 `## 记录时间` 开头，之后为 `tags:`、`summary:` 行和内容；
+  内容中以 `## ` 开头的行写为 `\\## `，导入时还原
+
+命令行用法（在程序目录下运行）：
+
+    python -m core.exporter ideas.jsonl [--format jsonl|markdown]
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Callable, List, Optional
+
+# 文件扩展名 -> 格式
+FORMAT_EXTENSIONS = {
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.md': 'markdown',
+    '.markdown': 'markdown',
+}
+# 每导出这么多条想法报告一次进度
+PROGRESS_INTERVAL = 5000
+
+
+def detect_format(path: str) -> str:
+    """根据扩展名判断导出格式"""
+    fmt = FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"无法识别导出格式: {path}（支持 .jsonl、.md）")
+    return fmt
+
+
+def _parse_tags(tags_json: Optional[str]) -> List[str]:
+    if not tags_json:
+        return []
+    try:
+        return [str(tag) for tag in json.loads(tags_json)]
+    except (ValueError, TypeError):
+        return []
+
+
+def format_jsonl(idea_id: int, content: str, timestamp: str, tags: List[str], summary: Optional[str]) -> str:
+    return json.dumps({
+        'id': idea_id,
+        'content': content,
+        'timestamp': timestamp,
+        'tags': tags,
+        'summary': summary,
+    }, ensure_ascii=False) + "\n"
+
+
+def format_markdown(idea_id: int, content: str, timestamp: str, tags: List[str], summary: Optional[str]) -> str:
+    lines = [f"## {timestamp}"]
+    if tags:
+        lines.append(f"tags: {', '.join(tags)}")
+    if summary:
+        lines.append(f"summary: {' '.join(summary.split())}")
+    lines.append("")
+    # 避免内容中的二级标题被导入时当作想法的分隔
+    lines.extend("\\" + line if line.startswith("## ") else line for line in content.splitlines())
+    lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+FORMATTERS = {
+    'jsonl': format_jsonl,
+    'markdown': format_markdown,
+}
+
+
+def export_ideas(db_handler, path: str, fmt: Optional[str] = None,
+                 progress: Optional[Callable[[int], None]] = None) -> int:
+    """
+    把全部想法导出到文件
+
+    先写入临时文件，完成后再替换目标文件，导出中途出错不会覆盖已有的文件。
+
+    Args:
+        db_handler: 数据库处理器实例
+        path: 导出文件路径
+        fmt: 'jsonl'或'markdown'，为None时根据扩展名判断
+        progress: 每导出PROGRESS_INTERVAL条调用一次，参数为已导出条数
+
+    Returns:
+        导出的想法条数
+    """
+    fmt = fmt or detect_format(path)
+    formatter = FORMATTERS.get(fmt)
+    if formatter is None:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+
+    count = 0
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8', newline='\n') as f:
+            for idea_id, content, timestamp, tags_json, summary in db_handler.iter_ideas():
+                f.write(formatter(idea_id, content, timestamp, _parse_tags(tags_json), summary))
+                count += 1
+                if progress is not None and count % PROGRESS_INTERVAL == 0:
+                    progress(count)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if progress is not None:
+        progress(count)
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m core.exporter", description="导出全部想法")
+    parser.add_argument('path', help="导出文件（.jsonl或.md）")
+    parser.add_argument('--format', choices=sorted(FORMATTERS), help="导出格式，默认根据扩展名判断")
+    args = parser.parse_args(argv)
+
+    from core.db_handler import DBHandler
+
+    db_handler = DBHandler()
+    try:
+        count = export_ideas(db_handler, args.path, args.format,
+                             lambda done: print(f"\r已导出 {done} 条", end="", flush=True))
+    except (OSError, ValueError) as e:
+        print(f"导出失败: {e}")
+        return 1
+    finally:
+        db_handler.close()
+    print(f"\n已导出 {count} 条想法到 {args.path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,19 @@
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Callable
 import datetime
+import threading
+from core import collation
+from core.write_behind import WriteBehindQueue
+from core.search_index import TrigramIndex
+from core.metadata_cache import MetadataCache
+from core.search_query import metadata_filters
+
+# 想法变更类型
+CHANGE_INSERTED = 'inserted'
+CHANGE_CONTENT_UPDATED = 'content_updated'
+CHANGE_ANALYSIS_UPDATED = 'analysis_updated'
+CHANGE_DELETED = 'deleted'
+# AI见解和提醒更新（不对应具体想法）
+CHANGE_INSIGHTS_UPDATED = 'insights_updated'
 
 
 class IdeaManager:
@@ -13,6 +27,110 @@ class IdeaManager:
         """
         self.db_handler = db_handler
         self.ai_processor = ai_processor
+        # 快速记录想法时使用的写后队列，多次重试仍未写入时通知写入错误监听器
+        self.write_error_listeners = []
+        self.write_queue = WriteBehindQueue(db_handler, on_error=self.notify_write_error)
+        # 模糊搜索使用的内存索引和只含标签、日期条件的查询使用的内存元数据缓存，
+        # 由start_background_tasks在后台加载或构建，就绪前查询改由数据库完成
+        self.search_index = TrigramIndex(db_handler)
+        self.metadata_cache = MetadataCache(db_handler)
+        # 在线备份和定时轮换备份，首次使用时创建，由主窗口按配置启动
+        self._backup_manager = None
+        
+        # 想法变更监听器，AI分析写入标签和摘要后也会通知
+        self.change_listeners = []
+        self.ai_processor.set_analysis_listener(
+            lambda idea_ids: self.notify_change(CHANGE_ANALYSIS_UPDATED, idea_ids)
+        )
+
+    def start_background_tasks(self):
+        """在后台加载搜索索引快照（或构建索引）并构建元数据缓存，预先导入生成排序键所需的拼音库"""
+        self.search_index.start()
+        self.metadata_cache.start()
+        threading.Thread(target=collation.preload, name="preload-pinyin", daemon=True).start()
+
+    @property
+    def backup_manager(self):
+        """在线备份和定时轮换备份的管理器"""
+        if self._backup_manager is None:
+            from core.backup import BackupManager
+            self._backup_manager = BackupManager(self.db_handler)
+        return self._backup_manager
+
+    def add_change_listener(self, listener: Callable[[str, List[int]], None]):
+        """
+        注册想法变更监听器
+        
+        监听器以(变更类型, 想法ID列表)为参数调用，调用发生在产生变更的线程中
+        （写后队列和AI分析均在后台线程），UI需要自行切换回主线程。
+        
+        Args:
+            listener: 监听函数
+        """
+        self.change_listeners.append(listener)
+
+    def notify_change(self, kind: str, idea_ids: List[int]):
+        """
+        通知所有监听器想法发生了变更
+        
+        Args:
+            kind: 变更类型，CHANGE_INSERTED、CHANGE_CONTENT_UPDATED或CHANGE_ANALYSIS_UPDATED
+            idea_ids: 发生变更的想法ID列表
+        """
+        for listener in list(self.change_listeners):
+            try:
+                listener(kind, list(idea_ids))
+            except Exception as e:
+                print(f"想法变更通知出错: {e}")
+
+    def add_write_error_listener(self, listener: Callable[[int, str], None]):
+        """
+        注册写入错误监听器
+        
+        写后队列多次重试仍写不进数据库时，在写线程中以(未写入的想法数, 错误信息)调用，
+        这些想法保存在待写文件中，之后会自动重试。
+        
+        Args:
+            listener: 监听函数
+        """
+        self.write_error_listeners.append(listener)
+
+    def notify_write_error(self, unsaved_count: int, error: str):
+        """通知所有写入错误监听器"""
+        for listener in list(self.write_error_listeners):
+            try:
+                listener(unsaved_count, error)
+            except Exception as e:
+                print(f"写入错误通知出错: {e}")
+
+    def get_change_version(self) -> int:
+        """获取当前的数据版本号"""
+        return self.db_handler.get_change_version()
+
+    def get_changes_since(self, version: int) -> Optional[Tuple[int, Dict[str, List[int]]]]:
+        """
+        获取某个版本之后的变化
+        
+        Args:
+            version: 视图上次同步到的版本号
+            
+        Returns:
+            (新版本号, {变更类型: 想法ID列表})；变更日志已被清理、无法增量同步时返回None
+        """
+        rows = self.db_handler.get_changes_since(version)
+        if rows is None:
+            return None
+        changes = {}
+        for _, idea_id, kind in rows:
+            ids = changes.setdefault(kind, {})
+            if idea_id is not None:
+                ids[idea_id] = None
+        new_version = rows[-1][0] if rows else version
+        return new_version, {kind: list(ids) for kind, ids in changes.items()}
+
+    def get_data_token(self) -> Tuple[int, int]:
+        """获取轻量的数据变化标记，与上次不同时说明数据可能已变化"""
+        return self.db_handler.get_data_token()
 
     def add_idea(self, idea: str) -> int:
         """
@@ -26,23 +144,188 @@ class IdeaManager:
         """
         # 存储想法到数据库
         idea_id = self.db_handler.store_idea(idea)
+        self.notify_change(CHANGE_INSERTED, [idea_id])
         
         # 尝试使用AI处理想法（生成标签等）
         # 避免阻塞UI，仅设置一个标记，让定时任务处理
         return idea_id
 
-    def query_ideas(self, query: str = None, sort_by: str = 'time') -> List[Tuple]:
+    def add_idea_async(self, idea: str, callback: Optional[Callable[[int], None]] = None):
+        """
+        把想法放入写后队列后立即返回，由后台线程写入数据库
+        
+        Args:
+            idea: 想法内容
+            callback: 写入完成后在后台线程中调用，参数为新想法的ID
+        """
+        def on_written(idea_id):
+            self.notify_change(CHANGE_INSERTED, [idea_id])
+            if callback is not None:
+                callback(idea_id)
+        
+        self.write_queue.put(idea, on_written)
+
+    def import_ideas(self, path: str, fmt: Optional[str] = None, restart: bool = False,
+                     progress: Optional[Callable[[int, int, int], None]] = None,
+                     should_stop: Optional[Callable[[], bool]] = None) -> Dict:
+        """
+        从JSONL、Markdown或CSV文件批量导入想法，每批写入后通知监听器
+        
+        Args:
+            path: 文件路径
+            fmt: 文件格式，为None时根据扩展名判断
+            restart: 忽略之前的导入进度，从头导入
+            progress: 进度回调，参数为(已读取字节数, 文件总字节数, 已导入条数)
+            should_stop: 每批写入后调用，返回True时停止导入，再次导入同一文件时从停止处继续
+            
+        Returns:
+            导入结果，字段见IdeaImporter.import_file
+        """
+        from core.importer import IdeaImporter
+        importer = IdeaImporter(self.db_handler)
+        return importer.import_file(
+            path, fmt, restart, progress,
+            on_batch=lambda idea_ids: self.notify_change(CHANGE_INSERTED, idea_ids),
+            should_stop=should_stop
+        )
+
+    def export_ideas(self, path: str, fmt: Optional[str] = None,
+                     progress: Optional[Callable[[int], None]] = None) -> int:
+        """
+        把全部想法流式导出为JSONL或Markdown文件
+        
+        Args:
+            path: 导出文件路径
+            fmt: 'jsonl'或'markdown'，为None时根据扩展名判断
+            progress: 进度回调，参数为已导出条数
+            
+        Returns:
+            导出的想法条数
+        """
+        from core.exporter import export_ideas
+        return export_ideas(self.db_handler, path, fmt, progress)
+
+    def export_site(self, output_dir: str, fmt: str = 'html',
+                    progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """
+        把想法和AI见解增量导出为静态网站，只重写有变化的页面
+        
+        Args:
+            output_dir: 输出目录
+            fmt: 'html'或'markdown'
+            progress: 进度回调，参数为(已写入页数, 需要写入的页数)
+            
+        Returns:
+            导出结果，见SiteExporter.export
+        """
+        self.flush_pending_writes()
+        from core.site_export import SiteExporter
+        exporter = SiteExporter(self.db_handler, output_dir, fmt)
+        return exporter.export(self.ai_processor.load_memory(), progress)
+
+    def backup_now(self, progress: Optional[Callable[[int, int], None]] = None) -> str:
+        """
+        立即在线备份数据库，并删除超出保留数的旧备份
+        
+        Args:
+            progress: 进度回调，参数为(已复制页数, 总页数)
+            
+        Returns:
+            备份文件路径
+        """
+        return self.backup_manager.backup_now(progress)
+
+    def flush_pending_writes(self):
+        """等待写后队列中的想法全部写入数据库"""
+        self.write_queue.flush()
+
+    def close(self):
+        """停止定时备份和写后队列，确保排队中的想法全部写入，并保存搜索索引快照"""
+        if self._backup_manager is not None:
+            self._backup_manager.stop()
+        self.write_queue.close()
+        self.search_index.sync()
+        self.search_index.save_snapshot()
+
+    def query_ideas(self, query: str = None, sort_by: str = 'time',
+                    limit: Optional[int] = None, offset: int = 0) -> List[Tuple]:
         """
         查询想法
         
         Args:
-            query: 查询关键词，如果为None则查询所有想法
-            sort_by: 排序方式，'time'按时间排序，'keyword'按关键词排序
+            query: 查询语句，如 `tag:产品 after:2025-01-01 has:summary -tag:done "完整短语"`，
+                   如果为None则查询所有想法
+            sort_by: 排序方式，'time'按时间排序，'keyword'按关键词排序，'relevance'按相关度排序
+            limit: 最多返回的条数，None表示不限制
+            offset: 跳过的条数，用于分页
+            
+        Returns:
+            想法列表，每个想法为一个元组，包含(时间戳, 内容预览, ID, 标签文本, 摘要, 显示时间, 排序键)；
+            按相关度排序时内容预览为带匹配词标记的摘录
+        """
+        return self.db_handler.query_ideas(query, sort_by, limit, offset)
+
+    def fuzzy_search(self, query: str, limit: int = 200) -> Optional[List[Tuple]]:
+        """
+        使用内存索引模糊搜索，容忍错字，按匹配程度排序
+        
+        Args:
+            query: 查询文本
+            limit: 最多返回的条数
             
         Returns:
-            想法列表，每个想法为一个元组，包含(时间, 内容, ID, 标签, 摘要)
+            想法列表，格式同query_ideas；索引尚未就绪时返回None
         """
-        return self.db_handler.query_ideas(query, sort_by)
+        if not self.search_index.ready:
+            return None
+        self.search_index.sync()
+        matches = self.search_index.search(query, limit)
+        return self.db_handler.get_ideas_by_ids([idea_id for idea_id, _ in matches])
+
+    def metadata_query(self, query: Optional[str], sort_by: str = 'time') -> Optional[List[int]]:
+        """
+        在内存元数据缓存中完成只含标签和日期条件的查询
+        
+        Args:
+            query: 查询语句，为None时查询所有想法
+            sort_by: 排序方式，'time'或'keyword'
+            
+        Returns:
+            排好序的想法ID列表；缓存尚未就绪、排序方式或查询条件不受支持时返回None，应改用query_ideas
+        """
+        if sort_by not in ('time', 'keyword') or not self.metadata_cache.ready:
+            return None
+        filters = metadata_filters(query or "")
+        if filters is None:
+            return None
+        self.metadata_cache.sync()
+        return self.metadata_cache.query(sort_by, **filters)
+
+    def get_list_rows(self, idea_ids: List[int]) -> List[Tuple]:
+        """
+        获取想法在列表中显示的数据，不包含完整内容
+        
+        Args:
+            idea_ids: 想法ID列表
+            
+        Returns:
+            想法列表，格式同query_ideas，顺序与idea_ids一致
+        """
+        return self.db_handler.get_ideas_by_ids(idea_ids)
+
+    def idea_matches(self, query: str, idea_id: int) -> bool:
+        """
+        判断想法是否符合查询语句，用于决定新想法是否出现在当前搜索结果中
+        
+        Args:
+            query: 查询语句
+            idea_id: 想法ID
+        """
+        return self.db_handler.idea_matches(query, idea_id)
+
+    def explain_query(self, query: str, sort_by: str = 'time') -> List[str]:
+        """获取搜索的执行计划，用于调试"""
+        return self.db_handler.explain_query(query, sort_by)
 
     def update_idea(self, idea_id: int, content: str) -> bool:
         """
@@ -57,6 +340,7 @@ class IdeaManager:
         """
         try:
             self.db_handler.update_idea_content(idea_id, content)
+            self.notify_change(CHANGE_CONTENT_UPDATED, [idea_id])
             return True
         except Exception as e:
             print(f"更新想法时出错: {e}")
@@ -78,17 +362,53 @@ class IdeaManager:
         """触发AI对想法的分析和总结"""
         self.ai_processor.process_ideas()
 
-    def query_ai(self, query: str) -> str:
+    def query_ai(self, query: str, before_id: Optional[int] = None) -> str:
         """
         向AI提问关于想法的问题
         
         Args:
             query: 问题内容
+            before_id: 当前问题在对话记录中的消息ID，它之前的对话会作为上下文
             
         Returns:
             AI的回答
         """
-        return self.ai_processor.query_ai(query)
+        return self.ai_processor.query_ai(query, before_id)
+
+    def add_chat_message(self, role: str, content: str) -> int:
+        """
+        保存一条AI对话消息
+        
+        Args:
+            role: 消息角色，user或assistant
+            content: 消息内容
+            
+        Returns:
+            新消息的ID
+        """
+        message_id = self.db_handler.store_chat_message(role, content)
+        # 一轮对话结束后，在后台更新较早对话的摘要
+        if role == 'assistant':
+            self.ai_processor.fold_conversation()
+        return message_id
+
+    def get_chat_messages(self, before_id: Optional[int] = None, limit: int = 50,
+                          after_id: Optional[int] = None) -> List[Dict]:
+        """
+        按页获取AI对话历史
+        
+        Args:
+            before_id: 只返回该消息之前的消息，为None时返回最新的一页
+            limit: 返回的最大条数
+            after_id: 只返回该消息之后的消息，为None时不限制
+            
+        Returns:
+            消息列表，按时间从早到晚排列
+        """
+        return [
+            {'id': row[0], 'role': row[1], 'content': row[2], 'timestamp': row[3]}
+            for row in self.db_handler.get_chat_messages(before_id, limit, after_id)
+        ]
 
     def get_upcoming_reminders(self) -> List[Dict]:
         """
@@ -108,6 +428,27 @@ class IdeaManager:
         """
         return self.ai_processor.get_insights()
 
+    def get_token_usage(self, days: int = 1) -> List[Dict]:
+        """
+        获取AI的token用量
+        
+        Args:
+            days: 统计的天数，1表示仅今天
+            
+        Returns:
+            按任务类型汇总的用量列表
+        """
+        return self.ai_processor.get_token_usage(days)
+
+    def get_compression_stats(self) -> Dict:
+        """
+        统计想法内容压缩节省的空间和解压开销
+        
+        Returns:
+            统计字典，字段见DBHandler.get_compression_stats
+        """
+        return self.db_handler.get_compression_stats()
+
     def format_datetime(self, timestamp: str) -> str:
         """
         格式化日期时间字符串
@@ -0,0 +1,394 @@
+"""
+想法的批量导入
+
+支持三种格式，文件按行流式读取，不会整个读入内存：
+
+- JSONL：每行一个JSON对象，字段为content、timestamp、tags（列表或逗号分隔的文本）、summary，
+  只有content是必需的；也可以每行一个JSON字符串
+- Markdown：以二级标题（`## `）分隔想法，标题为日期时间时作为记录时间，否则作为内容的第一行；
+  标题后紧跟的 `tags:`/`标签:`、`summary:`/`摘要:` 行为标签和摘要，内容中的 `\\## ` 还原为 `## `
+- CSV：第一行为表头，列名同JSONL的字段名
+
+每批想法在一个事务中写入，进度（已读取的字节偏移）随同一事务保存在数据库中，
+中断后再次导入同一文件会从上次的位置继续。大批量导入时暂停维护普通索引和全文索引，
+导入结束（或中断）后各重建一次，导入期间的搜索可能找不到新导入的想法。
+
+命令行用法（在程序目录下运行）：
+
+    python -m core.importer notes.jsonl [--format jsonl|markdown|csv] [--restart]
+"""
+import argparse
+import codecs
+import csv
+import datetime
+import json
+import os
+import re
+import sys
+import time
+from typing import Callable, Iterator, List, Optional, Tuple
+
+# 每个事务写入的想法数，事务期间其他数据库操作需要等待
+IMPORT_BATCH = 50000
+# 估算待导入条数时每条想法的平均字节数；估算条数超过已有想法的1/4时，导入期间暂停维护普通索引
+ESTIMATED_RECORD_BYTES = 200
+
+# 文件扩展名 -> 格式
+FORMAT_EXTENSIONS = {
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.md': 'markdown',
+    '.markdown': 'markdown',
+    '.csv': 'csv',
+}
+
+# 分隔多个标签的字符
+_TAG_SPLIT_RE = re.compile(r'[,，、;；]')
+# Markdown中标题后的元数据行
+_MD_META_RE = re.compile(r'^(tags|标签|summary|摘要)\s*[:：]\s*(.*)$', re.IGNORECASE)
+
+class ImportStateError(ValueError):
+    """文件已经导入过，或在上次导入后被修改，需要从头重新导入"""
+
+
+# 导入的一条想法：(内容, ISO格式时间戳, 标签列表或None, 摘要或None)
+Record = Tuple[str, str, Optional[List[str]], Optional[str]]
+
+
+def detect_format(path: str) -> str:
+    """根据扩展名判断文件格式"""
+    fmt = FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"无法识别文件格式: {path}（支持 .jsonl、.md、.csv）")
+    return fmt
+
+
+def parse_timestamp(value, default: str) -> str:
+    """
+    把各种形式的时间转换为ISO格式的本地时间
+
+    支持ISO格式文本（可带时区，转换为本地时间）、"2025-01-01 10:00"这样的文本和Unix时间戳（秒），
+    无法识别时返回default
+    """
+    if value is None or value == "":
+        return default
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.datetime.fromtimestamp(value).isoformat()
+        dt = datetime.datetime.fromisoformat(str(value).strip())
+    except (TypeError, ValueError, OverflowError, OSError):
+        return default
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return dt.isoformat()
+
+
+def parse_tags(value) -> Optional[List[str]]:
+    """把标签列表或逗号分隔的文本转换为标签列表，没有标签时返回None"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith('['):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        if isinstance(value, str):
+            value = _TAG_SPLIT_RE.split(value)
+    tags = [str(tag).strip() for tag in value if str(tag).strip()]
+    return tags or None
+
+
+def _make_record(fields: dict, default_time: str) -> Optional[Record]:
+    content = fields.get('content')
+    if content is None:
+        return None
+    content = str(content).strip()
+    if not content:
+        return None
+    summary = fields.get('summary')
+    return (
+        content,
+        parse_timestamp(fields.get('timestamp'), default_time),
+        parse_tags(fields.get('tags')),
+        str(summary).strip() or None if summary else None,
+    )
+
+
+class _LineReader:
+    """逐行读取二进制文件并解码，记录已读取到的字节偏移，供csv模块使用"""
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = f.tell()
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig' if self.offset == 0 else 'utf-8')()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return self._decoder.decode(line)
+
+
+def read_jsonl(f, default_time: str) -> Iterator[Tuple[Optional[Record], int]]:
+    """逐行解析JSONL，返回(想法或None, 该行之后的字节偏移)"""
+    offset = f.tell()
+    at_start = offset == 0
+    for line_number, line in enumerate(f, 1):
+        offset += len(line)
+        if at_start and line_number == 1 and line.startswith(codecs.BOM_UTF8):
+            line = line[len(codecs.BOM_UTF8):]
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            value = json.loads(line)
+        except ValueError:
+            print(f"导入时跳过无法解析的行（第{line_number}行）")
+            yield None, offset
+            continue
+        if isinstance(value, str):
+            value = {'content': value}
+        yield (_make_record(value, default_time) if isinstance(value, dict) else None), offset
+
+
+def read_csv(f, default_time: str) -> Iterator[Tuple[Optional[Record], int]]:
+    """逐行解析带表头的CSV，返回(想法或None, 该行之后的字节偏移)"""
+    start = f.tell()
+    f.seek(0)
+    reader = _LineReader(f)
+    header = [name.strip().lower() for name in next(csv.reader(reader), [])]
+    if 'content' not in header:
+        raise ValueError("CSV文件的表头中没有content列")
+    if start > reader.offset:
+        f.seek(start)
+        reader = _LineReader(f)
+    for row in csv.reader(reader):
+        yield _make_record(dict(zip(header, row)), default_time), reader.offset
+
+
+def read_markdown(f, default_time: str) -> Iterator[Tuple[Optional[Record], int]]:
+    """按二级标题分隔解析Markdown，返回(想法或None, 下一条想法开始处的字节偏移)"""
+    offset = f.tell()
+    decoder = codecs.getincrementaldecoder('utf-8-sig' if offset == 0 else 'utf-8')()
+    fields = None
+    lines = []
+    in_meta = False
+
+    def finish():
+        if fields is None and not any(line.strip() for line in lines):
+            return None
+        record_fields = dict(fields or {})
+        body = '\n'.join(lines).strip()
+        # 想法之间的分隔线不属于内容
+        if body.endswith('\n---') or body == '---':
+            body = body[:-3].strip()
+        record_fields['content'] = body
+        return _make_record(record_fields, default_time)
+
+    for raw in f:
+        line = decoder.decode(raw).rstrip('\r\n')
+        if line.startswith('## '):
+            if fields is not None or lines:
+                yield finish(), offset
+            heading = line[3:].strip()
+            timestamp = parse_timestamp(heading, None)
+            fields = {'timestamp': timestamp}
+            lines = [] if timestamp else [heading]
+            in_meta = True
+        elif in_meta and (match := _MD_META_RE.match(line.strip())):
+            key = match.group(1).lower()
+            fields['tags' if key in ('tags', '标签') else 'summary'] = match.group(2)
+        else:
+            in_meta = False
+            # 导出时转义的二级标题（见core.exporter）
+            if line.startswith('\\## '):
+                line = line[1:]
+            lines.append(line)
+        offset += len(raw)
+    if fields is not None or lines:
+        yield finish(), offset
+
+
+READERS = {
+    'jsonl': read_jsonl,
+    'markdown': read_markdown,
+    'csv': read_csv,
+}
+
+
+class IdeaImporter:
+    """
+    流式批量导入想法
+
+    文件边读边解析，每攒够IMPORT_BATCH条想法用一个事务写入（DBHandler.import_ideas），
+    导入进度以"import:文件绝对路径"为键保存在db_meta中，记录文件大小、修改时间、字节偏移和已导入条数。
+    """
+
+    def __init__(self, db_handler, batch_size: int = IMPORT_BATCH):
+        """
+        Args:
+            db_handler: 数据库处理器实例
+            batch_size: 每个事务写入的想法数
+        """
+        self.db_handler = db_handler
+        self.batch_size = batch_size
+
+    @staticmethod
+    def state_key(path: str) -> str:
+        return f"import:{os.path.abspath(path)}"
+
+    def import_file(self, path: str, fmt: Optional[str] = None, restart: bool = False,
+                    progress: Optional[Callable[[int, int, int], None]] = None,
+                    on_batch: Optional[Callable[[List[int]], None]] = None,
+                    should_stop: Optional[Callable[[], bool]] = None) -> dict:
+        """
+        导入文件
+
+        Args:
+            path: 文件路径
+            fmt: 'jsonl'、'markdown'或'csv'，为None时根据扩展名判断
+            restart: 忽略之前的进度，从头导入（已导入的想法会再导入一次）
+            progress: 每批写入后调用，参数为(已读取字节数, 文件总字节数, 已导入条数)
+            on_batch: 每批写入后调用，参数为新想法的ID列表
+            should_stop: 每批写入后调用，返回True时停止导入，之后可以继续
+
+        Returns:
+            {'imported': 本次导入的条数, 'total': 该文件累计导入的条数, 'skipped': 跳过的无效记录数,
+             'resumed': 是否从上次的进度继续, 'finished': 是否已读到文件末尾, 'seconds': 耗时}
+
+        Raises:
+            ValueError: 格式无法识别
+            ImportStateError: 文件已导入过或在上次导入后被修改，需要restart
+        """
+        fmt = fmt or detect_format(path)
+        reader = READERS.get(fmt)
+        if reader is None:
+            raise ValueError(f"不支持的导入格式: {fmt}")
+
+        stat = os.stat(path)
+        key = self.state_key(path)
+        state = None if restart else self._load_state(key)
+        if state is not None:
+            if state['size'] != stat.st_size or state['mtime'] != stat.st_mtime:
+                raise ImportStateError(f"{path} 在上次导入后已被修改，如需重新导入请使用restart")
+            if state.get('finished'):
+                raise ImportStateError(f"{path} 已经导入过（{state['count']}条），如需再次导入请使用restart")
+        state = state or {'size': stat.st_size, 'mtime': stat.st_mtime, 'offset': 0, 'count': 0}
+        resumed = state['offset'] > 0
+
+        # 没有时间的想法统一使用导入开始的时间
+        default_time = datetime.datetime.now().isoformat()
+        start = time.perf_counter()
+        imported = skipped = 0
+        stopped = False
+
+        def flush(batch, offset, finished=False):
+            state['offset'] = offset
+            state['count'] += len(batch)
+            state['finished'] = finished
+            first_id, last_id = self.db_handler.import_ideas(
+                batch, key, json.dumps(state, ensure_ascii=False), defer_fts=defer_indexes
+            )
+            if progress is not None:
+                progress(offset, stat.st_size, state['count'])
+            if on_batch is not None and last_id > first_id:
+                on_batch(list(range(first_id + 1, last_id + 1)))
+
+        # 大批量导入时先删除普通索引、暂停全文索引，导入结束（或中断）后一次性重建
+        estimated = (stat.st_size - state['offset']) // ESTIMATED_RECORD_BYTES
+        defer_indexes = estimated >= max(self.batch_size, self.db_handler.get_idea_count() // 4)
+        if defer_indexes:
+            self.db_handler.drop_idea_indexes()
+        try:
+            with open(path, 'rb') as f:
+                f.seek(state['offset'])
+                batch = []
+                offset = state['offset']
+                for record, offset in reader(f, default_time):
+                    if record is None:
+                        skipped += 1
+                        continue
+                    batch.append(record)
+                    if len(batch) >= self.batch_size:
+                        flush(batch, offset)
+                        imported += len(batch)
+                        batch = []
+                        if should_stop is not None and should_stop():
+                            stopped = True
+                            break
+                if not stopped:
+                    flush(batch, offset, finished=True)
+                    imported += len(batch)
+        finally:
+            if defer_indexes:
+                self.db_handler.create_idea_indexes()
+                self.db_handler.rebuild_fts_index()
+
+        return {
+            'imported': imported,
+            'total': state['count'],
+            'skipped': skipped,
+            'resumed': resumed,
+            'finished': not stopped,
+            'seconds': time.perf_counter() - start,
+        }
+
+    def _load_state(self, key: str) -> Optional[dict]:
+        value = self.db_handler.get_meta(key)
+        if value is None:
+            return None
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m core.importer", description="批量导入想法")
+    parser.add_argument('path', help="要导入的文件（.jsonl、.md或.csv）")
+    parser.add_argument('--format', choices=sorted(READERS), help="文件格式，默认根据扩展名判断")
+    parser.add_argument('--restart', action='store_true', help="忽略之前的导入进度，从头导入")
+    parser.add_argument('--batch', type=int, default=IMPORT_BATCH, help="每个事务写入的想法数")
+    args = parser.parse_args(argv)
+
+    from core.db_handler import DBHandler
+    from utils.config_manager import ConfigManager
+
+    db_handler = DBHandler()
+    db_handler.compress_threshold = ConfigManager().read_config().get('compress_threshold', 0)
+    importer = IdeaImporter(db_handler, max(1, args.batch))
+    start = time.perf_counter()
+
+    def report(done, total, count):
+        elapsed = time.perf_counter() - start
+        percent = done * 100 / total if total else 100
+        print(f"\r已导入 {count} 条（{percent:.1f}%），{count / max(elapsed, 1e-6):.0f} 条/秒",
+              end="", flush=True)
+
+    try:
+        result = importer.import_file(args.path, args.format, args.restart, report)
+    except (OSError, ValueError) as e:
+        print(f"导入失败: {e}")
+        return 1
+    except KeyboardInterrupt:
+        print("\n导入已中断，再次运行同一命令会从中断处继续")
+        return 130
+    finally:
+        db_handler.close()
+
+    print()
+    if result['resumed']:
+        print("（从上次中断的位置继续）")
+    print(f"本次导入 {result['imported']} 条想法，跳过 {result['skipped']} 条无效记录，"
+          f"耗时 {result['seconds']:.1f} 秒")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
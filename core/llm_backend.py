@@ -0,0 +1,213 @@
+import threading
+import time
+from typing import List, Dict, Optional, Callable
+
+
+DEFAULT_API_BASE = "http://127.0.0.1:1234/v1"
+
+
+class LLMError(Exception):
+    """LLM后端调用失败时抛出的异常"""
+
+
+class LLMBackend:
+    """
+    LLM后端接口
+
+    所有后端都实现 chat() 方法，接收OpenAI格式的消息列表，返回统一格式的结果字典：
+    {'content': 回复文本, 'model': 实际使用的模型, 'usage': {'prompt_tokens': .., 'completion_tokens': ..}}
+    请求失败时只抛出 LLMError，模型池据此记录端点失败并切换到其他端点。
+    """
+
+    name = "base"
+
+    def chat(self, messages: List[Dict], model: str, max_tokens: Optional[int] = None,
+             temperature: float = 0.7, timeout: Optional[float] = None) -> Dict:
+        raise NotImplementedError
+
+    def update_credentials(self, api_key: str):
+        """更新API密钥，默认不做任何事"""
+
+    def close(self):
+        """释放后端持有的资源"""
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    OpenAI兼容的HTTP后端，使用连接池化的 requests.Session 复用keep-alive连接
+    """
+
+    name = "openai"
+
+    def __init__(self, api_base: str = DEFAULT_API_BASE, api_key: str = "",
+                 timeout: float = 60, pool_size: int = 4, max_retries: int = 0):
+        """
+        初始化后端
+
+        Args:
+            api_base: API根地址，如 http://127.0.0.1:1234/v1
+            api_key: API密钥，本地服务可为空
+            timeout: 默认请求超时时间，单位为秒
+            pool_size: 连接池中保持的最大连接数
+            max_retries: 连接失败时的重试次数
+        """
+        self.api_base = api_base.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        """获取（必要时创建）共享的HTTP会话，requests 在第一次AI请求时才导入以加快启动"""
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.pool_size,
+                    max_retries=self.max_retries
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def update_credentials(self, api_key: str):
+        self.api_key = api_key
+
+    def chat(self, messages: List[Dict], model: str, max_tokens: Optional[int] = None,
+             temperature: float = 0.7, timeout: Optional[float] = None) -> Dict:
+        try:
+            import requests
+        except ImportError as e:
+            raise LLMError(f"未安装requests，无法请求 {self.api_base}: {e}") from e
+
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature
+        }
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        try:
+            response = self._get_session().post(
+                f"{self.api_base}/chat/completions",
+                json=payload,
+                headers=headers,
+                timeout=timeout if timeout is not None else self.timeout
+            )
+        except (requests.RequestException, ValueError, TypeError) as e:
+            # ValueError/TypeError：地址无效或消息无法编码为JSON等
+            raise LLMError(f"请求 {self.api_base} 失败: {e}") from e
+
+        if response.status_code != 200:
+            raise LLMError(f"{self.api_base} 返回错误状态 {response.status_code}: {response.text[:200]}")
+
+        try:
+            data = response.json()
+            content = data["choices"][0]["message"]["content"]
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise LLMError(f"无法解析 {self.api_base} 的回复: {e}") from e
+
+        return {
+            "content": content or "",
+            "model": data.get("model", model),
+            "usage": data.get("usage") or {}
+        }
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+class FakeBackend(LLMBackend):
+    """
+    进程内的假后端，不发出任何网络请求，用于测试和离线调试
+
+    可以传入固定回复列表（按顺序循环返回），或传入一个处理函数 handler(messages, model) -> str。
+    所有调用都会记录在 self.calls 中。
+    """
+
+    name = "fake"
+
+    def __init__(self, responses: Optional[List[str]] = None,
+                 handler: Optional[Callable[[List[Dict], str], str]] = None,
+                 latency: float = 0.0):
+        self.responses = list(responses or [])
+        self.handler = handler
+        self.latency = latency
+        self.calls = []
+        self._index = 0
+        self._lock = threading.Lock()
+
+    def chat(self, messages: List[Dict], model: str, max_tokens: Optional[int] = None,
+             temperature: float = 0.7, timeout: Optional[float] = None) -> Dict:
+        with self._lock:
+            self.calls.append({
+                "messages": messages,
+                "model": model,
+                "max_tokens": max_tokens,
+                "temperature": temperature
+            })
+            if self.handler is not None:
+                content = None
+            elif self.responses:
+                content = self.responses[self._index % len(self.responses)]
+                self._index += 1
+            else:
+                content = ""
+
+        if self.latency:
+            time.sleep(self.latency)
+        if content is None:
+            try:
+                content = self.handler(messages, model)
+            except LLMError:
+                raise
+            except Exception as e:
+                raise LLMError(f"假后端处理请求失败: {e}") from e
+
+        prompt_chars = sum(len(m.get("content", "")) for m in messages)
+        return {
+            "content": content,
+            "model": model,
+            "usage": {
+                "prompt_tokens": prompt_chars,
+                "completion_tokens": len(content)
+            }
+        }
+
+
+def create_backend(config: Dict) -> LLMBackend:
+    """
+    根据配置创建LLM后端
+
+    Args:
+        config: 配置字典，读取 llm_backend、api_base、openai_api_key、llm_timeout、llm_pool_size 字段
+
+    Returns:
+        LLM后端实例
+    """
+    kind = config.get("llm_backend", "openai")
+    if kind == "fake":
+        return FakeBackend()
+    if kind != "openai":
+        print(f"未知的LLM后端类型 {kind}，使用openai兼容后端")
+
+    return OpenAICompatibleBackend(
+        api_base=config.get("api_base", DEFAULT_API_BASE),
+        api_key=config.get("openai_api_key", ""),
+        timeout=config.get("llm_timeout", 60),
+        pool_size=config.get("llm_pool_size", 4)
+    )
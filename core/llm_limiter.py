@@ -0,0 +1,170 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+# 请求优先级，数值越小优先级越高
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+
+class AdmissionController:
+    """
+    所有LLM请求共享的优先级准入控制器
+
+    - 总并发数不超过 max_concurrency，其中始终为交互请求保留一个名额
+    - 有交互请求排队时，批量请求一律等待，交互请求优先获得空出的名额
+    - 交互请求的端到端延迟超过目标值时，批量并发上限减半；延迟的滑动平均也超过目标值时上限降为0，
+      暂停接纳批量请求（已在进行的不受影响）
+    - 此后没有再出现慢交互请求时，每过 recovery_interval 秒批量上限加一，直到恢复为 max_concurrency - 1；
+      回升按时间进行，暂停期间没有任何请求完成也能恢复
+    """
+
+    EWMA_ALPHA = 0.3
+
+    def __init__(self, max_concurrency: int = 4, interactive_latency_target: float = 3.0,
+                 recovery_interval: float = 10.0):
+        """
+        初始化准入控制器
+
+        Args:
+            max_concurrency: 同时进行的LLM请求上限，至少为2（一个批量名额加一个保留给交互请求的名额）
+            interactive_latency_target: 交互请求的目标延迟（秒）
+            recovery_interval: 批量上限每次回升前需要保持的无慢请求时间（秒）
+        """
+        # 只有一个名额时无法既为交互请求保留名额又让批量请求运行，至少需要两个
+        self.max_concurrency = max(2, max_concurrency)
+        self.max_batch = self.max_concurrency - 1
+        self.batch_limit = self.max_batch
+        self.interactive_latency_target = interactive_latency_target
+        self.recovery_interval = recovery_interval
+        self.interactive_latency = None
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._active_batch = 0
+        self._waiting = {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 0}
+        # 上次降低或回升批量上限的时间
+        self._last_adjust = 0.0
+
+    def _can_admit(self, priority: int) -> bool:
+        if self._active >= self.max_concurrency:
+            return False
+        if priority == PRIORITY_INTERACTIVE:
+            return True
+        if self._waiting[PRIORITY_INTERACTIVE]:
+            return False
+        return self._active_batch < self.batch_limit
+
+    def _recover(self, now: float):
+        """距上次调整每满 recovery_interval 秒，批量上限加一"""
+        while self.batch_limit < self.max_batch and now - self._last_adjust >= self.recovery_interval:
+            self.batch_limit += 1
+            self._last_adjust += self.recovery_interval
+
+    def _recovery_delay(self, now: float) -> Optional[float]:
+        """距批量上限下次回升的秒数，已是最大值时返回None"""
+        if self.batch_limit >= self.max_batch:
+            return None
+        return max(0.0, self._last_adjust + self.recovery_interval - now)
+
+    def acquire(self, priority: int = PRIORITY_BATCH, timeout: Optional[float] = None) -> bool:
+        """
+        申请一个请求名额
+
+        Args:
+            priority: 请求优先级
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            是否成功获得名额
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._recover(now)
+                    if self._can_admit(priority):
+                        break
+                    # 批量请求还要在上限回升时醒来，回升不一定伴随其他请求完成
+                    wait = self._recovery_delay(now) if priority == PRIORITY_BATCH else None
+                    if deadline is not None:
+                        if now >= deadline:
+                            return False
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self._cond.wait(wait)
+                self._active += 1
+                if priority == PRIORITY_BATCH:
+                    self._active_batch += 1
+                return True
+            finally:
+                self._waiting[priority] -= 1
+                # 排队状态变化可能让其他等待者满足条件
+                self._cond.notify_all()
+
+    def release(self, priority: int = PRIORITY_BATCH, elapsed: Optional[float] = None):
+        """
+        归还请求名额
+
+        Args:
+            priority: 请求优先级
+            elapsed: 请求的端到端耗时（秒），用于调整批量并发上限
+        """
+        with self._cond:
+            self._active -= 1
+            now = time.monotonic()
+            self._recover(now)
+            if priority == PRIORITY_BATCH:
+                self._active_batch -= 1
+            elif elapsed is not None:
+                if self.interactive_latency is None:
+                    self.interactive_latency = elapsed
+                else:
+                    self.interactive_latency = ((1 - self.EWMA_ALPHA) * self.interactive_latency
+                                                + self.EWMA_ALPHA * elapsed)
+                if elapsed > self.interactive_latency_target:
+                    self._last_adjust = now
+                    if self.interactive_latency > self.interactive_latency_target:
+                        self.batch_limit = 0
+                    else:
+                        self.batch_limit //= 2
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_BATCH, timeout: Optional[float] = None):
+        """
+        以上下文管理器的方式占用一个名额，耗时包含排队等待时间
+
+        Raises:
+            TimeoutError: 在timeout秒内没有获得名额
+        """
+        start = time.monotonic()
+        if not self.acquire(priority, timeout):
+            raise TimeoutError("等待LLM请求名额超时")
+        try:
+            yield
+        finally:
+            self.release(priority, time.monotonic() - start)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            self._recover(time.monotonic())
+            return {
+                "active": self._active,
+                "active_batch": self._active_batch,
+                "waiting_interactive": self._waiting[PRIORITY_INTERACTIVE],
+                "waiting_batch": self._waiting[PRIORITY_BATCH],
+                "batch_limit": self.batch_limit,
+                "interactive_latency": self.interactive_latency
+            }
+
+
+def create_admission_controller(config: Dict) -> AdmissionController:
+    """根据配置（llm_max_concurrency、interactive_latency_target）创建准入控制器"""
+    return AdmissionController(
+        max_concurrency=config.get("llm_max_concurrency", 4),
+        interactive_latency_target=config.get("interactive_latency_target", 3.0)
+    )
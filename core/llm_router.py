@@ -0,0 +1,217 @@
+import threading
+import time
+from typing import List, Dict, Optional
+
+from core.llm_backend import LLMBackend, LLMError, OpenAICompatibleBackend, DEFAULT_API_BASE
+
+
+# AI任务类型
+TASK_TAGS = "tags"
+TASK_SUMMARY = "summary"
+TASK_INSIGHTS = "insights"
+TASK_CHAT = "chat"
+
+DEFAULT_POOL = "default"
+
+# 默认的任务路由：标签和摘要走小模型，见解和对话走大模型
+DEFAULT_TASK_ROUTES = {
+    TASK_TAGS: "small",
+    TASK_SUMMARY: "small",
+    TASK_INSIGHTS: "large",
+    TASK_CHAT: "large"
+}
+
+
+class Endpoint:
+    """模型池中的单个推理端点，记录其观测到的延迟、并发数和失败情况"""
+
+    # 延迟指数滑动平均的权重
+    EWMA_ALPHA = 0.3
+    # 尚未观测到延迟时使用的先验值（秒）
+    INITIAL_LATENCY = 1.0
+    # 失败后的冷却时间（秒），连续失败时翻倍
+    BASE_COOLDOWN = 5.0
+    MAX_COOLDOWN = 120.0
+
+    def __init__(self, backend: LLMBackend, model: str, name: str = ""):
+        self.backend = backend
+        self.model = model
+        self.name = name or getattr(backend, "api_base", backend.name)
+        self.latency = self.INITIAL_LATENCY
+        self.in_flight = 0
+        self.failures = 0
+        self.cooldown_until = 0.0
+
+    def score(self) -> float:
+        """负载评分，越小越优先"""
+        return self.latency * (self.in_flight + 1)
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def record_success(self, elapsed: float):
+        self.latency = (1 - self.EWMA_ALPHA) * self.latency + self.EWMA_ALPHA * elapsed
+        self.failures = 0
+        self.cooldown_until = 0.0
+
+    def record_failure(self, now: float):
+        self.failures += 1
+        cooldown = min(self.BASE_COOLDOWN * (2 ** (self.failures - 1)), self.MAX_COOLDOWN)
+        self.cooldown_until = now + cooldown
+
+    def stats(self) -> Dict:
+        return {
+            "name": self.name,
+            "model": self.model,
+            "latency": round(self.latency, 3),
+            "in_flight": self.in_flight,
+            "failures": self.failures
+        }
+
+
+class ModelPool:
+    """
+    模型池，包含提供同一类模型的多个端点
+
+    每次请求按 延迟 x (并发数+1) 选择负载最低的可用端点，端点出错时自动切换到下一个。
+    """
+
+    def __init__(self, name: str, endpoints: List[Endpoint]):
+        if not endpoints:
+            raise ValueError(f"模型池 {name} 至少需要一个端点")
+        self.name = name
+        self.endpoints = endpoints
+        self._lock = threading.Lock()
+
+    def _ordered_endpoints(self) -> List[Endpoint]:
+        """按优先级排序端点：可用的按负载评分，冷却中的按冷却结束时间排在最后"""
+        now = time.monotonic()
+        with self._lock:
+            available = [e for e in self.endpoints if e.is_available(now)]
+            cooling = [e for e in self.endpoints if not e.is_available(now)]
+            available.sort(key=lambda e: e.score())
+            cooling.sort(key=lambda e: e.cooldown_until)
+        return available + cooling
+
+    def chat(self, messages: List[Dict], max_tokens: Optional[int] = None,
+             temperature: float = 0.7, timeout: Optional[float] = None) -> Dict:
+        """
+        在池内选择端点发送请求，失败时依次切换到其他端点
+
+        Raises:
+            LLMError: 所有端点均失败时抛出
+        """
+        errors = []
+        for endpoint in self._ordered_endpoints():
+            with self._lock:
+                endpoint.in_flight += 1
+            start = time.monotonic()
+            succeeded = False
+            try:
+                result = endpoint.backend.chat(
+                    messages,
+                    model=endpoint.model,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    timeout=timeout
+                )
+                succeeded = True
+            except LLMError as e:
+                print(f"端点 {endpoint.name} 请求失败，尝试切换: {e}")
+                errors.append(str(e))
+                continue
+            finally:
+                # 其他异常（后端的程序错误）同样记为端点失败后向上抛出
+                with self._lock:
+                    endpoint.in_flight -= 1
+                    if succeeded:
+                        endpoint.record_success(time.monotonic() - start)
+                    else:
+                        endpoint.record_failure(time.monotonic())
+            result["endpoint"] = endpoint.name
+            return result
+
+        raise LLMError(f"模型池 {self.name} 的所有端点均请求失败: {'; '.join(errors)}")
+
+    def stats(self) -> List[Dict]:
+        with self._lock:
+            return [e.stats() for e in self.endpoints]
+
+
+class ModelRouter:
+    """按任务类型把请求分派到对应的模型池"""
+
+    def __init__(self, pools: Dict[str, ModelPool], routes: Optional[Dict[str, str]] = None,
+                 default_pool: str = DEFAULT_POOL):
+        if default_pool not in pools:
+            raise ValueError(f"未找到默认模型池 {default_pool}")
+        self.pools = pools
+        self.routes = dict(routes or {})
+        self.default_pool = default_pool
+
+    def pool_for(self, task: str) -> ModelPool:
+        """获取任务对应的模型池，未配置或不存在时使用默认池"""
+        return self.pools.get(self.routes.get(task, self.default_pool), self.pools[self.default_pool])
+
+    def chat(self, task: str, messages: List[Dict], max_tokens: Optional[int] = None,
+             temperature: float = 0.7, timeout: Optional[float] = None) -> Dict:
+        return self.pool_for(task).chat(messages, max_tokens, temperature, timeout)
+
+    def stats(self) -> Dict[str, List[Dict]]:
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+    def close(self, keep: Optional[LLMBackend] = None):
+        """关闭所有池的后端，keep 指定的后端除外（通常是调用方自己持有的默认后端）"""
+        for pool in self.pools.values():
+            for endpoint in pool.endpoints:
+                if endpoint.backend is not keep:
+                    endpoint.backend.close()
+
+
+def _build_endpoint(spec, pool_model: str, config: Dict) -> Endpoint:
+    """根据配置项创建端点，spec 可以是地址字符串或包含 api_base/api_key/model 的字典"""
+    if isinstance(spec, str):
+        spec = {"api_base": spec}
+    backend = OpenAICompatibleBackend(
+        api_base=spec.get("api_base", config.get("api_base", DEFAULT_API_BASE)),
+        api_key=spec.get("api_key", config.get("openai_api_key", "")),
+        timeout=spec.get("timeout", config.get("llm_timeout", 60)),
+        pool_size=config.get("llm_pool_size", 4)
+    )
+    return Endpoint(backend, spec.get("model", pool_model), spec.get("name", ""))
+
+
+def create_router(config: Dict, default_backend: LLMBackend, default_model: str) -> ModelRouter:
+    """
+    根据配置创建模型路由器
+
+    配置格式：
+        "model_pools": {
+            "small": {"model": "qwen2.5-1.5b", "endpoints": ["http://127.0.0.1:1234/v1", "http://127.0.0.1:1235/v1"]},
+            "large": {"model": "qwen2.5-14b", "endpoints": [{"api_base": "http://10.0.0.2:8000/v1"}]}
+        },
+        "task_routes": {"tags": "small", "summary": "small", "insights": "large", "chat": "large"}
+
+    未配置 model_pools 时，所有任务都使用默认后端和默认模型。
+
+    Args:
+        config: 配置字典
+        default_backend: 默认后端，组成 default 池
+        default_model: 默认模型名
+
+    Returns:
+        模型路由器
+    """
+    pools = {DEFAULT_POOL: ModelPool(DEFAULT_POOL, [Endpoint(default_backend, default_model)])}
+
+    for name, pool_config in (config.get("model_pools") or {}).items():
+        model = pool_config.get("model", default_model)
+        endpoints = [_build_endpoint(spec, model, config) for spec in pool_config.get("endpoints", [])]
+        if not endpoints:
+            # 没有单独配置端点的池复用默认后端，只切换模型
+            endpoints = [Endpoint(default_backend, model)]
+        pools[name] = ModelPool(name, endpoints)
+
+    routes = dict(DEFAULT_TASK_ROUTES)
+    routes.update(config.get("task_routes") or {})
+    return ModelRouter(pools, routes)
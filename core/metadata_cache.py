@@ -0,0 +1,312 @@
+import bisect
+import datetime
+import json
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+# numpy是可选依赖，没有时用纯Python排序和过滤；在rebuild中才导入，不拖慢启动
+np = None
+_numpy_loaded = False
+
+
+def _load_numpy():
+    global np, _numpy_loaded
+    if not _numpy_loaded:
+        _numpy_loaded = True
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            pass
+
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def timestamp_to_int(timestamp: str) -> int:
+    """把ISO格式的时间戳（本地时间，不带时区）转换为自1970年起的微秒数，无法解析时为0"""
+    try:
+        dt = datetime.datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return 0
+    if dt.tzinfo is not None:
+        dt = dt.replace(tzinfo=None)
+    return (dt - _EPOCH) // datetime.timedelta(microseconds=1)
+
+
+class MetadataCache:
+    """
+    内存中按列存储的想法元数据，用于不含文本条件的排序和过滤
+
+    每个想法占用一个固定的槽位，各列（ID、时间戳、内容字符数）为按槽位排列的int64数组，
+    排序键为字符串列表，标签以"标签ID -> 槽位集合"保存。按时间和按关键词的排列顺序
+    计算一次后缓存，数据变化时失效；过滤时用numpy生成布尔掩码，只需微秒到毫秒级。
+    查询只返回排好序的想法ID，界面按需读取可见的那一页。
+
+    缓存在后台线程中构建，之后通过变更日志增量同步。
+    """
+
+    def __init__(self, db_handler):
+        """
+        Args:
+            db_handler: 数据库处理器实例
+        """
+        self.db_handler = db_handler
+        self._lock = threading.RLock()
+        # 保证同一时间只有一个线程在同步（读取变更和应用变更之间不能交错）
+        self._sync_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._building = False
+        self._reset()
+
+    def _reset(self):
+        self._ids = array('q')
+        self._times = array('q')
+        self._lengths = array('q')
+        self._alive = bytearray()
+        self._keys: List[str] = []
+        # 想法ID -> 槽位
+        self._slots: Dict[int, int] = {}
+        # 标签（小写）-> 标签ID；标签ID -> 槽位集合；槽位 -> 标签ID元组
+        self._tag_ids: Dict[str, int] = {}
+        self._tag_slots: List[set] = []
+        self._slot_tags: List[tuple] = []
+        # 缓存的排列顺序（槽位数组），数据变化时清除
+        self._orders = {}
+        # 按(排序键, ID, 槽位)排好序的列表，首次按关键词排序时建立，之后随修改增量维护
+        self._key_sorted: Optional[list] = None
+        self.data_version = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def start(self):
+        """在后台线程中构建缓存"""
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+            self._ready.clear()
+        threading.Thread(target=self._build, name="metadata-cache", daemon=True).start()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def _build(self):
+        try:
+            self.rebuild()
+            self._ready.set()
+            self.sync()
+        except Exception as e:
+            print(f"构建元数据缓存时出错: {e}")
+        finally:
+            with self._lock:
+                self._building = False
+
+    def rebuild(self):
+        """从数据库完整构建缓存"""
+        _load_numpy()
+        version = self.db_handler.get_change_version()
+        rows = self.db_handler.get_idea_metadata()
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._put(*row)
+            self.data_version = version
+
+    def _tag_id(self, tag: str) -> int:
+        key = tag.lower()
+        tag_id = self._tag_ids.get(key)
+        if tag_id is None:
+            tag_id = self._tag_ids[key] = len(self._tag_slots)
+            self._tag_slots.append(set())
+        return tag_id
+
+    def _put(self, idea_id: int, timestamp: str, key: Optional[str], length: Optional[int],
+             tags_json: Optional[str]):
+        """添加想法或原地更新已有想法的槽位"""
+        try:
+            tags = json.loads(tags_json) if tags_json else []
+        except ValueError:
+            tags = []
+        tag_ids = tuple({self._tag_id(str(tag)) for tag in tags})
+
+        key = key or ""
+        slot = self._slots.get(idea_id)
+        if self._key_sorted is not None:
+            if slot is not None:
+                self._discard_key(slot)
+            bisect.insort(self._key_sorted, (key, idea_id, len(self._ids) if slot is None else slot))
+        if slot is None:
+            slot = len(self._ids)
+            self._slots[idea_id] = slot
+            self._ids.append(idea_id)
+            self._times.append(timestamp_to_int(timestamp))
+            self._lengths.append(length or 0)
+            self._alive.append(1)
+            self._keys.append(key)
+            self._slot_tags.append(())
+        else:
+            self._times[slot] = timestamp_to_int(timestamp)
+            self._lengths[slot] = length or 0
+            self._keys[slot] = key
+        for tag_id in self._slot_tags[slot]:
+            self._tag_slots[tag_id].discard(slot)
+        for tag_id in tag_ids:
+            self._tag_slots[tag_id].add(slot)
+        self._slot_tags[slot] = tag_ids
+        self._orders.clear()
+
+    def _discard_key(self, slot: int):
+        entry = (self._keys[slot], self._ids[slot], slot)
+        position = bisect.bisect_left(self._key_sorted, entry)
+        if position < len(self._key_sorted) and self._key_sorted[position] == entry:
+            del self._key_sorted[position]
+
+    def _remove(self, idea_id: int):
+        slot = self._slots.pop(idea_id, None)
+        if slot is None:
+            return
+        if self._key_sorted is not None:
+            self._discard_key(slot)
+        self._alive[slot] = 0
+        for tag_id in self._slot_tags[slot]:
+            self._tag_slots[tag_id].discard(slot)
+        self._slot_tags[slot] = ()
+
+    def sync(self):
+        """应用变更日志中缓存版本之后的变化，没有变化时只需一次简单查询"""
+        if not self.ready:
+            return
+        with self._sync_lock:
+            self._sync()
+
+    def _sync(self):
+        rows = self.db_handler.get_changes_since(self.data_version)
+        if rows is None:
+            # 变更日志已被清理，无法增量同步，就地完整重建。
+            # 不能调用start()：从_build同步时_building仍为True，start()会直接返回
+            self.rebuild()
+            return
+        if not rows:
+            return
+
+        changed = set()
+        deleted = set()
+        for _, idea_id, kind in rows:
+            if idea_id is None:
+                continue
+            if kind == 'deleted':
+                deleted.add(idea_id)
+                changed.discard(idea_id)
+            else:
+                changed.add(idea_id)
+                deleted.discard(idea_id)
+
+        metadata = self.db_handler.get_idea_metadata(list(changed)) if changed else []
+        with self._lock:
+            for idea_id in deleted:
+                self._remove(idea_id)
+            found = set()
+            for row in metadata:
+                self._put(*row)
+                found.add(row[0])
+            for idea_id in changed - found:
+                self._remove(idea_id)
+            self.data_version = rows[-1][0]
+
+    def _order(self, sort_by: str):
+        """按排序方式排列的全部槽位（含已删除的槽位），计算后缓存"""
+        order = self._orders.get(sort_by)
+        if order is not None:
+            return order
+        if sort_by == 'keyword':
+            # 与数据库的 ORDER BY sort_key, id 一致；已删除的槽位不在列表中
+            if self._key_sorted is None:
+                keys, ids, slots = self._keys, self._ids, self._slots
+                self._key_sorted = sorted((keys[slot], ids[slot], slot) for slot in slots.values())
+            if np is not None:
+                order = np.fromiter((entry[2] for entry in self._key_sorted), dtype=np.int64,
+                                    count=len(self._key_sorted))
+            else:
+                order = [entry[2] for entry in self._key_sorted]
+        elif np is not None:
+            # 时间从新到旧，时间相同时ID大的在前
+            order = np.lexsort((
+                np.frombuffer(self._ids, dtype=np.int64),
+                np.frombuffer(self._times, dtype=np.int64)
+            ))[::-1]
+        else:
+            times, ids = self._times, self._ids
+            order = sorted(range(len(ids)), key=lambda slot: (times[slot], ids[slot]), reverse=True)
+        self._orders[sort_by] = order
+        return order
+
+    def query(self, sort_by: str = 'time', tags: Iterable[str] = (), exclude_tags: Iterable[str] = (),
+              after: Optional[str] = None, before: Optional[str] = None) -> List[int]:
+        """
+        在内存中过滤和排序
+
+        Args:
+            sort_by: 'time'按时间从新到旧，'keyword'按排序键
+            tags: 必须全部带有的标签（不区分大小写）
+            exclude_tags: 不能带有的标签
+            after: 只保留该日期（含）之后的想法，ISO格式
+            before: 只保留该日期之前的想法，ISO格式
+
+        Returns:
+            符合条件的想法ID，按排序方式排列
+        """
+        with self._lock:
+            required = []
+            for tag in tags:
+                tag_id = self._tag_ids.get(tag.lower())
+                if tag_id is None:
+                    return []
+                required.append(self._tag_slots[tag_id])
+            excluded = [self._tag_slots[self._tag_ids[tag.lower()]]
+                        for tag in exclude_tags if tag.lower() in self._tag_ids]
+            lower = timestamp_to_int(after) if after else None
+            upper = timestamp_to_int(before) if before else None
+            order = self._order(sort_by)
+
+            if np is not None:
+                return self._query_numpy(order, required, excluded, lower, upper)
+            return self._query_python(order, required, excluded, lower, upper)
+
+    def _query_numpy(self, order, required, excluded, lower, upper):
+        mask = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+        times = np.frombuffer(self._times, dtype=np.int64)
+        if lower is not None:
+            mask &= times >= lower
+        if upper is not None:
+            mask &= times < upper
+        for slots in required:
+            tag_mask = np.zeros(len(mask), dtype=bool)
+            tag_mask[np.fromiter(slots, dtype=np.int64, count=len(slots))] = True
+            mask &= tag_mask
+        for slots in excluded:
+            mask[np.fromiter(slots, dtype=np.int64, count=len(slots))] = False
+        ids = np.frombuffer(self._ids, dtype=np.int64)
+        return ids[order[mask[order]]].tolist()
+
+    def _query_python(self, order, required, excluded, lower, upper):
+        alive, times, ids = self._alive, self._times, self._ids
+        excluded_slots = set().union(*excluded) if excluded else set()
+        result = []
+        for slot in order:
+            if not alive[slot] or slot in excluded_slots:
+                continue
+            if lower is not None and times[slot] < lower:
+                continue
+            if upper is not None and times[slot] >= upper:
+                continue
+            if any(slot not in slots for slots in required):
+                continue
+            result.append(ids[slot])
+        return result
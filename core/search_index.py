@@ -0,0 +1,360 @@
+import math
+import os
+import pickle
+import re
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+# numpy是可选依赖，没有时用纯Python计数；导入它需要几十毫秒，因此在后台加载或构建索引时才导入
+np = None
+_numpy_loaded = False
+
+
+def _load_numpy():
+    global np, _numpy_loaded
+    if not _numpy_loaded:
+        _numpy_loaded = True
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            pass
+
+
+# 连续的中日韩文字
+_CJK_RUN_RE = re.compile('[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+')
+# 拉丁字母和数字组成的词
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+# 快照文件格式版本，格式变化时旧快照会被忽略并重新构建
+SNAPSHOT_FORMAT = 1
+# 已删除的槽位超过该比例时压缩索引
+COMPACT_RATIO = 0.3
+
+
+def text_grams(text: str) -> Set[str]:
+    """
+    提取文本的n-gram集合
+
+    拉丁词按trigram切分，词首补两个空格、词尾补一个空格（与pg_trgm相同），
+    这样拼错一两个字母的词仍能与原词共享大部分trigram；
+    中文没有词边界，且常用词只有两三个字，切分为单字和bigram：写错一个字时bigram大多失配，
+    单字仍能提供部分匹配。
+    """
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    grams = set()
+    for run in _CJK_RUN_RE.findall(text):
+        grams.update(run)
+        grams.update(run[i:i + 2] for i in range(len(run) - 1))
+    for word in _WORD_RE.findall(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    内存中的n-gram倒排索引，用于输入时的模糊搜索
+
+    每个想法（内容和摘要）占用一个槽位，倒排表为每个gram对应的槽位数组（array('I')，按槽位递增）。
+    修改想法时旧槽位标记为删除并分配新槽位，删除过多时压缩。
+    搜索时统计每个槽位命中的查询gram数，命中比例越高排名越前，因此拼写有误的词也能找到。
+
+    索引在后台线程中从快照加载或从数据库构建，之后通过变更日志增量同步；
+    关闭时把索引保存为快照，下次启动只需同步快照之后的变化。
+    """
+
+    def __init__(self, db_handler, snapshot_path: str = "data/search_index.snapshot"):
+        """
+        Args:
+            db_handler: 数据库处理器实例
+            snapshot_path: 快照文件路径
+        """
+        self.db_handler = db_handler
+        self.snapshot_path = snapshot_path
+        self._lock = threading.RLock()
+        # 保证同一时间只有一个线程在同步（读取变更和应用变更之间不能交错），搜索不需要等待它
+        self._sync_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._building = False
+        self._reset()
+
+    def _reset(self):
+        # 槽位 -> 想法ID；槽位是否有效
+        self._ids = array('I')
+        self._alive = bytearray()
+        # 想法ID -> 槽位
+        self._slots: Dict[int, int] = {}
+        # gram -> 槽位数组
+        self._postings: Dict[str, array] = {}
+        self._dead = 0
+        self.data_version = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def start(self):
+        """在后台线程中加载快照或构建索引"""
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+            self._ready.clear()
+        threading.Thread(target=self._load_or_build, name="search-index", daemon=True).start()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def _load_or_build(self):
+        try:
+            if not self.load_snapshot():
+                self.rebuild()
+            self._ready.set()
+            self.sync()
+        except Exception as e:
+            print(f"构建搜索索引时出错: {e}")
+        finally:
+            with self._lock:
+                self._building = False
+
+    def rebuild(self):
+        """从数据库完整构建索引"""
+        _load_numpy()
+        version = self.db_handler.get_change_version()
+        rows = self.db_handler.get_idea_texts()
+        with self._lock:
+            self._reset()
+            for idea_id, content, summary in rows:
+                self._add(idea_id, content, summary)
+            self.data_version = version
+
+    def _add(self, idea_id: int, content: str, summary: Optional[str]):
+        slot = len(self._ids)
+        self._ids.append(idea_id)
+        self._alive.append(1)
+        self._slots[idea_id] = slot
+        postings = self._postings
+        for gram in text_grams(f"{content}\n{summary or ''}"):
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = array('I', (slot,))
+            else:
+                posting.append(slot)
+
+    def _remove(self, idea_id: int):
+        slot = self._slots.pop(idea_id, None)
+        if slot is not None:
+            self._alive[slot] = 0
+            self._dead += 1
+
+    def update(self, idea_id: int, content: str, summary: Optional[str] = None):
+        """添加或更新一个想法"""
+        with self._lock:
+            self._remove(idea_id)
+            self._add(idea_id, content, summary)
+
+    def remove(self, idea_id: int):
+        """从索引中移除一个想法"""
+        with self._lock:
+            self._remove(idea_id)
+
+    def sync(self):
+        """应用变更日志中索引版本之后的变化，没有变化时只需一次简单查询"""
+        if not self.ready:
+            return
+        with self._sync_lock:
+            self._sync()
+
+    def _sync(self):
+        rows = self.db_handler.get_changes_since(self.data_version)
+        if rows is None:
+            # 变更日志已被清理（如快照保存后很久才再次启动），无法增量同步，就地完整重建。
+            # 不能调用start()：从_load_or_build同步时_building仍为True，start()会直接返回
+            self.rebuild()
+            return
+        if not rows:
+            return
+
+        changed = set()
+        deleted = set()
+        for _, idea_id, kind in rows:
+            if idea_id is None:
+                continue
+            if kind == 'deleted':
+                deleted.add(idea_id)
+                changed.discard(idea_id)
+            else:
+                changed.add(idea_id)
+                deleted.discard(idea_id)
+
+        texts = self.db_handler.get_idea_texts(list(changed)) if changed else []
+        with self._lock:
+            for idea_id in deleted:
+                self._remove(idea_id)
+            found = set()
+            for idea_id, content, summary in texts:
+                self._remove(idea_id)
+                self._add(idea_id, content, summary)
+                found.add(idea_id)
+            for idea_id in changed - found:
+                self._remove(idea_id)
+            self.data_version = rows[-1][0]
+            if self._dead > COMPACT_RATIO * max(1, len(self._ids)):
+                self._compact()
+
+    def search(self, query: str, limit: int = 100, min_score: float = 0.5) -> List[Tuple[int, float]]:
+        """
+        模糊搜索
+
+        Args:
+            query: 查询文本
+            limit: 最多返回的条数
+            min_score: 最低得分（命中的查询gram比例），越低越宽松
+
+        Returns:
+            [(想法ID, 得分)]，按得分从高到低，得分相同时最近添加或修改的想法在前
+        """
+        grams = text_grams(query)
+        if not grams:
+            return []
+
+        with self._lock:
+            postings = [self._postings[gram] for gram in grams if gram in self._postings]
+            if not postings:
+                return []
+            threshold = max(1, math.ceil(len(grams) * min_score))
+            if np is not None:
+                return self._search_numpy(postings, len(grams), threshold, limit)
+            return self._search_python(postings, len(grams), threshold, limit)
+
+    def _search_numpy(self, postings, gram_count, threshold, limit):
+        slots = np.concatenate([np.frombuffer(posting, dtype=np.uint32) for posting in postings])
+        counts = np.bincount(slots, minlength=len(self._ids))
+        counts[np.frombuffer(self._alive, dtype=np.uint8) == 0] = 0
+        candidates = np.flatnonzero(counts >= threshold)
+        if candidates.size == 0:
+            return []
+        # 槽位按添加或修改的先后分配；先按命中数、再按槽位从大到小取前limit个
+        keys = counts[candidates].astype(np.int64) * (len(self._ids) + 1) + candidates
+        if candidates.size > limit:
+            top = np.argpartition(-keys, limit - 1)[:limit]
+            candidates, keys = candidates[top], keys[top]
+        order = np.argsort(-keys)
+        ids = self._ids
+        return [(ids[int(slot)], int(counts[slot]) / gram_count) for slot in candidates[order]]
+
+    def _search_python(self, postings, gram_count, threshold, limit):
+        counts = Counter()
+        for posting in postings:
+            counts.update(posting)
+        alive = self._alive
+        ranked = sorted(
+            ((count, slot) for slot, count in counts.items() if count >= threshold and alive[slot]),
+            reverse=True
+        )[:limit]
+        ids = self._ids
+        return [(ids[slot], count / gram_count) for count, slot in ranked]
+
+    def _compact(self):
+        """去掉已删除的槽位，重新编号"""
+        mapping = array('q', [-1]) * len(self._ids)
+        new_ids = array('I')
+        for slot, idea_id in enumerate(self._ids):
+            if self._alive[slot]:
+                mapping[slot] = len(new_ids)
+                new_ids.append(idea_id)
+
+        new_postings = {}
+        for gram, posting in self._postings.items():
+            if np is not None:
+                remapped = np.frombuffer(mapping, dtype=np.int64)[
+                    np.frombuffer(posting, dtype=np.uint32)]
+                remapped = remapped[remapped >= 0]
+                if remapped.size:
+                    new_postings[gram] = array('I', remapped.astype(np.uint32).tobytes())
+            else:
+                kept = array('I', (mapping[slot] for slot in posting if mapping[slot] >= 0))
+                if kept:
+                    new_postings[gram] = kept
+
+        self._ids = new_ids
+        self._alive = bytearray(b'\x01') * len(new_ids)
+        self._slots = {idea_id: slot for slot, idea_id in enumerate(new_ids)}
+        self._postings = new_postings
+        self._dead = 0
+
+    def save_snapshot(self):
+        """把索引保存为紧凑的快照文件"""
+        if not self.ready:
+            return
+        try:
+            with self._lock:
+                if self._dead:
+                    self._compact()
+                grams = list(self._postings)
+                lengths = array('I', (len(self._postings[gram]) for gram in grams))
+                data = b''.join(self._postings[gram].tobytes() for gram in grams)
+                snapshot = {
+                    'format': SNAPSHOT_FORMAT,
+                    'data_version': self.data_version,
+                    'ids': self._ids.tobytes(),
+                    'grams': grams,
+                    'lengths': lengths.tobytes(),
+                    'postings': data,
+                }
+            temp_path = self.snapshot_path + ".tmp"
+            with open(temp_path, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.snapshot_path)
+        except Exception as e:
+            print(f"保存搜索索引快照时出错: {e}")
+
+    def load_snapshot(self) -> bool:
+        """
+        从快照加载索引
+
+        Returns:
+            是否加载成功；快照不存在、格式不符或比数据库更新（数据库被替换）时返回False
+        """
+        if not os.path.exists(self.snapshot_path):
+            return False
+        _load_numpy()
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                snapshot = pickle.load(f)
+            if snapshot.get('format') != SNAPSHOT_FORMAT:
+                return False
+            if snapshot['data_version'] > self.db_handler.get_change_version():
+                return False
+
+            ids = array('I')
+            ids.frombytes(snapshot['ids'])
+            lengths = array('I')
+            lengths.frombytes(snapshot['lengths'])
+            data = array('I')
+            data.frombytes(snapshot['postings'])
+
+            postings = {}
+            offset = 0
+            for gram, length in zip(snapshot['grams'], lengths):
+                postings[gram] = data[offset:offset + length]
+                offset += length
+
+            with self._lock:
+                self._reset()
+                self._ids = ids
+                self._alive = bytearray(b'\x01') * len(ids)
+                self._slots = {idea_id: slot for slot, idea_id in enumerate(ids)}
+                self._postings = postings
+                self.data_version = snapshot['data_version']
+            return True
+        except Exception as e:
+            print(f"加载搜索索引快照时出错: {e}")
+            return False
@@ -0,0 +1,312 @@
+import datetime
+import re
+from collections import namedtuple
+from typing import Callable, List, Optional, Tuple
+
+
+# 查询中的一个条件
+#   kind: 'text'、'tag'、'after'、'before'、'has'
+#   value: 条件的值（文本、标签名、ISO日期或字段名）
+#   negated: 是否以"-"取反
+Predicate = namedtuple('Predicate', ['kind', 'value', 'negated'])
+
+# 编译后的一个SQL条件
+#   label: 用于调试输出的说明
+#   index_sql: 作为驱动条件时使用的表达式（可以走索引）
+#   filter_sql: 作为过滤条件时使用的表达式（禁用索引，避免查询规划器选错驱动条件）
+#   params: 表达式的参数，两种表达式相同
+#   estimate_sql: 估算匹配行数的查询（参数同params），不可走索引的条件为None
+Clause = namedtuple('Clause', ['label', 'index_sql', 'filter_sql', 'params', 'estimate_sql'])
+
+# 一个词项：可选的"-"、可选的"字段:"，以及带引号的短语或不含空白的词
+_TOKEN_RE = re.compile(r'(-?)(?:([A-Za-z]+):)?(?:"([^"]*)"?|(\S+))')
+
+# has: 支持的字段，值为判断字段非空的表达式
+HAS_FIELDS = {
+    'summary': "(summary IS NOT NULL AND summary != '')",
+    'tags': "(tags IS NOT NULL AND tags != '[]' AND tags != '')",
+}
+
+# 想法内容的文本表达式：压缩保存的内容（codec不为0）经idea_text函数解压，普通内容直接读取
+CONTENT_SQL = "(CASE codec WHEN 0 THEN content ELSE idea_text(content, codec) END)"
+
+# 全文索引使用trigram分词，少于3个字符的词无法使用全文索引
+FTS_MIN_CHARS = 3
+
+# 估算匹配行数时最多数到的行数，超过即视为不够有选择性
+ESTIMATE_CAP = 10000
+
+# 搜索结果摘录中匹配词的起止标记（控制字符，不会出现在正常文本中）
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+
+def parse_query(text: str) -> List[Predicate]:
+    """
+    解析搜索框中的查询
+
+    支持的语法：
+        词语              内容、标签或摘要包含该词
+        "完整 短语"        包含完整短语（可含空格）
+        tag:产品          带有该标签
+        after:2025-01-01  在该日期（含）之后记录
+        before:2025-02-01 在该日期之前记录
+        has:summary       已有摘要（has:tags 已有标签）
+        -条件             排除符合条件的想法，如 -tag:done
+    无法识别的"字段:值"按普通词语处理。
+
+    Args:
+        text: 查询文本
+
+    Returns:
+        条件列表，各条件之间为"与"的关系
+    """
+    predicates = []
+    for match in _TOKEN_RE.finditer(text or ""):
+        negated = match.group(1) == '-'
+        field = (match.group(2) or '').lower()
+        phrase = match.group(3)
+        value = phrase if phrase is not None else match.group(4)
+        if value is None or value == '':
+            continue
+
+        if field == 'tag':
+            predicates.append(Predicate('tag', value, negated))
+        elif field in ('after', 'before') and _valid_date(value):
+            predicates.append(Predicate(field, value, negated))
+        elif field == 'has' and value.lower() in HAS_FIELDS:
+            predicates.append(Predicate('has', value.lower(), negated))
+        else:
+            # 未知字段连同冒号一起当作普通词语
+            if field and phrase is None:
+                value = match.group(0).lstrip('-')
+            elif field:
+                value = f"{match.group(2)}:{value}"
+            predicates.append(Predicate('text', value, negated))
+    return predicates
+
+
+def is_plain_text(text: str) -> bool:
+    """查询是否只由普通词语组成（没有字段条件、排除和引号），这类查询可以使用模糊搜索"""
+    if not text or '"' in text:
+        return False
+    predicates = parse_query(text)
+    return bool(predicates) and all(p.kind == 'text' and not p.negated for p in predicates)
+
+
+def metadata_filters(text: str) -> Optional[dict]:
+    """
+    把只由标签和日期条件组成的查询转换为元数据过滤条件，这类查询可以由内存中的元数据缓存完成
+
+    Returns:
+        {'tags': 必须带有的标签, 'exclude_tags': 不能带有的标签, 'after': 起始日期, 'before': 截止日期}，
+        查询中含有其他条件时返回None；空查询返回不带任何条件的字典
+    """
+    filters = {'tags': [], 'exclude_tags': [], 'after': None, 'before': None}
+    for predicate in parse_query(text):
+        kind, value, negated = predicate
+        if kind == 'tag':
+            filters['exclude_tags' if negated else 'tags'].append(value)
+        elif kind in ('after', 'before'):
+            # -after:X 等价于 before:X，反之亦然
+            if negated:
+                kind = 'before' if kind == 'after' else 'after'
+            current = filters[kind]
+            if current is None:
+                filters[kind] = value
+            else:
+                filters[kind] = max(current, value) if kind == 'after' else min(current, value)
+        else:
+            return None
+    return filters
+
+
+def _valid_date(value: str) -> bool:
+    try:
+        datetime.date.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _fts_quote(term: str) -> str:
+    """把词语转为FTS5的字符串字面量"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _like_pattern(term: str) -> str:
+    """转义LIKE中的通配符，配合 ESCAPE '\\' 使用"""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def strip_highlight(text: str) -> str:
+    """去掉摘录中的匹配词标记"""
+    return text.replace(HIGHLIGHT_START, '').replace(HIGHLIGHT_END, '')
+
+
+def split_highlight(text: str) -> List[Tuple[str, bool]]:
+    """把带匹配词标记的摘录拆分为[(文本片段, 是否为匹配词)]"""
+    parts = []
+    for i, chunk in enumerate(text.split(HIGHLIGHT_START)):
+        if i == 0:
+            parts.append((chunk, False))
+            continue
+        matched, _, rest = chunk.partition(HIGHLIGHT_END)
+        parts.append((matched, True))
+        parts.append((rest, False))
+    return [part for part in parts if part[0]]
+
+
+def fts_match_expression(predicates: List[Predicate], fts_enabled: bool) -> Optional[str]:
+    """
+    可以走全文索引的正向词语合并成的MATCH表达式
+
+    Returns:
+        MATCH表达式，没有这类词语时返回None
+    """
+    fts_terms = [p.value for p in predicates
+                 if p.kind == 'text' and not p.negated and fts_enabled and len(p.value) >= FTS_MIN_CHARS]
+    if not fts_terms:
+        return None
+    return " AND ".join(_fts_quote(term) for term in fts_terms)
+
+
+def compile_predicates(predicates: List[Predicate], fts_enabled: bool,
+                       include_fts: bool = True) -> List[Clause]:
+    """
+    把条件编译为SQL条件
+
+    Args:
+        predicates: parse_query返回的条件列表
+        fts_enabled: 是否可以使用全文索引
+        include_fts: 是否包含全文索引MATCH条件，按相关度排序时由调用方直接查询全文索引，不需要该条件
+
+    Returns:
+        SQL条件列表
+    """
+    clauses = []
+
+    # 可以走全文索引的正向词语合并为一次MATCH
+    match = fts_match_expression(predicates, fts_enabled)
+    if match is not None and include_fts:
+        subquery = "SELECT rowid FROM ideas_fts WHERE ideas_fts MATCH ?"
+        clauses.append(Clause(
+            f"全文 {match}",
+            f"id IN ({subquery})",
+            f"+id IN ({subquery})",
+            [match],
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM ideas_fts WHERE ideas_fts MATCH ? LIMIT {ESTIMATE_CAP})"
+        ))
+
+    # 时间范围合并为一个条件，走时间戳索引
+    lower = max((p.value for p in predicates if p.kind == 'after' and not p.negated), default=None)
+    upper = min((p.value for p in predicates if p.kind == 'before' and not p.negated), default=None)
+    if lower is not None or upper is not None:
+        bounds = []
+        params = []
+        if lower is not None:
+            bounds.append("{col} >= ?")
+            params.append(lower)
+        if upper is not None:
+            bounds.append("{col} < ?")
+            params.append(upper)
+        condition = " AND ".join(bounds)
+        clauses.append(Clause(
+            f"时间 [{lower or ''}, {upper or ''})",
+            condition.format(col="timestamp"),
+            condition.format(col="+timestamp"),
+            params,
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM ideas WHERE {condition.format(col='timestamp')} "
+            f"LIMIT {ESTIMATE_CAP})"
+        ))
+
+    for predicate in predicates:
+        kind, value, negated = predicate
+        if kind == 'tag':
+            subquery = "SELECT idea_id FROM idea_tags WHERE tag = ?"
+            if negated:
+                clauses.append(Clause(f"排除标签 {value}", f"id NOT IN ({subquery})",
+                                      f"id NOT IN ({subquery})", [value], None))
+            else:
+                clauses.append(Clause(
+                    f"标签 {value}",
+                    f"id IN ({subquery})",
+                    f"+id IN ({subquery})",
+                    [value],
+                    f"SELECT COUNT(*) FROM (SELECT 1 FROM idea_tags WHERE tag = ? LIMIT {ESTIMATE_CAP})"
+                ))
+        elif kind == 'has':
+            condition = HAS_FIELDS[value]
+            if negated:
+                condition = f"NOT {condition}"
+            clauses.append(Clause(f"{'-' if negated else ''}has:{value}", condition, condition, [], None))
+        elif kind in ('after', 'before') and negated:
+            # -after:X 等价于 before:X，反之亦然，不走索引
+            operator = "<" if kind == 'after' else ">="
+            condition = f"timestamp {operator} ?"
+            clauses.append(Clause(f"-{kind}:{value}", condition, condition, [value], None))
+        elif kind == 'text' and (negated or not fts_enabled or len(value) < FTS_MIN_CHARS):
+            if negated and fts_enabled and len(value) >= FTS_MIN_CHARS:
+                subquery = "SELECT rowid FROM ideas_fts WHERE ideas_fts MATCH ?"
+                clauses.append(Clause(f"排除 {value}", f"id NOT IN ({subquery})",
+                                      f"id NOT IN ({subquery})", [_fts_quote(value)], None))
+                continue
+            condition = (f"({CONTENT_SQL} LIKE ? ESCAPE '\\' OR IFNULL(tags, '') LIKE ? ESCAPE '\\' "
+                         "OR IFNULL(summary, '') LIKE ? ESCAPE '\\')")
+            if negated:
+                condition = f"NOT {condition}"
+            pattern = _like_pattern(value)
+            clauses.append(Clause(f"{'排除' if negated else '包含'} {value}", condition, condition,
+                                  [pattern] * 3, None))
+    return clauses
+
+
+def plan_clauses(clauses: List[Clause],
+                 estimate: Callable[[str, list], int]) -> Tuple[Optional[Clause], List[Clause], List[str]]:
+    """
+    选出匹配行数最少的可索引条件作为驱动条件，其余条件只作过滤
+
+    Args:
+        clauses: compile_predicates返回的条件列表
+        estimate: 执行估算查询并返回行数的函数
+
+    Returns:
+        (驱动条件（没有可索引条件时为None）, 过滤条件列表, 规划说明)
+    """
+    notes = []
+    indexed = [clause for clause in clauses if clause.estimate_sql]
+    driver = None
+    if len(indexed) == 1:
+        driver = indexed[0]
+        notes.append(f"驱动条件: {driver.label}（唯一可索引条件）")
+    elif indexed:
+        estimates = [(estimate(clause.estimate_sql, clause.params), i) for i, clause in enumerate(indexed)]
+        for (count, i) in estimates:
+            notes.append(f"估算 {indexed[i].label}: {count}{'+' if count >= ESTIMATE_CAP else ''} 行")
+        driver = indexed[min(estimates)[1]]
+        notes.append(f"驱动条件: {driver.label}")
+    else:
+        notes.append("没有可索引条件，按排序顺序扫描")
+    filters = [clause for clause in clauses if clause is not driver]
+    return driver, filters, notes
+
+
+def build_where(driver: Optional[Clause], filters: List[Clause]) -> Tuple[str, list]:
+    """
+    拼接WHERE子句，驱动条件在前并可走索引，其余条件禁用索引只作过滤
+
+    Returns:
+        (WHERE子句（没有条件时为空字符串）, 参数列表)
+    """
+    conditions = []
+    params = []
+    if driver is not None:
+        conditions.append(driver.index_sql)
+        params.extend(driver.params)
+    for clause in filters:
+        conditions.append(clause.filter_sql)
+        params.extend(clause.params)
+    if not conditions:
+        return "", []
+    return " WHERE " + " AND ".join(conditions), params
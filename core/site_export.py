@@ -0,0 +1,456 @@
+"""
+把想法和AI见解导出为可浏览的静态网站（HTML或Markdown）
+
+页面按月份、标签和主题（想法的第一个标签，AI生成标签时把最能概括内容的放在最前）分组，
+组内按时间从早到晚排列并分页，新想法通常只影响每组的最后一页。
+
+导出是增量的：每个页面的输入（页面上每条想法的内容哈希、标题和翻页链接）计算出一个哈希，
+记录在输出目录的清单文件中，再次导出时只重写哈希变化或文件缺失的页面，并删除不再需要的页面。
+需要重写的页面较多时在进程池中并行渲染和写入。
+
+命令行用法（在程序目录下运行）：
+
+    python -m core.site_export site [--format html|markdown]
+"""
+import argparse
+import datetime
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 页面生成方式的版本，模板变化时递增，已导出的页面会全部重写
+SITE_FORMAT_VERSION = 1
+# 清单文件名
+MANIFEST_NAME = ".site-manifest.json"
+# 每页最多的想法数
+PAGE_IDEAS = 200
+# 需要重写的页面少于该数量时不启动进程池，直接在当前进程中渲染
+PARALLEL_MIN_PAGES = 16
+# 每次提交给进程池的页面数，同时也限制了内存中待渲染想法的数量
+RENDER_CHUNK = 8
+# 没有标签的想法所在的主题
+UNTAGGED = "未分类"
+# AI记忆文件，命令行导出时从中读取见解
+AI_MEMORY_FILE = "data/ai_memory.json"
+
+SECTION_TITLES = {
+    'months': "按月份",
+    'topics': "按主题",
+    'tags': "按标签",
+}
+
+HTML_STYLE = """
+body { font-family: -apple-system, "Segoe UI", "Microsoft YaHei", sans-serif; max-width: 860px;
+       margin: 2em auto; padding: 0 1em; color: #2c3e50; line-height: 1.6; }
+a { color: #2980b9; text-decoration: none; }
+nav { margin: 1em 0; color: #7f8c8d; }
+.idea { border-bottom: 1px solid #ecf0f1; padding: 0.8em 0; }
+.meta { color: #7f8c8d; font-size: 0.9em; }
+.meta a { margin-left: 0.5em; }
+.content { white-space: pre-wrap; }
+.summary { color: #7f8c8d; font-style: italic; }
+ul.groups { columns: 3; }
+"""
+
+
+def slugify(name: str) -> str:
+    """把标签等名称转换为安全的文件名（不区分大小写），附加名称的哈希以避免冲突"""
+    name = name.lower()
+    slug = re.sub(r'[^\w-]+', '_', name).strip('_')[:40] or "_"
+    return f"{slug}-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:6]}"
+
+
+def idea_digest(content: str, timestamp: str, tags_json: Optional[str], summary: Optional[str]) -> str:
+    """想法在页面上显示的全部内容的哈希"""
+    data = json.dumps([content, timestamp, tags_json, summary], ensure_ascii=False)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def _parse_tags(tags_json: Optional[str]) -> List[str]:
+    if not tags_json:
+        return []
+    try:
+        return [str(tag) for tag in json.loads(tags_json) if str(tag).strip()]
+    except (ValueError, TypeError):
+        return []
+
+
+def _page_name(slug: str, number: int, ext: str) -> str:
+    return f"{slug}{'' if number == 1 else f'-{number}'}.{ext}"
+
+
+def _display_time(timestamp: str) -> str:
+    try:
+        return datetime.datetime.fromisoformat(timestamp).strftime("%Y-%m-%d %H:%M")
+    except (TypeError, ValueError):
+        return timestamp
+
+
+# ---------- 页面渲染（在工作进程中执行，只使用参数中的数据） ----------
+
+def _html_page(title: str, body: List[str], root: str) -> str:
+    return (
+        "<!DOCTYPE html>\n<html lang=\"zh-CN\">\n<head>\n<meta charset=\"utf-8\">\n"
+        f"<title>{html.escape(title)}</title>\n<style>{HTML_STYLE}</style>\n</head>\n<body>\n"
+        f"<nav><a href=\"{root}index.html\">首页</a> · <a href=\"{root}insights.html\">AI见解</a></nav>\n"
+        f"<h1>{html.escape(title)}</h1>\n" + "\n".join(body) + "\n</body>\n</html>\n"
+    )
+
+
+def _render_ideas_html(spec: dict, ideas: List[Tuple]) -> str:
+    body = []
+    for idea_id, content, timestamp, tags_json, summary in ideas:
+        tag_links = "".join(
+            f"<a href=\"../tags/{_page_name(slugify(tag), 1, 'html')}\">#{html.escape(tag)}</a>"
+            for tag in _parse_tags(tags_json)
+        )
+        body.append(
+            f"<article class=\"idea\" id=\"idea-{idea_id}\">\n"
+            f"<div class=\"meta\"><time>{_display_time(timestamp)}</time>{tag_links}</div>\n"
+            f"<div class=\"content\">{html.escape(content)}</div>\n"
+            + (f"<div class=\"summary\">{html.escape(summary)}</div>\n" if summary else "")
+            + "</article>"
+        )
+    body.append(_pager_html(spec))
+    return _html_page(spec['title'], body, "../")
+
+
+def _pager_html(spec: dict) -> str:
+    links = []
+    if spec['prev']:
+        links.append(f"<a href=\"{spec['prev']}\">上一页</a>")
+    links.append(f"第 {spec['number']}/{spec['pages']} 页")
+    if spec['next']:
+        links.append(f"<a href=\"{spec['next']}\">下一页</a>")
+    return f"<nav>{' · '.join(links)}</nav>"
+
+
+def _render_ideas_markdown(spec: dict, ideas: List[Tuple]) -> str:
+    lines = ["[首页](../index.md) · [AI见解](../insights.md)", "", f"# {spec['title']}", ""]
+    for idea_id, content, timestamp, tags_json, summary in ideas:
+        tags = " ".join(f"[#{tag}](../tags/{_page_name(slugify(tag), 1, 'md')})"
+                        for tag in _parse_tags(tags_json))
+        lines.append(f"### {_display_time(timestamp)} {tags}".rstrip())
+        lines.append("")
+        lines.append(content)
+        if summary:
+            lines.extend(["", f"> {' '.join(summary.split())}"])
+        lines.extend(["", "---", ""])
+    pager = [f"第 {spec['number']}/{spec['pages']} 页"]
+    if spec['prev']:
+        pager.insert(0, f"[上一页]({spec['prev']})")
+    if spec['next']:
+        pager.append(f"[下一页]({spec['next']})")
+    lines.append(" · ".join(pager))
+    return "\n".join(lines) + "\n"
+
+
+def _render_index(spec: dict, fmt: str) -> str:
+    groups = spec['groups']
+    if fmt == 'html':
+        body = [f"<p>共 {spec['total']} 条想法</p>"]
+        for section, entries in groups:
+            body.append(f"<h2>{SECTION_TITLES[section]}</h2>\n<ul class=\"groups\">")
+            body.extend(f"<li><a href=\"{section}/{link}\">{html.escape(name)}</a> ({count})</li>"
+                        for name, link, count in entries)
+            body.append("</ul>")
+        return _html_page(spec['title'], body, "")
+    lines = [f"# {spec['title']}", "", f"共 {spec['total']} 条想法 · [AI见解](insights.md)", ""]
+    for section, entries in groups:
+        lines.extend([f"## {SECTION_TITLES[section]}", ""])
+        lines.extend(f"- [{name}]({section}/{link}) ({count})" for name, link, count in entries)
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _render_insights(spec: dict, fmt: str) -> str:
+    memory = spec['memory']
+    insights = memory.get('insights', [])
+    reminders = memory.get('reminders', [])
+    if fmt == 'html':
+        body = []
+        if memory.get('meta_summary'):
+            body.append(f"<p>{html.escape(str(memory['meta_summary']))}</p>")
+        if reminders:
+            body.append("<h2>提醒</h2>\n<ul>")
+            body.extend(f"<li>{html.escape(str(r.get('due_date', '')))}：{html.escape(str(r.get('content', '')))}</li>"
+                        for r in reminders)
+            body.append("</ul>")
+        body.append("<h2>见解</h2>")
+        for insight in insights:
+            body.append(
+                f"<article class=\"idea\"><div class=\"meta\">{_display_time(str(insight.get('timestamp', '')))}</div>"
+                f"<h3>{html.escape(str(insight.get('title', '')))}</h3>"
+                f"<div class=\"content\">{html.escape(str(insight.get('content', '')))}</div></article>"
+            )
+        return _html_page(spec['title'], body, "")
+    lines = ["[首页](index.md)", "", f"# {spec['title']}", ""]
+    if memory.get('meta_summary'):
+        lines.extend([str(memory['meta_summary']), ""])
+    if reminders:
+        lines.extend(["## 提醒", ""])
+        lines.extend(f"- {r.get('due_date', '')}：{r.get('content', '')}" for r in reminders)
+        lines.append("")
+    lines.extend(["## 见解", ""])
+    for insight in insights:
+        lines.extend([f"### {insight.get('title', '')}", "",
+                      f"*{_display_time(str(insight.get('timestamp', '')))}*", "",
+                      str(insight.get('content', '')), ""])
+    return "\n".join(lines)
+
+
+def render_page(spec: dict, fmt: str, ideas: Optional[List[Tuple]] = None) -> str:
+    """渲染一个页面，返回页面文本"""
+    if spec['kind'] == 'index':
+        return _render_index(spec, fmt)
+    if spec['kind'] == 'insights':
+        return _render_insights(spec, fmt)
+    return _render_ideas_html(spec, ideas) if fmt == 'html' else _render_ideas_markdown(spec, ideas)
+
+
+def write_pages(output_dir: str, fmt: str, jobs: List[Tuple[dict, Optional[List[Tuple]]]]) -> int:
+    """渲染并写入一组页面（进程池中的任务），返回写入的页面数"""
+    for spec, ideas in jobs:
+        path = os.path.join(output_dir, spec['path'])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8', newline='\n') as f:
+            f.write(render_page(spec, fmt, ideas))
+        os.replace(temp_path, path)
+    return len(jobs)
+
+
+# ---------- 增量导出 ----------
+
+class SiteExporter:
+    """
+    增量导出静态网站
+
+    第一遍按ID顺序流式读取全部想法，只保留每条想法的时间、标签和内容哈希，据此划分页面并计算页面哈希；
+    与清单比较后，只为需要重写的页面读取想法内容并交给进程池渲染。
+    """
+
+    def __init__(self, db_handler, output_dir: str, fmt: str = 'html', workers: Optional[int] = None):
+        """
+        Args:
+            db_handler: 数据库处理器实例
+            output_dir: 输出目录
+            fmt: 'html'或'markdown'
+            workers: 渲染进程数，默认为CPU核数减一
+        """
+        if fmt not in ('html', 'markdown'):
+            raise ValueError(f"不支持的网站格式: {fmt}")
+        self.db_handler = db_handler
+        self.output_dir = output_dir
+        self.fmt = fmt
+        self.ext = 'html' if fmt == 'html' else 'md'
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+
+    def export(self, memory: Optional[Dict] = None,
+               progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """
+        导出网站
+
+        Args:
+            memory: AI记忆（使用其中的meta_summary、insights、reminders），为None时见解页面为空
+            progress: 写入页面的进度回调，参数为(已写入页数, 需要写入的页数)
+
+        Returns:
+            {'pages': 页面总数, 'written': 重写的页数, 'deleted': 删除的页数, 'ideas': 想法数, 'seconds': 耗时}
+        """
+        start = time.perf_counter()
+        ideas, groups = self._scan()
+        specs = self._plan(ideas, groups, memory or {})
+
+        manifest = self._load_manifest()
+        old_pages = manifest.get('pages', {}) if manifest.get('version') == [SITE_FORMAT_VERSION, self.fmt] else {}
+        changed = [
+            spec for spec in specs
+            if old_pages.get(spec['path']) != spec['hash']
+            or not os.path.exists(os.path.join(self.output_dir, spec['path']))
+        ]
+
+        written = self._write(changed, progress)
+
+        # 删除不再生成的页面
+        current = {spec['path'] for spec in specs}
+        deleted = 0
+        for path in set(manifest.get('pages', {})) - current:
+            try:
+                os.remove(os.path.join(self.output_dir, path))
+                deleted += 1
+            except OSError:
+                pass
+
+        self._save_manifest({spec['path']: spec['hash'] for spec in specs})
+        return {
+            'pages': len(specs),
+            'written': written,
+            'deleted': deleted,
+            'ideas': len(ideas),
+            'seconds': time.perf_counter() - start,
+        }
+
+    def _scan(self) -> Tuple[Dict[int, Tuple[str, str]], Dict[str, Dict[str, list]]]:
+        """
+        流式读取全部想法
+
+        Returns:
+            ({想法ID: (时间戳, 内容哈希)}, {分组类型: {分组名: [(时间戳, 想法ID)]}})
+        """
+        ideas = {}
+        groups = {'months': {}, 'topics': {}, 'tags': {}}
+        # 标签不区分大小写，显示第一次出现时的写法
+        tag_names = {}
+        for idea_id, content, timestamp, tags_json, summary in self.db_handler.iter_ideas():
+            ideas[idea_id] = (timestamp, idea_digest(content, timestamp, tags_json, summary))
+            key = (timestamp, idea_id)
+            groups['months'].setdefault(timestamp[:7], []).append(key)
+            tags = [tag_names.setdefault(tag.lower(), tag) for tag in _parse_tags(tags_json)]
+            groups['topics'].setdefault(tags[0] if tags else UNTAGGED, []).append(key)
+            for tag in dict.fromkeys(tags):
+                groups['tags'].setdefault(tag, []).append(key)
+        return ideas, groups
+
+    def _plan(self, ideas: Dict[int, Tuple[str, str]], groups: Dict[str, Dict[str, list]],
+              memory: Dict) -> List[dict]:
+        """划分页面并计算每个页面的哈希"""
+        ext = self.ext
+        specs = []
+        index_groups = []
+        for section in ('months', 'topics', 'tags'):
+            entries = []
+            names = sorted(groups[section], reverse=section == 'months')
+            if section != 'months':
+                # 主题和标签按想法数从多到少排列
+                names.sort(key=lambda name: -len(groups[section][name]))
+            for name in names:
+                members = sorted(groups[section][name])
+                slug = re.sub(r'[^\w-]+', '_', name) if section == 'months' else slugify(name)
+                title = f"#{name}" if section == 'tags' else name
+                pages = (len(members) + PAGE_IDEAS - 1) // PAGE_IDEAS
+                for number in range(1, pages + 1):
+                    page_ids = [idea_id for _, idea_id in members[(number - 1) * PAGE_IDEAS:number * PAGE_IDEAS]]
+                    spec = {
+                        'kind': 'ideas',
+                        'path': f"{section}/{_page_name(slug, number, ext)}",
+                        'title': title if pages == 1 else f"{title}（{number}）",
+                        'number': number,
+                        'pages': pages,
+                        'prev': _page_name(slug, number - 1, ext) if number > 1 else None,
+                        'next': _page_name(slug, number + 1, ext) if number < pages else None,
+                        'ids': page_ids,
+                    }
+                    spec['hash'] = self._hash(spec, [ideas[idea_id][1] for idea_id in page_ids])
+                    specs.append(spec)
+                entries.append((name, _page_name(slug, 1, ext), len(members)))
+            index_groups.append((section, entries))
+
+        index = {'kind': 'index', 'path': f"index.{ext}", 'title': "想法记录",
+                 'total': len(ideas), 'groups': index_groups}
+        index['hash'] = self._hash(index)
+        # 只取页面上显示的部分，处理进度等字段的变化不影响页面
+        shown = {key: memory.get(key) for key in ('meta_summary', 'insights', 'reminders') if memory.get(key)}
+        insights = {'kind': 'insights', 'path': f"insights.{ext}", 'title': "AI见解", 'memory': shown}
+        insights['hash'] = self._hash(insights)
+        return [index, insights] + specs
+
+    def _hash(self, spec: dict, digests: Optional[List[str]] = None) -> str:
+        data = json.dumps([SITE_FORMAT_VERSION, self.fmt, spec, digests],
+                          ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def _jobs(self, specs: List[dict]) -> List[Tuple[dict, Optional[List[Tuple]]]]:
+        """为一组页面读取想法内容"""
+        ids = [idea_id for spec in specs if spec['kind'] == 'ideas' for idea_id in spec['ids']]
+        rows = {row[0]: row for row in self.db_handler.get_idea_rows(list(dict.fromkeys(ids)))} if ids else {}
+        return [
+            (spec, [rows[idea_id] for idea_id in spec['ids'] if idea_id in rows] if spec['kind'] == 'ideas' else None)
+            for spec in specs
+        ]
+
+    def _write(self, changed: List[dict], progress: Optional[Callable[[int, int], None]]) -> int:
+        total = len(changed)
+        done = 0
+        chunks = [changed[i:i + RENDER_CHUNK] for i in range(0, total, RENDER_CHUNK)]
+        if self.workers <= 1 or total < PARALLEL_MIN_PAGES:
+            for chunk in chunks:
+                done += write_pages(self.output_dir, self.fmt, self._jobs(chunk))
+                if progress is not None:
+                    progress(done, total)
+            return done
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            # 限制同时提交的任务数，读取想法内容与渲染并行进行，内存中只保留少量页面的内容
+            pending = []
+            for chunk in chunks:
+                pending.append(pool.submit(write_pages, self.output_dir, self.fmt, self._jobs(chunk)))
+                while len(pending) >= self.workers * 2:
+                    done += pending.pop(0).result()
+                    if progress is not None:
+                        progress(done, total)
+            for future in pending:
+                done += future.result()
+                if progress is not None:
+                    progress(done, total)
+        return done
+
+    def _load_manifest(self) -> Dict:
+        path = os.path.join(self.output_dir, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取网站清单时出错，将重新生成全部页面: {e}")
+            return {}
+
+    def _save_manifest(self, pages: Dict[str, str]):
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, MANIFEST_NAME)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({'version': [SITE_FORMAT_VERSION, self.fmt], 'pages': pages}, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m core.site_export", description="导出静态网站")
+    parser.add_argument('output_dir', help="输出目录")
+    parser.add_argument('--format', choices=['html', 'markdown'], default='html', help="页面格式，默认html")
+    parser.add_argument('--workers', type=int, help="渲染进程数，默认为CPU核数减一")
+    args = parser.parse_args(argv)
+
+    from core.db_handler import DBHandler
+
+    memory = {}
+    if os.path.exists(AI_MEMORY_FILE):
+        try:
+            with open(AI_MEMORY_FILE, 'r', encoding='utf-8') as f:
+                memory = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取AI见解时出错: {e}")
+
+    db_handler = DBHandler()
+    try:
+        result = SiteExporter(db_handler, args.output_dir, args.format, args.workers).export(
+            memory, lambda done, total: print(f"\r已写入 {done}/{total} 页", end="", flush=True)
+        )
+    except (OSError, ValueError) as e:
+        print(f"导出失败: {e}")
+        return 1
+    finally:
+        db_handler.close()
+    print(f"\n共 {result['pages']} 页，重写 {result['written']} 页，删除 {result['deleted']} 页，"
+          f"耗时 {result['seconds']:.1f} 秒")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
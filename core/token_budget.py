@@ -0,0 +1,191 @@
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import List, Dict
+
+from core.llm_backend import LLMError
+
+
+# 中日韩文字（含假名和谚文），大多数分词器中每个字约为一个token
+_CJK_RANGES = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+_CJK_RE = re.compile(f'[{_CJK_RANGES}]')
+# 拉丁字母和数字组成的词，约每4个字符一个token
+_WORD_RE = re.compile(r'[A-Za-z0-9_]+')
+# 其余非空白字符（标点、符号等），每个约一个token
+_OTHER_RE = re.compile(r'[^\sA-Za-z0-9_' + _CJK_RANGES + ']')
+
+# 每条消息的格式开销（角色标记等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    本地快速估算文本的token数，不依赖任何分词器
+
+    Args:
+        text: 文本内容
+
+    Returns:
+        估算的token数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    words = sum((len(word) + 3) // 4 for word in _WORD_RE.findall(text))
+    other = len(_OTHER_RE.findall(text))
+    return cjk + words + other
+
+
+def estimate_messages_tokens(messages: List[Dict]) -> int:
+    """估算一组对话消息的提示词token数"""
+    return sum(estimate_tokens(m.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for m in messages) + 2
+
+
+class BudgetExceededError(LLMError):
+    """当日token预算已用尽时抛出的异常"""
+
+
+class TokenBudget:
+    """
+    token用量记账和每日上限控制
+
+    用量按任务类型记录在SQLite的 token_usage 表中。对话任务（chat）和批量分析任务分别计算上限，
+    批量分析超出上限后会暂停，但AI对话仍可继续使用。上限为0表示不限制。
+    """
+
+    CHAT_TASK = "chat"
+
+    def __init__(self, db_handler, daily_batch_cap: int = 0, daily_chat_cap: int = 0):
+        """
+        初始化token预算
+
+        Args:
+            db_handler: 数据库处理器实例
+            daily_batch_cap: 批量分析（标签、摘要、见解）每日token上限
+            daily_chat_cap: AI对话每日token上限
+        """
+        self.db_handler = db_handler
+        self.daily_batch_cap = daily_batch_cap
+        self.daily_chat_cap = daily_chat_cap
+        self._lock = threading.Lock()
+        self._day = None
+        self._batch_used = 0
+        self._chat_used = 0
+
+    def update_caps(self, daily_batch_cap: int = None, daily_chat_cap: int = None):
+        """更新每日上限"""
+        if daily_batch_cap is not None:
+            self.daily_batch_cap = daily_batch_cap
+        if daily_chat_cap is not None:
+            self.daily_chat_cap = daily_chat_cap
+
+    def _refresh_day(self):
+        """跨天时从数据库重新加载当天的累计用量，需在持有锁时调用"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        if self._day == today:
+            return
+        self._day = today
+        self._batch_used = 0
+        self._chat_used = 0
+        for _, task, _, prompt_tokens, completion_tokens in self.db_handler.get_token_usage(today):
+            total = (prompt_tokens or 0) + (completion_tokens or 0)
+            if task == self.CHAT_TASK:
+                self._chat_used += total
+            else:
+                self._batch_used += total
+
+    def _exhausted(self, task: str) -> bool:
+        self._refresh_day()
+        if task == self.CHAT_TASK:
+            return bool(self.daily_chat_cap) and self._chat_used >= self.daily_chat_cap
+        return bool(self.daily_batch_cap) and self._batch_used >= self.daily_batch_cap
+
+    def batch_exhausted(self) -> bool:
+        """当日批量分析预算是否已用尽"""
+        with self._lock:
+            return self._exhausted("")
+
+    def check(self, task: str):
+        """
+        检查任务是否还有预算
+
+        Raises:
+            BudgetExceededError: 当日对应类别的预算已用尽
+        """
+        with self._lock:
+            if self._exhausted(task):
+                kind = "AI对话" if task == self.CHAT_TASK else "批量分析"
+                raise BudgetExceededError(f"今日{kind}的token预算已用尽")
+
+    def record(self, task: str, messages: List[Dict], result: Dict):
+        """
+        记录一次调用的用量，后端未返回usage时使用本地估算值
+
+        Args:
+            task: 任务类型
+            messages: 发送的消息列表
+            result: 后端返回的结果字典
+        """
+        usage = result.get("usage") or {}
+        estimated = not usage.get("prompt_tokens")
+        prompt_tokens = usage.get("prompt_tokens") or estimate_messages_tokens(messages)
+        completion_tokens = usage.get("completion_tokens")
+        if completion_tokens is None:
+            completion_tokens = estimate_tokens(result.get("content", ""))
+            estimated = True
+
+        with self._lock:
+            self._refresh_day()
+            if task == self.CHAT_TASK:
+                self._chat_used += prompt_tokens + completion_tokens
+            else:
+                self._batch_used += prompt_tokens + completion_tokens
+
+        try:
+            self.db_handler.record_token_usage(
+                task, result.get("model", ""), result.get("endpoint", ""),
+                prompt_tokens, completion_tokens, estimated
+            )
+        except Exception as e:
+            print(f"记录token用量时出错: {e}")
+
+    def usage_breakdown(self, days: int = 1) -> List[Dict]:
+        """
+        按任务类型汇总最近几天的用量
+
+        Args:
+            days: 统计的天数，1表示仅今天
+
+        Returns:
+            用量列表，每项包含task、calls、prompt_tokens、completion_tokens、total_tokens字段
+        """
+        since = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        totals = {}
+        for _, task, calls, prompt_tokens, completion_tokens in self.db_handler.get_token_usage(since):
+            item = totals.setdefault(task, {
+                "task": task, "calls": 0, "prompt_tokens": 0, "completion_tokens": 0
+            })
+            item["calls"] += calls
+            item["prompt_tokens"] += prompt_tokens or 0
+            item["completion_tokens"] += completion_tokens or 0
+        for item in totals.values():
+            item["total_tokens"] = item["prompt_tokens"] + item["completion_tokens"]
+        return sorted(totals.values(), key=lambda item: item["total_tokens"], reverse=True)
+
+    def remaining(self) -> Dict:
+        """今日剩余预算，上限为0时对应值为None"""
+        with self._lock:
+            self._refresh_day()
+            return {
+                "batch": max(0, self.daily_batch_cap - self._batch_used) if self.daily_batch_cap else None,
+                "chat": max(0, self.daily_chat_cap - self._chat_used) if self.daily_chat_cap else None
+            }
+
+
+def create_token_budget(db_handler, config: Dict) -> TokenBudget:
+    """根据配置（daily_token_cap、daily_chat_token_cap）创建token预算"""
+    return TokenBudget(
+        db_handler,
+        daily_batch_cap=config.get("daily_token_cap", 0),
+        daily_chat_cap=config.get("daily_chat_token_cap", 0)
+    )
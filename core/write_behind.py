@@ -0,0 +1,192 @@
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+
+class WriteBehindQueue:
+    """
+    想法的内存写后队列
+
+    保存时只把想法放入内存队列并立即返回，由后台写线程批量写入数据库，
+    这样即使后台AI分析正在写库，输入窗口的保存也不会被阻塞。
+    时间戳在入队时记录，因此想法的时间以用户保存的时刻为准。
+
+    多次重试仍然写不进数据库的想法不会丢弃：它们保存在待写文件中并通知错误监听器，
+    写线程每隔一段时间重试一次；程序在写入前退出时，下次启动会先写入待写文件中的想法。
+    """
+
+    # 单个事务最多写入的条数
+    BATCH_SIZE = 200
+    # 写入失败时的重试次数
+    MAX_RETRIES = 3
+    # 未写入的想法每隔多少秒重试一次
+    RETRY_INTERVAL = 30
+
+    _STOP = object()
+
+    def __init__(self, db_handler, spool_file: str = "data/unsaved_ideas.jsonl",
+                 on_error: Optional[Callable[[int, str], None]] = None):
+        """
+        初始化写后队列并启动后台写线程
+
+        Args:
+            db_handler: 数据库处理器实例
+            spool_file: 保存未写入想法的待写文件
+            on_error: 想法多次重试仍未写入时在写线程中调用，参数为(未写入的想法数, 错误信息)
+        """
+        self.db_handler = db_handler
+        self.spool_file = spool_file
+        self.on_error = on_error
+        # 多次重试仍未写入的想法，每项为(内容, 时间戳, 回调)，同时保存在待写文件中
+        self._failed = self._load_spool()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="idea-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, content: str, callback: Optional[Callable[[int], None]] = None):
+        """
+        把想法放入写入队列
+
+        Args:
+            content: 想法内容
+            callback: 写入完成后在写线程中调用，参数为新想法的ID
+        """
+        timestamp = datetime.datetime.now().isoformat()
+        self._queue.put((content, timestamp, callback))
+
+    def flush(self):
+        """等待队列中已有的想法全部写入（或写入失败后转入待写文件）"""
+        self._queue.join()
+
+    @property
+    def unsaved_count(self) -> int:
+        """尚未写入数据库、保存在待写文件中的想法数"""
+        return len(self._failed)
+
+    def close(self):
+        """写完剩余想法后停止写线程"""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+
+    def _run(self):
+        # 先写入上次未能写入的想法
+        if self._failed:
+            self._retry_failed()
+        while True:
+            if self._failed:
+                try:
+                    item = self._queue.get(timeout=self.RETRY_INTERVAL)
+                except queue.Empty:
+                    self._retry_failed()
+                    continue
+            else:
+                item = self._queue.get()
+            if item is self._STOP:
+                self._queue.task_done()
+                return
+
+            # 把已经排队的想法合并到同一个事务中
+            batch = [item]
+            stop = False
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    next_item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if next_item is self._STOP:
+                    stop = True
+                    break
+                batch.append(next_item)
+
+            if self._write_batch(batch) and self._failed:
+                # 数据库恢复正常，顺便写入之前未写入的想法
+                self._retry_failed()
+            for _ in range(len(batch) + (1 if stop else 0)):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, batch) -> bool:
+        """写入一批想法，多次重试仍失败时转入待写文件，返回是否写入成功"""
+        for attempt in range(1, self.MAX_RETRIES + 1):
+            try:
+                ids = self.db_handler.store_ideas([(content, timestamp) for content, timestamp, _ in batch])
+                break
+            except Exception as e:
+                print(f"写入想法时出错（第{attempt}次）: {e}")
+                if attempt == self.MAX_RETRIES:
+                    self._failed.extend(batch)
+                    self._save_spool()
+                    self._notify_error(str(e))
+                    return False
+                time.sleep(0.1 * attempt)
+
+        self._run_callbacks(batch, ids)
+        return True
+
+    def _retry_failed(self):
+        """重试写入待写文件中的想法，已经写入过的（上次写入后未能更新待写文件）跳过"""
+        items = list(self._failed)
+        try:
+            pending = [item for item in items if self.db_handler.find_idea(item[0], item[1]) is None]
+            ids = self.db_handler.store_ideas([(content, timestamp) for content, timestamp, _ in pending])
+        except Exception as e:
+            print(f"重试写入未保存的想法时出错: {e}")
+            return
+        del self._failed[:len(items)]
+        self._save_spool()
+        print(f"已写入之前未保存的 {len(pending)} 条想法")
+        self._run_callbacks(pending, ids)
+
+    def _run_callbacks(self, batch, ids):
+        for (_, _, callback), idea_id in zip(batch, ids):
+            if callback is not None:
+                try:
+                    callback(idea_id)
+                except Exception as e:
+                    print(f"想法写入回调出错: {e}")
+
+    def _notify_error(self, error: str):
+        if self.on_error is not None:
+            try:
+                self.on_error(len(self._failed), error)
+            except Exception as e:
+                print(f"想法写入错误通知出错: {e}")
+
+    def _load_spool(self) -> List[tuple]:
+        if not os.path.exists(self.spool_file):
+            return []
+        items = []
+        try:
+            with open(self.spool_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        items.append((record['content'], record['timestamp'], None))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"读取未保存的想法时出错: {e}")
+        return items
+
+    def _save_spool(self):
+        """把未写入的想法保存到待写文件，没有时删除文件"""
+        try:
+            if not self._failed:
+                if os.path.exists(self.spool_file):
+                    os.remove(self.spool_file)
+                return
+            os.makedirs(os.path.dirname(self.spool_file) or '.', exist_ok=True)
+            temp_path = self.spool_file + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for content, timestamp, _ in self._failed:
+                    f.write(json.dumps({'content': content, 'timestamp': timestamp}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.spool_file)
+        except OSError as e:
+            # 待写文件也无法保存时，想法仍保留在内存中继续重试
+            print(f"保存未写入的想法时出错: {e}")
@@ -3,41 +3,74 @@
 主程序入口，负责初始化项目环境，创建用户界面，启动后台服务。
 
 本文件主要执行以下操作：
-1. 从`utils.config_manager`导入配置管理类，初始化项目配置。
+1. 从`utils.config_service`获取配置服务，初始化项目配置。
 2. 从`ui.main_window`导入主窗口类，创建并显示主窗口。
-3. 启动后台服务，包括注册全局快捷键和启动守护进程（若有）。
+3. 启动后台服务，包括注册全局快捷键和启动守护进程（若有）。已有实例在运行时只通知它显示主窗口。
+4. 测量从进程启动到主窗口首次绘制的耗时，超过启动预算时给出警告；首次绘制后再启动索引构建等后台任务。
 
 需要导入的库：
 - `sys`：用于处理命令行参数和系统相关操作。
 - `PyQt6.QtWidgets`：PyQt6的核心窗口部件模块，用于创建和管理UI元素。
-- `utils.config_manager.ConfigManager`：配置管理类，用于读取和写入项目配置。
+- `utils.config_service.ConfigService`：配置服务，缓存配置并在配置文件变化时发出通知。
 - `ui.main_window.MainWindow`：主窗口类，包含整个应用的主界面布局和功能逻辑。
 - `core.hotkey_manager.HotkeyManager`：全局快捷键管理类，负责注册和处理快捷键事件。
+- `utils.startup_timer.FirstPaintTimer`：首次绘制计时器，用于测量启动耗时。
 
 函数：
 - `main()`: 主函数，程序的入口点。
-    - 初始化配置，创建`ConfigManager`实例并读取配置。
     - 创建`QApplication`实例，设置应用名称。
-    - 创建`MainWindow`实例并显示。
+    - 初始化配置，从`ConfigService`读取缓存的配置。
+    - 创建`MainWindow`实例并显示，同时开始测量首次绘制耗时。
     - 注册全局快捷键，创建`HotkeyManager`实例并传入主窗口对象进行快捷键注册。
     - 进入应用的事件循环，返回`sys.exit(app.exec())`的结果。
+    - 使用`--startup-check`参数启动时，首次绘制后立即退出，耗时超过预算（配置项`startup_budget_ms`）则返回非零退出码，用于检查启动性能回退。
 """
+import time
+
+# 尽早记录进程启动时间，包含后续所有模块导入的耗时
+_START_TIME = time.perf_counter()
+
+import multiprocessing
 import sys
+from PyQt6.QtCore import QTimer
 from PyQt6.QtWidgets import QApplication
-from utils.config_manager import ConfigManager
+from utils.config_service import ConfigService
+from utils.startup_timer import FirstPaintTimer
 from ui.main_window import MainWindow
 from core.hotkey_manager import HotkeyManager
+from core.capture import instance_running
+
+# 默认启动预算：从进程启动到首次绘制的毫秒数
+DEFAULT_STARTUP_BUDGET_MS = 1500
 
 
 def main():
-    # 初始化配置
-    config_manager = ConfigManager()
-    config = config_manager.read_config()
+    startup_check = '--startup-check' in sys.argv
+    # 同一数据目录只运行一个实例，已有实例时请它显示主窗口，避免两个进程同时写数据库
+    if not startup_check and instance_running():
+        print("程序已在运行")
+        return 0
 
     app = QApplication(sys.argv)
     app.setApplicationName('ideaSystemXS')
 
+    # 初始化配置
+    config = ConfigService.instance().config()
+    budget_ms = config.get('startup_budget_ms', DEFAULT_STARTUP_BUDGET_MS)
+
+    def on_first_paint(elapsed_ms):
+        print(f"启动耗时（首次绘制）: {elapsed_ms:.0f} ms，预算 {budget_ms} ms")
+        over_budget = elapsed_ms > budget_ms
+        if over_budget:
+            print("警告: 启动耗时超出预算")
+        if startup_check:
+            app.exit(1 if over_budget else 0)
+        else:
+            # 首次绘制完成后再启动索引构建、重新压缩等后台任务
+            QTimer.singleShot(0, main_window.start_background_tasks)
+
     main_window = MainWindow(config)
+    main_window.first_paint_timer = FirstPaintTimer(main_window, _START_TIME, on_first_paint)
     main_window.show()
 
     # 注册全局快捷键
@@ -48,4 +81,6 @@ def main():
 
 
 if __name__ == '__main__':
+    # 打包为可执行文件后，静态网站导出的渲染进程需要由此进入
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,30 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+
+_qt_app = None
+
+
+def qt_app():
+    """界面测试共用的QApplication（保存在模块中，不会被回收），没有显示器时使用offscreen平台"""
+    global _qt_app
+    if _qt_app is None:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt6.QtWidgets import QApplication
+        _qt_app = QApplication.instance() or QApplication([])
+    return _qt_app
+
+
+class TempDirTestCase(unittest.TestCase):
+    """在临时目录中运行的测试，数据库等相对路径（data/ideas.db）都落在临时目录里"""
+
+    def setUp(self):
+        self._old_cwd = os.getcwd()
+        self.temp_dir = tempfile.mkdtemp()
+        os.chdir(self.temp_dir)
+
+    def tearDown(self):
+        os.chdir(self._old_cwd)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
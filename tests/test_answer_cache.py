@@ -0,0 +1,147 @@
+import time
+import unittest
+
+from core.ai_processor import AIProcessor
+from core.answer_cache import AnswerCache, is_follow_up, negation_signature
+from core.conversation import ConversationMemory
+from core.db_handler import DBHandler
+from core.idea_manager import IdeaManager
+from core.llm_backend import FakeBackend
+from tests import TempDirTestCase, qt_app
+
+
+class AnswerCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = AnswerCache(max_entries=10, threshold=0.8, min_chars=6)
+
+    def test_exact_and_similar_questions_hit(self):
+        self.cache.store("我最近在想哪些关于健身的事情？", 1, "回答")
+        self.assertEqual(self.cache.lookup("我最近在想哪些关于健身的事情", 1), "回答")
+        self.assertEqual(self.cache.lookup("我最近在想哪些关于健身的事", 1), "回答")
+
+    def test_data_version_change_invalidates(self):
+        self.cache.store("我最近在想哪些关于健身的事情", 1, "回答")
+        self.assertIsNone(self.cache.lookup("我最近在想哪些关于健身的事情", 2))
+
+    def test_answer_from_older_version_not_stored(self):
+        self.cache.lookup("我最近在想哪些关于健身的事情", 2)
+        self.cache.store("我最近在想哪些关于健身的事情", 1, "旧回答")
+        self.assertIsNone(self.cache.lookup("我最近在想哪些关于健身的事情", 2))
+
+    def test_follow_up_in_other_conversation_misses(self):
+        self.cache.store("展开说说第二点的内容", 1, "关于A的回答", context=(None, (1, 2)))
+        self.assertIsNone(self.cache.lookup("展开说说第二点的内容", 1, context=(None, (3, 4))))
+        self.assertIsNone(self.cache.lookup("展开说说第二点的内容", 1))
+        self.assertEqual(self.cache.lookup("展开说说第二点的内容", 1, context=(None, (1, 2))), "关于A的回答")
+
+    def test_negated_question_misses(self):
+        self.cache.store("为什么我的计划可以成功", 1, "肯定的回答")
+        self.assertIsNone(self.cache.lookup("为什么我的计划不可以成功", 1))
+        self.cache.store("why does my plan work well", 1, "positive")
+        self.assertIsNone(self.cache.lookup("why doesn't my plan work well", 1))
+        self.assertIsNone(self.cache.lookup("why does my plan not work well", 1))
+
+    def test_short_questions_not_cached(self):
+        self.cache.store("为什么", 1, "回答")
+        self.assertIsNone(self.cache.lookup("为什么", 1))
+
+    def test_is_follow_up(self):
+        self.assertTrue(is_follow_up("为什么这么说"))
+        self.assertTrue(is_follow_up("展开说说第二点的内容"))
+        self.assertTrue(is_follow_up("能再说说上面提到的计划吗"))
+        self.assertTrue(is_follow_up("Tell me more about those ideas"))
+        self.assertFalse(is_follow_up("我最近在想哪些关于健身的事情"))
+        self.assertFalse(is_follow_up("What did I write about fitness last week"))
+
+    def test_negation_signature(self):
+        self.assertEqual(negation_signature("我不想去"), ("不",))
+        self.assertEqual(negation_signature("I don’t know"), ("n't",))
+        self.assertEqual(negation_signature("what is next"), ())
+
+
+class ConversationStateTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db_handler = DBHandler()
+        self.memory = ConversationMemory(self.db_handler, chat_func=None, recent_turns=1)
+
+    def tearDown(self):
+        self.db_handler.close()
+        super().tearDown()
+
+    def test_state_changes_with_each_turn(self):
+        first = self.db_handler.store_chat_message('user', "第一个问题")
+        state_first = self.memory.build_context(first)["state"]
+        self.db_handler.store_chat_message('assistant', "第一个回答")
+        second = self.db_handler.store_chat_message('user', "展开说说第二点")
+        state_second = self.memory.build_context(second)["state"]
+        self.assertEqual(state_first, (None, ()))
+        self.assertNotEqual(state_first, state_second)
+        # 重新回答同一个问题时上下文相同，可以使用缓存
+        self.assertEqual(self.memory.build_context(second)["state"], state_second)
+
+    def test_state_includes_summary(self):
+        self.db_handler.store_chat_message('user', "问题")
+        answer = self.db_handler.store_chat_message('assistant', "回答")
+        question = self.db_handler.store_chat_message('user', "新问题")
+        before = self.memory.build_context(question)["state"]
+        self.db_handler.store_chat_summary(answer - 1, "摘要")
+        after = self.memory.build_context(question)["state"]
+        self.assertNotEqual(before, after)
+        self.assertEqual(after[0], answer - 1)
+
+
+class ConsoleFlowTest(TempDirTestCase):
+    """通过AI对话界面提问：问题先保存为消息，再以它的ID调用query_ai"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = qt_app()
+
+    def setUp(self):
+        super().setUp()
+        from ui.ai_console_ui import AIConsoleUI
+        self.db_handler = DBHandler()
+        self.backend = FakeBackend(handler=lambda messages, model: "回答：" + messages[-1]["content"])
+        self.ai_processor = AIProcessor(self.db_handler, "key", backend=self.backend)
+        self.idea_manager = IdeaManager(self.db_handler, self.ai_processor)
+        self.console = AIConsoleUI(self.idea_manager)
+        self.responses = []
+        self.console.response_ready.connect(lambda key, message: self.responses.append(message))
+
+    def tearDown(self):
+        self.console.deleteLater()
+        self.idea_manager.close()
+        super().tearDown()
+
+    def ask(self, question):
+        count = len(self.responses)
+        self.console.input_edit.setText(question)
+        self.console.send_query()
+        deadline = time.monotonic() + 5
+        while len(self.responses) == count and time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.01)
+        self.app.processEvents()
+        return self.responses[-1]["content"]
+
+    def questions_sent(self):
+        return [call["messages"][-1]["content"] for call in self.backend.calls
+                if call["messages"][0]["content"].startswith("你是一个智能想法分析助手")]
+
+    def test_repeated_question_hits_cache(self):
+        question = "我最近在想哪些关于健身的事情"
+        for _ in range(3):
+            self.assertEqual(self.ask(question), "回答：" + question)
+        self.assertEqual(self.questions_sent(), [question])
+        self.assertEqual((self.ai_processor.answer_cache.hits, self.ai_processor.answer_cache.misses), (2, 1))
+
+    def test_follow_up_is_answered_in_each_conversation(self):
+        self.ask("展开说说第二点的内容")
+        self.ask("我最近在想哪些关于健身的事情")
+        self.ask("展开说说第二点的内容")
+        self.assertEqual(self.questions_sent().count("展开说说第二点的内容"), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
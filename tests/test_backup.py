@@ -0,0 +1,27 @@
+import unittest
+
+from core.backup import BackupManager
+from core.db_handler import DBHandler
+from tests import TempDirTestCase
+
+
+class BackupManagerTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db = DBHandler()
+        self.addCleanup(self.db.close)
+        self.manager = BackupManager(self.db, "backups")
+
+    def test_stop_ends_scheduled_thread(self):
+        self.manager.schedule(1)
+        thread = self.manager._thread
+        self.manager.stop()
+        thread.join(2)
+        self.assertFalse(thread.is_alive())
+        # 停止后不会重新启动
+        self.manager.schedule(1)
+        self.assertIs(self.manager._thread, thread)
+
+
+if __name__ == '__main__':
+    unittest.main()
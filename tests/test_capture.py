@@ -0,0 +1,53 @@
+import socket
+import sys
+import time
+import unittest
+from unittest import mock
+
+from core import capture
+from core.capture import CaptureServer, CMD_CAPTURE, ipc_address, send_command
+from tests import TempDirTestCase
+
+
+@unittest.skipIf(sys.platform == 'win32', "使用Unix套接字模拟不发送数据的客户端")
+class CaptureServerTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.received = []
+        self.server = CaptureServer({CMD_CAPTURE: self.received.append})
+        self.assertTrue(self.server.start())
+        self.addCleanup(self.server.close)
+
+    def silent_client(self):
+        sock = socket.socket(socket.AF_UNIX)
+        sock.connect(ipc_address()[0])
+        self.addCleanup(sock.close)
+        return sock
+
+    def test_capture(self):
+        self.assertEqual(send_command(CMD_CAPTURE, "想法"), {'ok': True})
+        self.assertEqual(self.received, ["想法"])
+
+    def test_silent_client_does_not_block_others(self):
+        self.silent_client()
+        start = time.monotonic()
+        self.assertEqual(send_command(CMD_CAPTURE, "想法"), {'ok': True})
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_silent_client_is_dropped_after_timeout(self):
+        with mock.patch.object(capture, 'IPC_TIMEOUT', 0.2):
+            sock = self.silent_client()
+            sock.settimeout(2)
+            sock.recv(1024)  # 认证的挑战
+            self.assertEqual(sock.recv(1024), b"")
+
+    def test_wrong_key_is_rejected(self):
+        with open(capture.CAPTURE_KEY_FILE, 'wb') as f:
+            f.write(b"wrong")
+        with self.assertRaises(ConnectionError):
+            send_command(CMD_CAPTURE, "想法")
+        self.assertEqual(self.received, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
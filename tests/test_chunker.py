@@ -0,0 +1,68 @@
+import unittest
+from unittest import mock
+
+from core import db_handler
+from core.chunker import chunk_hash, split_into_chunks
+from core.db_handler import DBHandler
+from core.token_budget import estimate_tokens
+from tests import TempDirTestCase
+
+
+class SplitIntoChunksTest(unittest.TestCase):
+    def test_short_text_is_one_chunk(self):
+        self.assertEqual(split_into_chunks("  一段短文本  ", 100), ["一段短文本"])
+        self.assertEqual(split_into_chunks("   ", 100), [])
+
+    def test_merges_short_paragraphs(self):
+        text = "第一段。\n\n第二段。\n\n" + "长" * 30
+        self.assertEqual(split_into_chunks(text, 20), ["第一段。\n\n第二段。", "长" * 20, "长" * 10])
+
+    def test_splits_long_paragraph_by_sentence(self):
+        paragraph = "甲" * 8 + "。" + "乙" * 8 + "。" + "丙" * 8 + "。"
+        chunks = split_into_chunks(paragraph, 20)
+        self.assertEqual(chunks, ["甲" * 8 + "。" + "乙" * 8 + "。", "丙" * 8 + "。"])
+
+    def test_chunks_respect_limit_and_keep_text(self):
+        paragraphs = [("句子%d。" % i) * (i % 7 + 1) for i in range(40)]
+        text = "\n\n".join(paragraphs)
+        chunks = split_into_chunks(text, 50)
+        self.assertTrue(all(estimate_tokens(chunk) <= 50 for chunk in chunks))
+        self.assertEqual("".join(chunks).replace("\n", ""), text.replace("\n", ""))
+
+    def test_editing_one_paragraph_keeps_other_chunks(self):
+        paragraphs = ["第%d段" % i + "内容" * 10 for i in range(6)]
+        before = split_into_chunks("\n\n".join(paragraphs), 50)
+        paragraphs[4] = "第4段" + "修改" * 10
+        after = split_into_chunks("\n\n".join(paragraphs), 50)
+        self.assertEqual(before[:2], after[:2])
+        self.assertNotEqual(before[2], after[2])
+
+
+class ChunkHashTest(unittest.TestCase):
+    def test_key_depends_on_task_model_and_text(self):
+        key = chunk_hash("summary", "文本", "default:m1")
+        self.assertNotEqual(key, chunk_hash("tags", "文本", "default:m1"))
+        self.assertNotEqual(key, chunk_hash("summary", "文本", "default:m2"))
+        self.assertNotEqual(key, chunk_hash("summary", "文本2", "default:m1"))
+        self.assertEqual(key, chunk_hash("summary", "文本", "default:m1"))
+
+
+class ChunkCacheTest(TempDirTestCase):
+    def test_evicts_least_recently_used(self):
+        db = DBHandler()
+        self.addCleanup(db.close)
+        timestamps = iter("2025-01-01T00:00:%02d" % i for i in range(60))
+        with mock.patch.object(db_handler, 'CHUNK_CACHE_MAX', 3), \
+                mock.patch.object(db_handler.datetime, 'datetime') as fake_datetime:
+            fake_datetime.now.side_effect = lambda: mock.Mock(isoformat=lambda: next(timestamps))
+            for key in "abc":
+                db.store_chunk_result(key, "summary", key.upper())
+            self.assertEqual(db.get_chunk_result("a"), "A")
+            db.store_chunk_result("d", "summary", "D")
+
+        self.assertIsNone(db.get_chunk_result("b"))
+        self.assertEqual([db.get_chunk_result(key) for key in "acd"], ["A", "C", "D"])
+
+
+if __name__ == '__main__':
+    unittest.main()
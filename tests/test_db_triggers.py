@@ -0,0 +1,84 @@
+import sqlite3
+import unittest
+
+from core.db_handler import DBHandler, CODEC_ZLIB
+from tests import TempDirTestCase
+
+
+class ExternalWriteTest(TempDirTestCase):
+    """其他连接（没有idea_text函数）写入数据库"""
+
+    def setUp(self):
+        super().setUp()
+        self.db = DBHandler()
+        self.addCleanup(self.db.close)
+
+    def external(self):
+        conn = sqlite3.connect('data/ideas.db')
+        self.addCleanup(conn.close)
+        return conn
+
+    def changes(self, since):
+        return [(idea_id, kind) for _, idea_id, kind in self.db.get_changes_since(since)]
+
+    def test_plain_connection_can_write(self):
+        idea_id = self.db.store_idea("已有的想法")
+        version = self.db.get_change_version()
+
+        conn = self.external()
+        conn.execute("INSERT INTO ideas (content, timestamp) VALUES ('外部写入的想法', '2024-01-01T00:00:00')")
+        conn.execute("UPDATE ideas SET tags = '[\"外部\"]' WHERE id = ?", (idea_id,))
+        conn.commit()
+
+        new_id = idea_id + 1
+        self.assertEqual(self.changes(version), [(new_id, 'inserted'), (idea_id, 'analysis_updated')])
+        self.assertEqual(self.db.query_ideas("tag:外部")[0][2], idea_id)
+
+    def test_repair_updates_index_and_display_columns(self):
+        self.assertFalse(self.db.repair_external_writes())
+        conn = self.external()
+        conn.execute("INSERT INTO ideas (content, timestamp) VALUES ('外部写入的想法', '2024-01-01T00:00:00')")
+        conn.commit()
+
+        self.assertTrue(self.db.has_external_writes())
+        self.assertTrue(self.db.repair_external_writes())
+        self.assertFalse(self.db.has_external_writes())
+        self.assertFalse(self.db.repair_external_writes())
+        row = self.db.query_ideas("外部写入")[0]
+        self.assertEqual(row[1], "外部写入的想法")
+        self.assertTrue(row[5])
+        if self.db.fts_enabled:
+            self.assertEqual([r[2] for r in self.db.query_ideas("外部写入", sort_by='relevance')], [row[2]])
+
+    def test_own_writes_need_no_repair(self):
+        idea_id = self.db.store_idea("自己写入的想法")
+        self.db.update_idea_tags(idea_id, ["标签"])
+        self.db.update_idea_content(idea_id, "修改后的想法")
+        self.assertFalse(self.db.has_external_writes())
+        self.assertFalse(self.db.repair_external_writes())
+
+    def test_recompression_is_not_a_change(self):
+        idea_id = self.db.store_idea("很长的想法" * 50)
+        version = self.db.get_change_version()
+        self.db.compress_threshold = 10
+        self.db.recompress_batch()
+        self.assertEqual(self.db.get_idea_by_id(idea_id)['content'], "很长的想法" * 50)
+        self.assertEqual(self.changes(version), [])
+
+        self.db.compress_threshold = 0
+        self.db.recompress_batch()
+        self.assertEqual(self.changes(version), [])
+
+    def test_edit_that_changes_codec_is_logged_once(self):
+        idea_id = self.db.store_idea("短想法")
+        version = self.db.get_change_version()
+        self.db.compress_threshold = 10
+        self.db.update_idea_content(idea_id, "修改后变长的想法" * 50)
+        self.db.cursor.execute("SELECT codec FROM ideas WHERE id = ?", (idea_id,))
+        self.assertEqual(self.db.cursor.fetchone()[0], CODEC_ZLIB)
+        self.assertEqual(self.changes(version), [(idea_id, 'content_updated')])
+        self.assertFalse(self.db.repair_external_writes())
+
+
+if __name__ == '__main__':
+    unittest.main()
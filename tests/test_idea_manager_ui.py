@@ -0,0 +1,56 @@
+import unittest
+from unittest import mock
+
+from core.db_handler import DBHandler
+from core.idea_manager import IdeaManager
+from tests import TempDirTestCase, qt_app
+
+
+class IdeaListRefreshTest(TempDirTestCase):
+    """编辑想法后增量刷新列表：行的位置和是否显示应与重新查询的结果一致"""
+
+    @classmethod
+    def setUpClass(cls):
+        qt_app()
+
+    def setUp(self):
+        super().setUp()
+        from ui.idea_manager_ui import IdeaManagerUI
+        self.db = DBHandler()
+        self.idea_manager = IdeaManager(self.db, mock.MagicMock())
+        self.addCleanup(self.db.close)
+        self.addCleanup(self.idea_manager.close)
+        self.ids = [self.db.store_idea(text) for text in ("香蕉", "苹果", "橙子", "葡萄")]
+        for idea_id in self.ids[:3]:
+            self.db.update_idea_tags(idea_id, ["水果"])
+        self.ui = IdeaManagerUI(self.idea_manager)
+        self.addCleanup(self.ui.deleteLater)
+
+    def shown(self):
+        return [self.ui.idea_table.item(row, 0).data(0x0100) for row in range(self.ui.idea_table.rowCount())]
+
+    def expected(self, query, sort_by):
+        return [row[2] for row in self.db.query_ideas(query, sort_by)]
+
+    def test_edit_moves_row_in_keyword_order(self):
+        self.ui.update_idea_list(None, 'keyword')
+        self.assertEqual(self.shown(), self.expected(None, 'keyword'))
+        self.db.update_idea_content(self.ids[0], "啊")
+        self.db.update_idea_content(self.ids[2], "西瓜")
+        self.ui.refresh_changes()
+        self.assertEqual(self.shown(), [self.ids[0], self.ids[1], self.ids[3], self.ids[2]])
+        self.assertEqual(self.shown(), self.expected(None, 'keyword'))
+        self.assertEqual(self.ui.loaded_count, 4)
+
+    def test_edit_removes_row_that_no_longer_matches(self):
+        self.ui.update_idea_list("tag:水果", 'time')
+        self.assertEqual(sorted(self.shown()), sorted(self.ids[:3]))
+        self.db.update_idea_tags(self.ids[1], ["其他"])
+        self.db.update_idea_tags(self.ids[3], ["水果"])
+        self.ui.refresh_changes()
+        self.assertEqual(self.shown(), self.expected("tag:水果", 'time'))
+        self.assertEqual(self.ui.loaded_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import json
+import unittest
+from unittest import mock
+
+from core.db_handler import DBHandler
+from core import importer
+from core.importer import IdeaImporter, ImportStateError
+from tests import TempDirTestCase
+
+
+class IdeaImporterTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db = DBHandler()
+        self.addCleanup(lambda: self.db.close())
+        self.path = "notes.jsonl"
+        with open(self.path, 'w', encoding='utf-8') as f:
+            for i in range(25):
+                f.write(json.dumps({'content': f"想法{i} 关键词{i}", 'tags': ["导入"]}, ensure_ascii=False) + "\n")
+
+    def contents(self):
+        return sorted(row[1] for row in self.db.get_idea_texts())
+
+    def fts_count(self, word):
+        self.db.cursor.execute("SELECT count(*) FROM ideas_fts WHERE ideas_fts MATCH ?", (word,))
+        return self.db.cursor.fetchone()[0]
+
+    def test_resume_after_stop(self):
+        idea_importer = IdeaImporter(self.db, batch_size=10)
+        first = idea_importer.import_file(self.path, should_stop=lambda: True)
+        self.assertEqual((first['imported'], first['finished']), (10, False))
+
+        second = idea_importer.import_file(self.path)
+        self.assertTrue(second['resumed'])
+        self.assertEqual((second['imported'], second['total'], second['finished']), (15, 25, True))
+        self.assertEqual(self.contents(), sorted(f"想法{i} 关键词{i}" for i in range(25)))
+
+    def test_finished_file_needs_restart(self):
+        idea_importer = IdeaImporter(self.db, batch_size=10)
+        idea_importer.import_file(self.path)
+        with self.assertRaises(ImportStateError):
+            idea_importer.import_file(self.path)
+        self.assertEqual(idea_importer.import_file(self.path, restart=True)['imported'], 25)
+        self.assertEqual(self.db.get_idea_count(), 50)
+
+    def test_deferred_fts_is_rebuilt(self):
+        with mock.patch.object(importer, 'ESTIMATED_RECORD_BYTES', 1), \
+                mock.patch.object(self.db, 'rebuild_fts_index', wraps=self.db.rebuild_fts_index) as rebuild:
+            result = IdeaImporter(self.db, batch_size=10).import_file(self.path, should_stop=lambda: True)
+        rebuild.assert_called_once_with()
+        self.assertEqual(result['imported'], 10)
+        self.assertIsNone(self.db.get_meta('fts_rebuild_pending'))
+        self.assertEqual(self.fts_count("关键词"), 10)
+
+    def test_pending_fts_rebuild_runs_on_next_start(self):
+        self.db.import_ideas([("未索引的想法", "2025-01-01T00:00:00", None, None)], "import:x", "{}",
+                             defer_fts=True)
+        self.assertEqual(self.db.get_meta('fts_rebuild_pending'), '1')
+        self.db.close()
+
+        self.db = DBHandler()
+        self.assertIsNone(self.db.get_meta('fts_rebuild_pending'))
+        self.assertEqual(self.fts_count('"未索引的想法"'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from tests import qt_app
+from ui.insights_ui import CardListModel
+
+
+def card(i):
+    return {'timestamp': "2025-01-01T00:00:%05d" % i, 'title': f"见解{i}", 'content': "内容"}
+
+
+class CardListModelTest(unittest.TestCase):
+    LIMIT = 120
+
+    @classmethod
+    def setUpClass(cls):
+        qt_app()
+
+    def setUp(self):
+        self.model = CardListModel(lambda item: item['timestamp'])
+        self.resets = []
+        self.inserted = []
+        self.removed = []
+        self.model.modelReset.connect(lambda: self.resets.append(True))
+        self.model.rowsInserted.connect(lambda parent, first, last: self.inserted.append((first, last)))
+        self.model.rowsRemoved.connect(lambda parent, first, last: self.removed.append((first, last)))
+
+    def history(self, newest):
+        """与memory["insights"]相同：新的在前，最多保留LIMIT条"""
+        return [card(i) for i in range(newest, max(newest - self.LIMIT, -1), -1)]
+
+    def rows(self):
+        return [self.model.data(self.model.index(row), 0) for row in range(self.model.rowCount())]
+
+    def test_new_items_are_inserted_at_front(self):
+        self.model.set_items(self.history(9))
+        self.model.set_items(self.history(11))
+        self.assertEqual(len(self.resets), 1)
+        self.assertEqual(self.inserted, [(0, 1)])
+        self.assertEqual(self.rows()[:3], ["见解11", "见解10", "见解9"])
+
+    def test_full_history_drops_tail_without_reset(self):
+        self.model.set_items(self.history(self.LIMIT - 1))
+        while self.model.canFetchMore():
+            self.model.fetchMore()
+        for newest in range(self.LIMIT, self.LIMIT + 5):
+            self.model.set_items(self.history(newest))
+        self.assertEqual(len(self.resets), 1)
+        self.assertEqual(self.removed, [(self.LIMIT - 1, self.LIMIT - 1)] * 5)
+        self.assertEqual(self.inserted[-5:], [(0, 0)] * 5)
+        self.assertEqual(self.rows(), [f"见解{i}" for i in range(self.LIMIT + 4, 4, -1)])
+
+    def test_dropped_rows_not_yet_fetched(self):
+        self.model.set_items(self.history(self.LIMIT - 1))
+        self.model.set_items(self.history(self.LIMIT + 1))
+        self.assertEqual(len(self.resets), 1)
+        self.assertEqual(self.removed, [])
+        self.assertEqual(self.model.rowCount(), CardListModel.BATCH_SIZE + 2)
+        self.assertEqual(self.rows()[0], f"见解{self.LIMIT + 1}")
+
+
+if __name__ == '__main__':
+    unittest.main()
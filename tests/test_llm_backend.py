@@ -0,0 +1,30 @@
+import unittest
+
+from core.llm_backend import FakeBackend, LLMError, OpenAICompatibleBackend
+
+
+class BackendErrorTest(unittest.TestCase):
+    """后端的任何失败都以LLMError抛出"""
+
+    def test_fake_handler_error(self):
+        def handler(messages, model):
+            raise RuntimeError("boom")
+
+        with self.assertRaises(LLMError):
+            FakeBackend(handler=handler).chat([{"role": "user", "content": "hi"}], model="m")
+
+    def test_unencodable_message(self):
+        backend = OpenAICompatibleBackend(api_base="http://127.0.0.1:9/v1", timeout=1)
+        self.addCleanup(backend.close)
+        with self.assertRaises(LLMError):
+            backend.chat([{"role": "user", "content": object()}], model="m")
+
+    def test_invalid_address(self):
+        backend = OpenAICompatibleBackend(api_base="not a url", timeout=1)
+        self.addCleanup(backend.close)
+        with self.assertRaises(LLMError):
+            backend.chat([{"role": "user", "content": "hi"}], model="m")
+
+
+if __name__ == '__main__':
+    unittest.main()
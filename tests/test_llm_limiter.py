@@ -0,0 +1,71 @@
+import threading
+import time
+import unittest
+
+from core.llm_limiter import AdmissionController, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+
+
+class AdmissionControllerTest(unittest.TestCase):
+    def setUp(self):
+        self.controller = AdmissionController(max_concurrency=4, interactive_latency_target=1.0,
+                                              recovery_interval=0.2)
+
+    def interactive(self, elapsed):
+        self.assertTrue(self.controller.acquire(PRIORITY_INTERACTIVE, timeout=0))
+        self.controller.release(PRIORITY_INTERACTIVE, elapsed)
+
+    def test_one_slot_still_reserved_for_interactive(self):
+        controller = AdmissionController(max_concurrency=1)
+        self.assertEqual((controller.max_concurrency, controller.max_batch), (2, 1))
+        self.assertTrue(controller.acquire(PRIORITY_BATCH, timeout=0))
+        self.assertFalse(controller.acquire(PRIORITY_BATCH, timeout=0))
+        self.assertTrue(controller.acquire(PRIORITY_INTERACTIVE, timeout=0))
+
+    def test_slow_interactive_halves_batch_limit(self):
+        self.interactive(0.5)
+        self.interactive(0.5)
+        self.interactive(2.0)
+        # 滑动平均 0.5*0.7 + 2.0*0.3 = 0.95，未超过目标值，只减半
+        self.assertEqual(self.controller.batch_limit, 1)
+
+    def test_slow_average_pauses_batch(self):
+        self.interactive(5.0)
+        self.assertEqual(self.controller.batch_limit, 0)
+        self.assertFalse(self.controller.acquire(PRIORITY_BATCH, timeout=0.05))
+        # 交互请求不受影响
+        self.assertTrue(self.controller.acquire(PRIORITY_INTERACTIVE, timeout=0))
+
+    def test_batch_limit_recovers_over_time(self):
+        self.interactive(5.0)
+        started = time.monotonic()
+        self.assertTrue(self.controller.acquire(PRIORITY_BATCH, timeout=2))
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        self.controller.release(PRIORITY_BATCH)
+
+        time.sleep(0.5)
+        self.assertEqual(self.controller.stats()["batch_limit"], 3)
+
+    def test_waiting_batch_wakes_up_on_recovery(self):
+        self.interactive(5.0)
+        admitted = threading.Event()
+
+        def batch():
+            with self.controller.slot(PRIORITY_BATCH):
+                admitted.set()
+
+        thread = threading.Thread(target=batch)
+        thread.start()
+        self.assertTrue(admitted.wait(2))
+        thread.join()
+
+    def test_slot_timeout_does_not_release(self):
+        self.interactive(5.0)
+        with self.assertRaises(TimeoutError):
+            with self.controller.slot(PRIORITY_BATCH, timeout=0.05):
+                pass
+        stats = self.controller.stats()
+        self.assertEqual((stats["active"], stats["active_batch"]), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
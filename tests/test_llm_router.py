@@ -0,0 +1,49 @@
+import unittest
+
+from core.llm_backend import FakeBackend, LLMBackend, LLMError
+from core.llm_router import Endpoint, ModelPool
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class BrokenBackend(LLMBackend):
+    """抛出非LLMError异常的后端"""
+
+    def __init__(self, error):
+        self.error = error
+
+    def chat(self, messages, model, max_tokens=None, temperature=0.7, timeout=None):
+        raise self.error
+
+
+class ModelPoolTest(unittest.TestCase):
+    def test_fails_over_on_llm_error(self):
+        bad = Endpoint(BrokenBackend(LLMError("down")), "m", "bad")
+        good = Endpoint(FakeBackend(["ok"]), "m", "good")
+        bad.latency = 0.1
+        pool = ModelPool("default", [bad, good])
+
+        result = pool.chat(MESSAGES)
+        self.assertEqual((result["content"], result["endpoint"]), ("ok", "good"))
+        self.assertEqual((bad.in_flight, bad.failures), (0, 1))
+        self.assertEqual((good.in_flight, good.failures), (0, 0))
+
+    def test_other_errors_release_endpoint(self):
+        endpoint = Endpoint(BrokenBackend(RuntimeError("bug")), "m", "broken")
+        pool = ModelPool("default", [endpoint])
+
+        with self.assertRaises(RuntimeError):
+            pool.chat(MESSAGES)
+        self.assertEqual(endpoint.in_flight, 0)
+        self.assertEqual(endpoint.failures, 1)
+        self.assertGreater(endpoint.cooldown_until, 0)
+
+    def test_all_endpoints_fail(self):
+        endpoints = [Endpoint(BrokenBackend(LLMError("down")), "m", str(i)) for i in range(2)]
+        with self.assertRaises(LLMError):
+            ModelPool("default", endpoints).chat(MESSAGES)
+        self.assertEqual([e.in_flight for e in endpoints], [0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
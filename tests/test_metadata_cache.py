@@ -0,0 +1,67 @@
+import unittest
+from unittest import mock
+
+from core import metadata_cache
+from core.db_handler import DBHandler
+from core.metadata_cache import MetadataCache
+from core.search_query import metadata_filters
+from tests import TempDirTestCase
+
+TAGS = [["工作"], ["Work", "产品"], None, ["产品"], ["阅读", "work"], []]
+CONTENTS = ["北京", "阿里", "Apple", "apple", "阿里", "123", "中文", "北京"]
+QUERIES = ["", "tag:work", "tag:产品 -tag:WORK", "after:2025-01-02", "before:2025-01-03 tag:工作",
+           "-tag:产品 after:2025-01-01 before:2025-01-04", "tag:不存在"]
+
+
+class MetadataCacheTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db = DBHandler()
+        self.addCleanup(self.db.close)
+        # 时间戳和排序键都有重复，检查并列时的顺序
+        items = [(CONTENTS[i % len(CONTENTS)], "2025-01-0%dT10:00:00" % (1 + i % 4), TAGS[i % len(TAGS)], None)
+                 for i in range(40)]
+        self.db.import_ideas(items, "import:test", "{}")
+        self.cache = MetadataCache(self.db)
+        self.cache.rebuild()
+        self.cache._ready.set()
+
+    def assert_same_as_sql(self):
+        for query in QUERIES:
+            for sort_by in ('time', 'keyword'):
+                expected = [row[2] for row in self.db.query_ideas(query or None, sort_by)]
+                self.assertEqual(self.cache.query(sort_by, **metadata_filters(query)), expected, (query, sort_by))
+
+    def test_matches_sql(self):
+        self.assert_same_as_sql()
+
+    def test_matches_sql_without_numpy(self):
+        with mock.patch.object(metadata_cache, 'np', None):
+            self.cache.rebuild()
+            self.assert_same_as_sql()
+
+    def test_matches_sql_after_sync(self):
+        self.cache.query('keyword')  # 先建立按关键词排好序的列表，检查增量维护
+        self.db.update_idea_tags(3, ["工作"])
+        self.db.update_idea_content(5, "阿里")
+        self.db.cursor.execute("DELETE FROM ideas WHERE id = 7")
+        self.db.conn.commit()
+        self.db.store_idea("新的想法")
+        self.cache.sync()
+        self.assertEqual(len(self.cache), 40)
+        self.assert_same_as_sql()
+
+    def test_pruned_change_log_rebuilds(self):
+        self.db.store_idea("新的想法")
+        self.db.cursor.execute("DELETE FROM ideas WHERE id = 1")
+        self.db.conn.commit()
+        self.db.prune_change_log(keep=1)
+        self.cache._building = True  # 与后台构建线程中的同步相同
+        self.cache.sync()
+        self.assertEqual(self.cache.data_version, self.db.get_change_version())
+        self.assertEqual(len(self.cache), 40)
+        self.assert_same_as_sql()
+
+
+if __name__ == '__main__':
+    unittest.main()
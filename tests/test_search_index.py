@@ -0,0 +1,59 @@
+import threading
+import unittest
+
+from core.db_handler import DBHandler
+from core.search_index import TrigramIndex
+from tests import TempDirTestCase
+
+
+class TrigramIndexTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db = DBHandler()
+        self.addCleanup(self.db.close)
+        self.db.store_ideas([("健身计划", "2025-01-01T10:00:00"), ("读书笔记", "2025-01-02T10:00:00")])
+
+    def load(self):
+        index = TrigramIndex(self.db)
+        index.start()
+        for thread in threading.enumerate():
+            if thread.name == "search-index":
+                thread.join()
+        self.assertTrue(index.ready)
+        return index
+
+    def found(self, index, query):
+        return [idea_id for idea_id, _ in index.search(query)]
+
+    def test_snapshot_is_synced(self):
+        self.load().save_snapshot()
+        new_id = self.db.store_idea("旅行攻略")
+        self.assertEqual(self.found(self.load(), "旅行攻略"), [new_id])
+
+    def test_snapshot_older_than_change_log_is_rebuilt(self):
+        self.load().save_snapshot()
+        new_ids = [self.db.store_idea(f"旅行攻略{i}") for i in range(3)]
+        self.db.cursor.execute("DELETE FROM ideas WHERE id = 1")
+        self.db.conn.commit()
+        self.db.prune_change_log(keep=1)
+
+        index = self.load()
+        self.assertEqual(sorted(self.found(index, "旅行攻略")), new_ids)
+        self.assertEqual(self.found(index, "健身计划"), [])
+        self.assertEqual(index.data_version, self.db.get_change_version())
+
+    def test_concurrent_sync_applies_changes_once(self):
+        index = self.load()
+        for i in range(20):
+            self.db.store_idea(f"旅行攻略{i}")
+        threads = [threading.Thread(target=index.sync) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(index), 22)
+        self.assertEqual(len(index._ids), 22)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+
+from core.db_handler import DBHandler
+from core.search_query import (Predicate, build_where, compile_predicates, is_plain_text, metadata_filters,
+                               parse_query, plan_clauses)
+from tests import TempDirTestCase
+
+
+class ParseQueryTest(unittest.TestCase):
+    def test_fields_phrases_and_negation(self):
+        self.assertEqual(parse_query('产品 "完整 短语" tag:工作 -tag:done after:2025-01-01 has:Summary'), [
+            Predicate('text', '产品', False),
+            Predicate('text', '完整 短语', False),
+            Predicate('tag', '工作', False),
+            Predicate('tag', 'done', True),
+            Predicate('after', '2025-01-01', False),
+            Predicate('has', 'summary', False),
+        ])
+
+    def test_unknown_fields_are_text(self):
+        self.assertEqual(parse_query('http://a.b after:昨天 has:x -"x:y"'), [
+            Predicate('text', 'http://a.b', False),
+            Predicate('text', 'after:昨天', False),
+            Predicate('text', 'has:x', False),
+            Predicate('text', 'x:y', True),
+        ])
+
+    def test_empty(self):
+        self.assertEqual(parse_query(""), [])
+        self.assertEqual(parse_query('  "" - '), [Predicate('text', '-', False)])
+
+    def test_plain_text_and_metadata_filters(self):
+        self.assertTrue(is_plain_text("产品 规划"))
+        self.assertFalse(is_plain_text('"产品"'))
+        self.assertFalse(is_plain_text("产品 tag:工作"))
+        self.assertEqual(metadata_filters("tag:a -tag:b after:2025-01-01 after:2025-02-01 -before:2025-01-15"),
+                         {'tags': ['a'], 'exclude_tags': ['b'], 'after': '2025-02-01', 'before': None})
+        self.assertIsNone(metadata_filters("tag:a 文本"))
+
+
+class CompileTest(unittest.TestCase):
+    def test_fts_terms_are_merged_into_one_match(self):
+        clauses = compile_predicates(parse_query('产品规划 "用户 反馈" ab'), fts_enabled=True)
+        self.assertEqual(clauses[0].params, ['"产品规划" AND "用户 反馈"'])
+        self.assertEqual(clauses[0].index_sql, "id IN (SELECT rowid FROM ideas_fts WHERE ideas_fts MATCH ?)")
+        self.assertEqual(clauses[0].filter_sql, "+id IN (SELECT rowid FROM ideas_fts WHERE ideas_fts MATCH ?)")
+        # 少于3个字符的词不能走trigram索引，用LIKE过滤
+        self.assertIsNone(clauses[1].estimate_sql)
+        self.assertEqual(clauses[1].params, ['%ab%'] * 3)
+        self.assertEqual(len(clauses), 2)
+
+    def test_without_fts_uses_escaped_like(self):
+        clauses = compile_predicates(parse_query('100%_完成'), fts_enabled=False)
+        self.assertEqual(len(clauses), 1)
+        self.assertEqual(clauses[0].params, ['%100\\%\\_完成%'] * 3)
+
+    def test_date_range_is_one_clause(self):
+        clauses = compile_predicates(parse_query("after:2025-01-01 after:2025-03-01 before:2025-06-01"), True)
+        self.assertEqual(len(clauses), 1)
+        self.assertEqual(clauses[0].index_sql, "timestamp >= ? AND timestamp < ?")
+        self.assertEqual(clauses[0].filter_sql, "+timestamp >= ? AND +timestamp < ?")
+        self.assertEqual(clauses[0].params, ['2025-03-01', '2025-06-01'])
+
+    def test_most_selective_clause_drives(self):
+        clauses = compile_predicates(parse_query("tag:常见 tag:少见 -tag:排除 has:tags"), True)
+        counts = {'常见': 500, '少见': 3}
+        driver, filters, notes = plan_clauses(clauses, lambda sql, params: counts[params[0]])
+        self.assertEqual(driver.params, ['少见'])
+        self.assertEqual(notes[-1], "驱动条件: 标签 少见")
+
+        where, params = build_where(driver, filters)
+        self.assertEqual(where, " WHERE id IN (SELECT idea_id FROM idea_tags WHERE tag = ?)"
+                                " AND +id IN (SELECT idea_id FROM idea_tags WHERE tag = ?)"
+                                " AND id NOT IN (SELECT idea_id FROM idea_tags WHERE tag = ?)"
+                                " AND (tags IS NOT NULL AND tags != '[]' AND tags != '')")
+        self.assertEqual(params, ['少见', '常见', '排除'])
+
+    def test_no_indexed_clause(self):
+        driver, filters, _ = plan_clauses(compile_predicates(parse_query("-ab has:summary"), True), None)
+        self.assertIsNone(driver)
+        self.assertEqual(len(filters), 2)
+        self.assertEqual(build_where(None, []), ("", []))
+
+
+class QueryIdeasTest(TempDirTestCase):
+    IDEAS = [
+        ("产品规划第一版", "2025-01-05T10:00:00", ["工作"], None),
+        ("产品规划第二版 100%完成", "2025-02-05T10:00:00", ["工作", "done"], "已完成"),
+        ("周末读书笔记", "2025-03-05T10:00:00", ["阅读"], None),
+        ("ab测试结果", "2025-04-05T10:00:00", None, "产品规划相关"),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.db = DBHandler()
+        self.addCleanup(self.db.close)
+        self.db.import_ideas(self.IDEAS, "import:test", "{}")
+
+    def contents(self, query, sort_by='time'):
+        ids = [row[2] for row in self.db.query_ideas(query, sort_by)]
+        return [self.db.get_idea_by_id(idea_id)['content'] for idea_id in ids]
+
+    def test_queries(self):
+        self.assertEqual(self.contents("产品规划"), ["ab测试结果", "产品规划第二版 100%完成", "产品规划第一版"])
+        self.assertEqual(self.contents("产品规划 -tag:done"), ["ab测试结果", "产品规划第一版"])
+        self.assertEqual(self.contents("tag:工作 after:2025-02-01"), ["产品规划第二版 100%完成"])
+        self.assertEqual(self.contents("has:summary -before:2025-03-01"), ["ab测试结果"])
+        self.assertEqual(self.contents('"100%"'), ["产品规划第二版 100%完成"])
+        self.assertEqual(self.contents("ab"), ["ab测试结果"])
+        self.assertEqual(self.contents("-产品规划"), ["周末读书笔记"])
+
+    def test_idea_matches_agrees_with_query(self):
+        for query in ("产品规划", "tag:工作 -tag:done", "has:summary", "ab", "after:2025-03-01"):
+            matched = {row[2] for row in self.db.query_ideas(query)}
+            for idea_id in range(1, len(self.IDEAS) + 1):
+                self.assertEqual(self.db.idea_matches(query, idea_id), idea_id in matched, (query, idea_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
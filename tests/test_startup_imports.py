@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 启动（显示主窗口之前）不应导入的模块，它们只在后台任务或相应功能第一次使用时导入
+DEFERRED_MODULES = [
+    'numpy', 'pypinyin', 'requests',
+    'core.importer', 'core.exporter', 'core.site_export', 'core.backup',
+    'ui.settings_ui', 'ui.ai_console_ui', 'ui.insights_ui',
+]
+
+
+class StartupImportTest(unittest.TestCase):
+    def test_main_does_not_import_heavy_modules(self):
+        code = ("import sys, main; "
+                "print(' '.join(name for name in sys.argv[1:] if name in sys.modules))")
+        result = subprocess.run(
+            [sys.executable, '-c', code] + DEFERRED_MODULES,
+            cwd=ROOT_DIR, capture_output=True, text=True, timeout=60,
+            env=dict(os.environ, QT_QPA_PLATFORM='offscreen')
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.split(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
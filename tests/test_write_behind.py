@@ -0,0 +1,105 @@
+import json
+import os
+import unittest
+
+from core.db_handler import DBHandler
+from core.write_behind import WriteBehindQueue
+from tests import TempDirTestCase
+
+
+class FlakyDB:
+    """在fail为True时写入总是失败的数据库替身"""
+
+    def __init__(self):
+        self.fail = False
+        self.rows = []
+
+    def store_ideas(self, items):
+        if self.fail:
+            raise RuntimeError("database is locked")
+        ids = []
+        for item in items:
+            self.rows.append(item)
+            ids.append(len(self.rows))
+        return ids
+
+    def find_idea(self, content, timestamp):
+        for idea_id, row in enumerate(self.rows, 1):
+            if row == (content, timestamp):
+                return idea_id
+        return None
+
+
+class WriteBehindFailureTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db = FlakyDB()
+        self.errors = []
+        WriteBehindQueue.RETRY_INTERVAL = 0.05
+        self.addCleanup(setattr, WriteBehindQueue, 'RETRY_INTERVAL', 30)
+
+    def make_queue(self):
+        return WriteBehindQueue(self.db, on_error=lambda count, error: self.errors.append((count, error)))
+
+    def test_failed_batch_is_spooled_and_reported(self):
+        self.db.fail = True
+        write_queue = self.make_queue()
+        written = []
+        write_queue.put("想法一", written.append)
+        write_queue.flush()
+        write_queue_first_item = write_queue._failed[0][:2]
+        self.assertEqual(self.errors, [(1, "database is locked")])
+        self.assertEqual(write_queue.unsaved_count, 1)
+        with open("data/unsaved_ideas.jsonl", encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.readline())['content'], "想法一")
+        self.assertEqual(written, [])
+
+        # 数据库恢复后定时重试写入，原来的回调照常调用，待写文件被删除
+        self.db.fail = False
+        write_queue.put("想法二")
+        write_queue.flush()
+        write_queue.close()
+        self.assertCountEqual([row[0] for row in self.db.rows], ["想法一", "想法二"])
+        self.assertEqual(written, [self.db.find_idea(*write_queue_first_item)])
+        self.assertEqual(write_queue.unsaved_count, 0)
+        self.assertFalse(os.path.exists("data/unsaved_ideas.jsonl"))
+
+    def test_spool_replayed_on_next_start_without_duplicates(self):
+        self.db.fail = True
+        write_queue = self.make_queue()
+        write_queue.put("想法一")
+        write_queue.put("想法二")
+        write_queue.flush()
+        write_queue.close()
+        self.assertEqual(write_queue.unsaved_count, 2)
+
+        # 模拟上次写入成功后未能更新待写文件
+        self.db.fail = False
+        self.db.store_ideas([write_queue._failed[0][:2]])
+        write_queue = self.make_queue()
+        write_queue.close()
+        self.assertEqual([row[0] for row in self.db.rows], ["想法一", "想法二"])
+        self.assertFalse(os.path.exists("data/unsaved_ideas.jsonl"))
+
+
+class WriteBehindDBTest(TempDirTestCase):
+    def test_writes_with_entry_timestamps(self):
+        db_handler = DBHandler()
+        try:
+            write_queue = WriteBehindQueue(db_handler)
+            ids = []
+            write_queue.put("第一条", ids.append)
+            write_queue.put("第二条", ids.append)
+            write_queue.close()
+            self.assertEqual(len(ids), 2)
+            rows = sorted(db_handler.get_idea_rows(ids))
+            self.assertEqual([row[1] for row in rows], ["第一条", "第二条"])
+            self.assertLessEqual(rows[0][2], rows[1][2])
+            self.assertEqual(db_handler.find_idea("第一条", rows[0][2]), ids[0])
+            self.assertIsNone(db_handler.find_idea("第一条", rows[1][2]))
+        finally:
+            db_handler.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,35 +1,302 @@
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QTextEdit, QLineEdit, 
-    QPushButton, QHBoxLayout, QLabel, QSplitter,
-    QScrollArea, QFrame
+    QWidget, QVBoxLayout, QLineEdit, QListView,
+    QPushButton, QHBoxLayout, QLabel, QStyledItemDelegate,
+    QAbstractItemView
 )
-from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtGui import QFont, QTextCursor
+from PyQt6.QtCore import (
+    Qt, QSize, QRectF, QAbstractListModel, QModelIndex, QObject, QTimer, pyqtSignal
+)
+from PyQt6.QtGui import QFont, QColor, QPainter, QTextDocument
 from core.idea_manager import IdeaManager
+from collections import OrderedDict
 from typing import TYPE_CHECKING
+import html
+import itertools
 import threading
 
 if TYPE_CHECKING:
     from core.idea_manager import IdeaManager
 
 
+# 消息数据所在的数据角色
+MESSAGE_ROLE = Qt.ItemDataRole.UserRole + 1
+
+# 消息角色，system和thinking只在界面上显示，不写入对话记录
+ROLE_USER = 'user'
+ROLE_ASSISTANT = 'assistant'
+ROLE_SYSTEM = 'system'
+ROLE_THINKING = 'thinking'
+
+
+def render_markdown(text: str) -> str:
+    """把Markdown转换为HTML，QTextDocument只能在界面线程中使用"""
+    document = QTextDocument()
+    document.setMarkdown(text)
+    return document.toHtml()
+
+
+class MarkdownRenderer(QObject):
+    """
+    把AI回复的Markdown逐条转换为HTML
+
+    转换在界面线程中进行，但每轮事件循环只转换一条，一次加载一页消息时界面仍能及时响应；
+    最后提交的消息最先转换（加载的一页中最新的消息，或刚刚向上翻出的消息），消息先以纯文本显示。
+    """
+
+    # 参数为(消息键, HTML)
+    rendered = pyqtSignal(int, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # 消息键 -> 待转换的Markdown
+        self._pending = OrderedDict()
+        self._timer = QTimer(self)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self._render_next)
+
+    def render(self, key: int, text: str):
+        self._pending[key] = text
+        self._pending.move_to_end(key)
+        self._timer.start()
+
+    def _render_next(self):
+        if not self._pending:
+            self._timer.stop()
+            return
+        key, text = self._pending.popitem()
+        try:
+            self.rendered.emit(key, render_markdown(text))
+        except Exception as e:
+            print(f"渲染Markdown时出错: {e}")
+
+
+class ChatMessageModel(QAbstractListModel):
+    """
+    对话消息模型，只保存当前显示窗口内的消息
+
+    每条消息是一个字典：key（界面内唯一的键，已保存的消息即数据库ID，临时消息为负数）、
+    id（数据库ID，临时消息为None）、role、content，以及Markdown渲染完成后的html。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._messages = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._messages)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._messages):
+            return None
+        message = self._messages[index.row()]
+        if role == MESSAGE_ROLE:
+            return message
+        if role == Qt.ItemDataRole.DisplayRole:
+            return message['content']
+        return None
+
+    def set_messages(self, messages):
+        self.beginResetModel()
+        self._messages = list(messages)
+        self.endResetModel()
+
+    def append_message(self, message):
+        row = len(self._messages)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._messages.append(message)
+        self.endInsertRows()
+
+    def prepend_messages(self, messages):
+        if not messages:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(messages) - 1)
+        self._messages[:0] = messages
+        self.endInsertRows()
+
+    def remove_front(self, count):
+        """从开头移除若干条消息"""
+        count = min(count, len(self._messages))
+        if count <= 0:
+            return
+        self.beginRemoveRows(QModelIndex(), 0, count - 1)
+        del self._messages[:count]
+        self.endRemoveRows()
+
+    def remove_back(self, count):
+        """从末尾移除若干条消息"""
+        count = min(count, len(self._messages))
+        if count <= 0:
+            return
+        start = len(self._messages) - count
+        self.beginRemoveRows(QModelIndex(), start, len(self._messages) - 1)
+        del self._messages[start:]
+        self.endRemoveRows()
+
+    def row_of(self, key):
+        for row, message in enumerate(self._messages):
+            if message['key'] == key:
+                return row
+        return -1
+
+    def remove_message(self, key):
+        row = self.row_of(key)
+        if row < 0:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._messages[row]
+        self.endRemoveRows()
+
+    def set_html(self, key, rendered_html):
+        """保存消息渲染后的HTML，返回消息所在的索引（消息已不在窗口内时返回None）"""
+        row = self.row_of(key)
+        if row < 0:
+            return None
+        self._messages[row]['html'] = rendered_html
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+        return index
+
+    def oldest_id(self):
+        """窗口内最早一条已保存消息的ID"""
+        for message in self._messages:
+            if message['id'] is not None:
+                return message['id']
+        return None
+
+    def newest_id(self):
+        """窗口内最新一条已保存消息的ID"""
+        for message in reversed(self._messages):
+            if message['id'] is not None:
+                return message['id']
+        return None
+
+
+class ChatMessageDelegate(QStyledItemDelegate):
+    """
+    绘制对话消息的委托
+
+    消息正文排版为QTextDocument并按(消息键, 宽度)缓存，缓存大小与界面保留的消息数相当，
+    因此无论对话多长，排版开销只与当前窗口内的消息有关。
+    """
+
+    MARGIN = 5
+    PADDING = 10
+    CACHE_SIZE = 400
+
+    SPEAKERS = {ROLE_USER: "你:", ROLE_ASSISTANT: "AI:"}
+    BACKGROUNDS = {ROLE_ASSISTANT: QColor(230, 230, 250, 77)}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._documents = OrderedDict()
+
+    def _document(self, option, message, width):
+        cache_key = (message['key'], width, 'html' in message)
+        document = self._documents.get(cache_key)
+        if document is not None:
+            self._documents.move_to_end(cache_key)
+            return document
+
+        document = QTextDocument()
+        document.setDefaultFont(option.font)
+        document.setDocumentMargin(0)
+        role = message['role']
+        if 'html' in message:
+            document.setHtml(message['html'])
+        elif role in (ROLE_SYSTEM, ROLE_THINKING):
+            document.setHtml(f"<i style='color: gray;'>{html.escape(message['content'])}</i>")
+        else:
+            document.setPlainText(message['content'])
+        document.setTextWidth(max(1, width - 2 * (self.MARGIN + self.PADDING)))
+
+        self._documents[cache_key] = document
+        if len(self._documents) > self.CACHE_SIZE:
+            self._documents.popitem(last=False)
+        return document
+
+    def _speaker_height(self, option, message):
+        if message['role'] not in self.SPEAKERS:
+            return 0
+        return option.fontMetrics.height() + 4
+
+    def sizeHint(self, option, index):
+        message = index.data(MESSAGE_ROLE)
+        width = option.rect.width() or 400
+        document = self._document(option, message, width)
+        height = document.size().height() + self._speaker_height(option, message)
+        return QSize(width, int(height) + 2 * (self.MARGIN + self.PADDING))
+
+    def paint(self, painter: QPainter, option, index):
+        message = index.data(MESSAGE_ROLE)
+        rect = option.rect
+        document = self._document(option, message, rect.width())
+
+        painter.save()
+        background = self.BACKGROUNDS.get(message['role'])
+        if background is not None:
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(background)
+            painter.drawRoundedRect(
+                QRectF(rect.adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)), 10, 10
+            )
+
+        x = rect.left() + self.MARGIN + self.PADDING
+        y = rect.top() + self.MARGIN + self.PADDING
+        speaker = self.SPEAKERS.get(message['role'])
+        if speaker:
+            font = QFont(option.font)
+            font.setBold(True)
+            painter.setFont(font)
+            painter.setPen(option.palette.text().color())
+            painter.drawText(x, y + option.fontMetrics.ascent(), speaker)
+            y += self._speaker_height(option, message)
+
+        painter.translate(x, y)
+        document.drawContents(painter)
+        painter.restore()
+
+
 class AIConsoleUI(QWidget):
+    # AI回复完成（在后台线程中发出），参数为(思考提示的消息键, 回复消息)
+    response_ready = pyqtSignal(int, dict)
+
+    # 界面上最多保留的消息数，更早的消息在向上滚动时从数据库分页读取
+    MAX_LIVE_MESSAGES = 200
+    # 每次从数据库读取的消息数
+    PAGE_SIZE = 50
+
     def __init__(self, idea_manager: 'IdeaManager'):
         super().__init__()
         self.idea_manager = idea_manager
-        
-        # 对话历史
-        self.conversation_history = []
-        
+
+        # 临时消息（系统提示、思考提示）使用负数作为消息键，与数据库ID区分
+        self._transient_keys = itertools.count(-1, -1)
+        # 仍然有效的临时消息：消息键 -> 消息，after_id为显示时最新一条已保存消息的ID，
+        # 重新显示最新对话时据此把临时消息放回原来的位置
+        self._transient = OrderedDict()
+        # 数据库中是否还有比窗口更早的消息
+        self.has_older = False
+        # 窗口是否包含最新的消息
+        self.at_latest = True
+
+        self.renderer = MarkdownRenderer(self)
+        self.renderer.rendered.connect(self.on_markdown_rendered)
+        self.response_ready.connect(self.update_ai_response)
+
         # 设置布局
         self.setup_ui()
 
+        # 加载最近的对话
+        self.load_latest_messages()
+        self.show_system_message("欢迎使用AI对话功能。输入你的问题，AI将基于你的想法数据库提供回答。")
+
     def setup_ui(self):
         """设置UI布局"""
         layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(15)
-        
+
         # 创建标题
         title_label = QLabel("AI 对话")
         title_font = QFont()
@@ -37,122 +304,221 @@ class AIConsoleUI(QWidget):
         title_font.setBold(True)
         title_label.setFont(title_font)
         layout.addWidget(title_label)
-        
+
         # 创建说明文本
         desc_label = QLabel("使用AI助手来分析和探索你的想法，提出问题或请求建议。")
         layout.addWidget(desc_label)
-        
-        # 创建对话区域
-        self.chat_area = QTextEdit()
-        self.chat_area.setReadOnly(True)
-        self.chat_area.setMinimumHeight(300)
-        layout.addWidget(self.chat_area)
-        
+
+        # 创建对话区域，只绘制可见的消息
+        self.message_model = ChatMessageModel(self)
+        self.message_delegate = ChatMessageDelegate(self)
+        self.chat_view = QListView()
+        self.chat_view.setModel(self.message_model)
+        self.chat_view.setItemDelegate(self.message_delegate)
+        self.chat_view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.chat_view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.chat_view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.chat_view.setMinimumHeight(300)
+        self.chat_view.verticalScrollBar().valueChanged.connect(self.on_chat_scrolled)
+        layout.addWidget(self.chat_view)
+
         # 创建输入区域
         input_layout = QHBoxLayout()
-        
+
         self.input_edit = QLineEdit()
         self.input_edit.setPlaceholderText("输入你的问题...")
         self.input_edit.returnPressed.connect(self.send_query)
         input_layout.addWidget(self.input_edit)
-        
+
         send_button = QPushButton("发送")
         send_button.clicked.connect(self.send_query)
         input_layout.addWidget(send_button)
-        
+
         layout.addLayout(input_layout)
-        
+
         # 添加提示
         tips_label = QLabel("提示: 你可以询问关于你想法的问题，如'我最近在思考什么?'或'我有哪些关于工作的想法?'")
         tips_label.setWordWrap(True)
         layout.addWidget(tips_label)
-        
-        # 显示初始消息
-        self.show_system_message("欢迎使用AI对话功能。输入你的问题，AI将基于你的想法数据库提供回答。")
+
+    def _prepare_messages(self, messages):
+        """为数据库中读取的消息分配消息键，并提交AI回复的Markdown渲染"""
+        for message in messages:
+            message['key'] = message['id']
+            if message['role'] == ROLE_ASSISTANT:
+                self.renderer.render(message['key'], message['content'])
+        return messages
+
+    def _with_transient(self, messages, after_id):
+        """
+        把after_id（含）之后显示的临时消息插回已保存的消息之间
+
+        Args:
+            messages: 已保存的消息，按时间从早到晚排列
+            after_id: 只插回after_id为该值或更新的临时消息，为None时插回全部
+        """
+        pending = [
+            message for message in self._transient.values()
+            if after_id is None or (message['after_id'] or 0) >= after_id
+        ]
+        result = []
+        for message in messages:
+            while pending and (pending[0]['after_id'] or 0) < message['id']:
+                result.append(pending.pop(0))
+            result.append(message)
+        return result + pending
+
+    def load_latest_messages(self):
+        """显示最新的一页对话"""
+        messages = self._prepare_messages(self.idea_manager.get_chat_messages(limit=self.PAGE_SIZE))
+        self.has_older = len(messages) == self.PAGE_SIZE
+        self.at_latest = True
+        after_id = messages[0]['id'] if messages and self.has_older else None
+        self.message_model.set_messages(self._with_transient(messages, after_id))
+        self.chat_view.scrollToBottom()
+
+    def show_latest_messages(self):
+        """
+        从较早的对话回到最新的对话：在末尾追加窗口之后的消息（包括其间显示过的临时消息），
+        只有窗口之后的消息超过上限时才重新加载
+        """
+        newest_id = self.message_model.newest_id()
+        messages = self.idea_manager.get_chat_messages(limit=self.MAX_LIVE_MESSAGES, after_id=newest_id)
+        if newest_id is None or len(messages) == self.MAX_LIVE_MESSAGES:
+            self.load_latest_messages()
+            return
+
+        self.at_latest = True
+        for message in self._with_transient(self._prepare_messages(messages), newest_id):
+            if self.message_model.row_of(message['key']) < 0:
+                self.message_model.append_message(message)
+        overflow = self.message_model.rowCount() - self.MAX_LIVE_MESSAGES
+        if overflow > 0:
+            self.message_model.remove_front(overflow)
+            self.has_older = True
+
+    def load_older_messages(self):
+        """向上滚动到顶部时，从数据库读取更早的一页对话"""
+        oldest_id = self.message_model.oldest_id()
+        if oldest_id is None:
+            self.has_older = False
+            return
+        messages = self.idea_manager.get_chat_messages(before_id=oldest_id, limit=self.PAGE_SIZE)
+        self.has_older = len(messages) == self.PAGE_SIZE
+        if not messages:
+            return
+
+        self.message_model.prepend_messages(self._prepare_messages(messages))
+        # 保持原来顶部的消息仍在顶部，避免视图跳动
+        self.chat_view.scrollTo(
+            self.message_model.index(len(messages)), QAbstractItemView.ScrollHint.PositionAtTop
+        )
+
+        # 超出上限时丢弃最新的消息，发送新消息时再重新加载
+        overflow = self.message_model.rowCount() - self.MAX_LIVE_MESSAGES
+        if overflow > 0:
+            self.message_model.remove_back(overflow)
+            self.at_latest = False
+
+    def on_chat_scrolled(self, value):
+        """滚动到顶部时加载更早的对话"""
+        if self.has_older and value == self.chat_view.verticalScrollBar().minimum():
+            self.load_older_messages()
+
+    def append_message(self, message):
+        """在末尾添加一条消息，界面内消息超过上限时丢弃最早的消息"""
+        if not self.at_latest:
+            self.show_latest_messages()
+            if message['id'] is not None and self.message_model.row_of(message['key']) >= 0:
+                return
+
+        if message['id'] is None:
+            message['after_id'] = self.message_model.newest_id()
+            self._transient[message['key']] = message
+            while len(self._transient) > self.MAX_LIVE_MESSAGES:
+                self._transient.popitem(last=False)
+        self.message_model.append_message(message)
+        overflow = self.message_model.rowCount() - self.MAX_LIVE_MESSAGES
+        if overflow > 0:
+            self.message_model.remove_front(overflow)
+            self.has_older = True
+        self.chat_view.scrollToBottom()
 
     def show_system_message(self, message):
         """显示系统消息"""
-        html = f"<div style='color: gray; margin: 5px 0;'><i>{message}</i></div>"
-        self.chat_area.append(html)
-        # 滚动到底部
-        self.chat_area.moveCursor(QTextCursor.MoveOperation.End)
+        key = next(self._transient_keys)
+        self.append_message({'key': key, 'id': None, 'role': ROLE_SYSTEM, 'content': message})
+        return key
 
     def show_user_message(self, message):
-        """显示用户消息"""
-        html = f"<div style='margin: 10px 0;'><b>你:</b> {message}</div>"
-        self.chat_area.append(html)
-        # 滚动到底部
-        self.chat_area.moveCursor(QTextCursor.MoveOperation.End)
+        """显示并保存用户消息，返回消息ID"""
+        message_id = self.idea_manager.add_chat_message(ROLE_USER, message)
+        self.append_message({'key': message_id, 'id': message_id, 'role': ROLE_USER, 'content': message})
+        return message_id
 
     def show_ai_message(self, message):
-        """显示AI消息"""
-        html = f"<div style='background-color: rgba(230, 230, 250, 0.3); border-radius: 10px; padding: 10px; margin: 10px 0;'><b>AI:</b> {message}</div>"
-        self.chat_area.append(html)
-        # 滚动到底部
-        self.chat_area.moveCursor(QTextCursor.MoveOperation.End)
+        """显示AI消息，Markdown在后台渲染完成后替换为格式化的内容"""
+        self.append_message(message)
+        if message['role'] == ROLE_ASSISTANT:
+            self.renderer.render(message['key'], message['content'])
 
     def show_thinking_message(self):
         """显示AI正在思考的消息"""
-        self.chat_area.append("<div style='color: gray; margin: 5px 0;'><i>AI正在思考...</i></div>")
-        # 滚动到底部
-        self.chat_area.moveCursor(QTextCursor.MoveOperation.End)
+        key = next(self._transient_keys)
+        self.append_message({'key': key, 'id': None, 'role': ROLE_THINKING, 'content': "AI正在思考..."})
+        return key
 
     def send_query(self):
         """发送查询到AI"""
         query = self.input_edit.text().strip()
         if not query:
             return
-            
+
         # 显示用户消息
-        self.show_user_message(query)
-        
+        message_id = self.show_user_message(query)
+
         # 清空输入框
         self.input_edit.clear()
-        
+
         # 显示AI正在思考
-        self.show_thinking_message()
-        
+        thinking_key = self.show_thinking_message()
+
         # 在后台线程中处理查询，避免UI冻结
-        threading.Thread(target=self.process_query, args=(query,), daemon=True).start()
+        threading.Thread(target=self.process_query, args=(query, message_id, thinking_key), daemon=True).start()
 
-    def process_query(self, query):
-        """在后台处理查询"""
+    def process_query(self, query, message_id, thinking_key):
+        """在后台处理查询，该问题之前的对话作为上下文"""
         try:
-            # 获取AI回复
-            response = self.idea_manager.query_ai(query)
-            
-            # 在UI线程中更新显示
-            from PyQt6.QtCore import QMetaObject, Qt, Q_ARG
-            QMetaObject.invokeMethod(
-                self, 
-                "update_ai_response", 
-                Qt.ConnectionType.QueuedConnection, 
-                Q_ARG(str, response)
-            )
-            
+            # 获取AI回复并保存到对话记录
+            response = self.idea_manager.query_ai(query, before_id=message_id)
+            message_id = self.idea_manager.add_chat_message(ROLE_ASSISTANT, response)
+            message = {'key': message_id, 'id': message_id, 'role': ROLE_ASSISTANT, 'content': response}
         except Exception as e:
             # 处理错误
-            error_message = f"处理查询时出错: {str(e)}"
-            QMetaObject.invokeMethod(
-                self, 
-                "update_ai_response", 
-                Qt.ConnectionType.QueuedConnection, 
-                Q_ARG(str, error_message)
-            )
+            message = {
+                'key': next(self._transient_keys), 'id': None,
+                'role': ROLE_SYSTEM, 'content': f"处理查询时出错: {str(e)}"
+            }
+
+        # 通过信号回到UI线程更新显示
+        self.response_ready.emit(thinking_key, message)
 
-    def update_ai_response(self, response):
+    def update_ai_response(self, thinking_key, message):
         """更新AI响应到UI"""
         # 移除"正在思考"消息
-        cursor = self.chat_area.textCursor()
-        cursor.movePosition(QTextCursor.MoveOperation.End)
-        cursor.movePosition(QTextCursor.MoveOperation.StartOfBlock, QTextCursor.MoveMode.KeepAnchor)
-        cursor.removeSelectedText()
-        
+        self._transient.pop(thinking_key, None)
+        self.message_model.remove_message(thinking_key)
+
         # 显示AI回复
-        self.show_ai_message(response)
-        
-        # 保存对话历史
-        self.conversation_history.append({
-            "role": "assistant",
-            "content": response
-        })
\ No newline at end of file
+        self.show_ai_message(message)
+
+    def on_markdown_rendered(self, key, rendered_html):
+        """Markdown渲染完成后更新对应消息，消息高度随之重新计算"""
+        scroll_bar = self.chat_view.verticalScrollBar()
+        at_bottom = scroll_bar.value() == scroll_bar.maximum()
+        index = self.message_model.set_html(key, rendered_html)
+        if index is not None:
+            self.message_delegate.sizeHintChanged.emit(index)
+            # 原来停在底部时，消息变高后仍保持在底部
+            if at_bottom:
+                self.chat_view.scrollToBottom()
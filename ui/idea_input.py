@@ -11,6 +11,12 @@ if TYPE_CHECKING:
 
 class IdeaInputWindow(QDialog):
     def __init__(self, idea_manager: 'IdeaManager'):
+        """
+        初始化输入窗口，窗口创建一次后隐藏复用
+        
+        Args:
+            idea_manager: 想法管理器实例
+        """
         super().__init__()
         self.idea_manager = idea_manager
         self.setModal(True)
@@ -26,9 +32,8 @@ class IdeaInputWindow(QDialog):
         self.setup_ui()
         
         # 设置动画
-        from utils.config_manager import ConfigManager
-        config = ConfigManager().read_config()
-        if config.get('enable_animations', True):
+        from utils.config_service import ConfigService
+        if ConfigService.instance().get('enable_animations', True):
             self.setup_animations()
 
     def setup_ui(self):
@@ -91,11 +96,18 @@ class IdeaInputWindow(QDialog):
         self.showEvent = animated_show_event
         self.hideEvent = animated_hide_event
 
+    def prepare(self):
+        """清空上一次的输入，准备再次显示"""
+        self.text_edit.clear()
+        self.text_edit.document().setModified(False)
+        self.text_edit.setFocus()
+
     def save_idea(self):
-        """保存想法"""
+        """保存想法，放入写后队列后立即关闭窗口"""
         idea_text = self.text_edit.toPlainText().strip()
         if idea_text:
-            self.idea_manager.add_idea(idea_text)
+            self.idea_manager.add_idea_async(idea_text)
+            self.text_edit.document().setModified(False)
             self.accept()
         else:
             from PyQt6.QtWidgets import QMessageBox
@@ -1,19 +1,71 @@
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, 
     QPushButton, QLineEdit, QHBoxLayout, QLabel, 
-    QHeaderView, QMenu, QDialog, QTextEdit, QMessageBox
+    QHeaderView, QMenu, QDialog, QTextEdit, QMessageBox,
+    QStyledItemDelegate, QStyleOptionViewItem, QStyle, QApplication
+)
+from PyQt6.QtCore import Qt, pyqtSignal, QSize, QRect
+from PyQt6.QtGui import QAction, QIcon, QFont, QContextMenuEvent, QColor, QFontMetrics, QPalette
+from core.idea_manager import (
+    IdeaManager, CHANGE_INSERTED, CHANGE_CONTENT_UPDATED,
+    CHANGE_ANALYSIS_UPDATED, CHANGE_DELETED
 )
-from PyQt6.QtCore import Qt, pyqtSignal, QSize
-from PyQt6.QtGui import QAction, QIcon, QFont, QContextMenuEvent
-from core.idea_manager import IdeaManager
 from typing import TYPE_CHECKING
-import datetime
-import json
+from core.search_query import is_plain_text, split_highlight, strip_highlight
 
 if TYPE_CHECKING:
     from core.idea_manager import IdeaManager
 
 
+# 内容列中保存搜索摘录（带匹配词标记）的数据角色
+SNIPPET_ROLE = Qt.ItemDataRole.UserRole + 2
+
+
+class SnippetDelegate(QStyledItemDelegate):
+    """在内容列中绘制搜索摘录，匹配词加粗并以高亮色显示，没有摘录的单元格按默认方式绘制"""
+    HIGHLIGHT_COLOR = QColor("#d35400")
+
+    def paint(self, painter, option, index):
+        snippet = index.data(SNIPPET_ROLE)
+        if not snippet:
+            super().paint(painter, option, index)
+            return
+
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        opt.text = ""
+        style = opt.widget.style() if opt.widget else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_ItemViewItem, opt, painter, opt.widget)
+        rect = style.subElementRect(QStyle.SubElement.SE_ItemViewItemText, opt, opt.widget)
+
+        selected = bool(opt.state & QStyle.StateFlag.State_Selected)
+        text_color = opt.palette.color(
+            QPalette.ColorRole.HighlightedText if selected else QPalette.ColorRole.Text
+        )
+        bold_font = QFont(opt.font)
+        bold_font.setBold(True)
+
+        painter.save()
+        painter.setClipRect(rect)
+        x = rect.left()
+        for text, matched in split_highlight(snippet.replace("\n", " ")):
+            remaining = rect.right() - x
+            if remaining <= 0:
+                break
+            font = bold_font if matched else opt.font
+            metrics = QFontMetrics(font)
+            width = metrics.horizontalAdvance(text)
+            if width > remaining:
+                text = metrics.elidedText(text, Qt.TextElideMode.ElideRight, remaining)
+                width = remaining
+            painter.setFont(font)
+            painter.setPen(self.HIGHLIGHT_COLOR if matched and not selected else text_color)
+            painter.drawText(QRect(x, rect.top(), width, rect.height()),
+                             Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, text)
+            x += width
+        painter.restore()
+
+
 class IdeaEditDialog(QDialog):
     """想法编辑对话框"""
     
@@ -66,10 +118,36 @@ class IdeaEditDialog(QDialog):
 
 
 class IdeaManagerUI(QWidget):
+    # 每页加载的想法条数，滚动到底部时加载下一页
+    PAGE_SIZE = 100
+    # 普通词语的精确匹配少于该条数时，在结果末尾补充模糊搜索（容忍错字）的结果
+    FUZZY_FALLBACK_BELOW = 20
+    # 补充的模糊搜索结果最多条数
+    FUZZY_LIMIT = 200
+    # 时间列中保存原始时间戳的数据角色
+    TIMESTAMP_ROLE = Qt.ItemDataRole.UserRole + 1
+    # 内容列中保存排序键的数据角色
+    SORT_KEY_ROLE = Qt.ItemDataRole.UserRole + 3
+
     def __init__(self, idea_manager: 'IdeaManager'):
         super().__init__()
         self.idea_manager = idea_manager
         
+        # 当前列表的查询条件和分页状态
+        self.current_query = None
+        self.current_sort = 'time'
+        self.loaded_count = 0
+        self.has_more = False
+        # 由内存元数据缓存得到的全部结果ID（不适用时为None）和已加载到的位置
+        self.cached_ids = None
+        self.cached_pos = 0
+        # 末尾补充的模糊搜索结果条数
+        self.fuzzy_count = 0
+        # 想法ID -> 该行时间列的单元格，行号随插入删除变化，需要时由单元格取得
+        self.row_items = {}
+        # 表格内容已同步到的数据版本
+        self.data_version = 0
+        
         # 设置布局
         self.setup_ui()
         
@@ -100,7 +178,7 @@ class IdeaManagerUI(QWidget):
         search_layout.addWidget(search_label)
         
         self.search_edit = QLineEdit()
-        self.search_edit.setPlaceholderText("输入关键词搜索...")
+        self.search_edit.setPlaceholderText('输入关键词搜索，支持 tag:标签 after:2025-01-01 before:日期 has:summary -排除 "短语"')
         self.search_edit.textChanged.connect(self.search_ideas)
         search_layout.addWidget(self.search_edit)
         
@@ -120,6 +198,10 @@ class IdeaManagerUI(QWidget):
         sort_keyword_button.clicked.connect(self.sort_by_keyword)
         sort_layout.addWidget(sort_keyword_button)
         
+        sort_relevance_button = QPushButton("按相关度排序")
+        sort_relevance_button.clicked.connect(self.sort_by_relevance)
+        sort_layout.addWidget(sort_relevance_button)
+        
         sort_layout.addStretch()
         
         layout.addLayout(sort_layout)
@@ -133,6 +215,8 @@ class IdeaManagerUI(QWidget):
         self.idea_table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.idea_table.customContextMenuRequested.connect(self.show_context_menu)
         self.idea_table.doubleClicked.connect(self.edit_idea)
+        self.idea_table.verticalScrollBar().valueChanged.connect(self.on_table_scrolled)
+        self.idea_table.setItemDelegateForColumn(1, SnippetDelegate(self.idea_table))
         
         # 设置列宽
         self.idea_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
@@ -146,7 +230,7 @@ class IdeaManagerUI(QWidget):
         bottom_layout = QHBoxLayout()
         
         refresh_button = QPushButton("刷新列表")
-        refresh_button.clicked.connect(self.update_idea_list)
+        refresh_button.clicked.connect(self.refresh_changes)
         bottom_layout.addWidget(refresh_button)
         
         analyze_button = QPushButton("触发AI分析")
@@ -159,57 +243,260 @@ class IdeaManagerUI(QWidget):
 
     def update_idea_list(self, query: str = None, sort_by: str = 'time'):
         """
-        更新想法列表
+        更新想法列表，只加载第一页，其余在滚动到底部时加载
         
         Args:
             query: 查询关键词
             sort_by: 排序方式
         """
+        self.current_query = query
+        self.current_sort = sort_by
+        self.loaded_count = 0
+        self.has_more = True
+        self.data_version = self.idea_manager.get_change_version()
+        # 只含标签和日期条件时在内存中完成排序和过滤，之后只需按页读取可见的行
+        self.cached_ids = self.idea_manager.metadata_query(query, sort_by)
+        self.cached_pos = 0
+        self.fuzzy_count = 0
+        
+        self.idea_table.setRowCount(0)
+        self.row_items.clear()
+        self.load_more_ideas()
+
+    def load_more_ideas(self):
+        """加载下一页想法并追加到表格末尾"""
+        if not self.has_more:
+            return
+        
+        ideas = None
+        if self.cached_ids is not None:
+            page = self.cached_ids[self.cached_pos:self.cached_pos + self.PAGE_SIZE]
+            ideas = self.idea_manager.get_list_rows(page)
+            self.cached_pos += len(page)
+            self.has_more = self.cached_pos < len(self.cached_ids)
+        
         # 获取想法数据
-        ideas = self.idea_manager.query_ideas(query, sort_by)
+        if ideas is None:
+            ideas = self.idea_manager.query_ideas(
+                self.current_query, self.current_sort,
+                limit=self.PAGE_SIZE, offset=self.loaded_count
+            )
+            self.has_more = len(ideas) == self.PAGE_SIZE
         
         # 更新表格
-        self.idea_table.setRowCount(0)
-        for i, idea in enumerate(ideas):
+        start_row = self.idea_table.rowCount()
+        for offset, idea in enumerate(ideas):
+            i = start_row + offset
             self.idea_table.insertRow(i)
+            self.set_row(i, idea)
+        
+        self.loaded_count += len(ideas)
+        if not self.has_more:
+            self.append_fuzzy_matches()
+
+    def append_fuzzy_matches(self):
+        """
+        普通词语的精确匹配很少时（可能有错字，如把"路线图"打成"路线途"），
+        在已全部加载的精确结果之后补充内存索引模糊搜索的结果，按匹配程度排序
+        """
+        if (self.current_sort == 'relevance' or not self.current_query
+                or not is_plain_text(self.current_query) or self.loaded_count >= self.FUZZY_FALLBACK_BELOW):
+            return
+        # 索引尚未就绪时只显示精确结果
+        ideas = self.idea_manager.fuzzy_search(self.current_query, self.FUZZY_LIMIT)
+        if not ideas:
+            return
+        
+        for idea in ideas:
+            if idea[2] in self.row_items:
+                continue
+            i = self.idea_table.rowCount()
+            self.idea_table.insertRow(i)
+            self.set_row(i, idea)
+            self.idea_table.item(i, 1).setToolTip("近似匹配")
+            self.fuzzy_count += 1
+
+    def set_row(self, i, idea):
+        """
+        设置表格中一行的数据
+        
+        Args:
+            i: 行号
+            idea: 想法元组(时间戳, 内容预览, ID, 标签文本, 摘要, 显示时间, 排序键)，
+                  预览、标签文本、显示时间和排序键在写入数据库时已生成，完整内容在打开或编辑时再读取
+        """
+        timestamp, preview, idea_id, tags_display, summary, display_time, key = idea
+        time_item = QTableWidgetItem(display_time or timestamp)
+        content_item = QTableWidgetItem(strip_highlight(preview or ""))
+        if self.current_sort == 'relevance':
+            # 按相关度排序时预览为匹配词附近的摘录
+            content_item.setData(SNIPPET_ROLE, preview)
+        tags_item = QTableWidgetItem(tags_display or "")
+        summary_item = QTableWidgetItem(summary or "")
+        
+        time_item.setData(Qt.ItemDataRole.UserRole, idea_id)  # 存储ID
+        time_item.setData(self.TIMESTAMP_ROLE, timestamp)  # 存储原始时间戳，用于确定插入位置
+        content_item.setData(self.SORT_KEY_ROLE, (key or "", idea_id))  # 按关键词排序时确定插入位置
+        
+        self.idea_table.setItem(i, 0, time_item)
+        self.idea_table.setItem(i, 1, content_item)
+        self.idea_table.setItem(i, 2, tags_item)
+        self.idea_table.setItem(i, 3, summary_item)
+        self.row_items[idea_id] = time_item
+
+    def find_row(self, idea_id):
+        """查找想法所在的行，未加载时返回-1"""
+        item = self.row_items.get(idea_id)
+        return -1 if item is None else item.row()
+
+    def refresh_changes(self):
+        """只刷新上次同步之后数据库中发生变化的想法"""
+        result = self.idea_manager.get_changes_since(self.data_version)
+        if result is None:
+            # 变更日志已不完整，完整重新加载
+            self.update_idea_list(self.current_query, self.current_sort)
+            return
+        
+        self.data_version, changes = result
+        for kind in (CHANGE_INSERTED, CHANGE_CONTENT_UPDATED, CHANGE_ANALYSIS_UPDATED, CHANGE_DELETED):
+            if changes.get(kind):
+                self.apply_idea_changes(kind, changes[kind])
+
+    def apply_idea_changes(self, kind, idea_ids):
+        """
+        根据想法变更通知只更新受影响的行，而不是重新加载整个列表
+        
+        Args:
+            kind: 变更类型
+            idea_ids: 发生变更的想法ID列表
+        """
+        # 相关度排序和补充的模糊搜索结果按匹配程度排序，有新想法时重新搜索；
+        # 批量导入等一次新增超过一页的想法时，重新加载比逐行插入快
+        if kind == CHANGE_INSERTED and (self.current_sort == 'relevance' or self.fuzzy_count
+                                        or len(idea_ids) > self.PAGE_SIZE):
+            self.update_idea_list(self.current_query, self.current_sort)
+            return
+        
+        rows = {} if kind == CHANGE_DELETED else {
+            row[2]: row for row in self.idea_manager.get_list_rows(idea_ids)
+        }
+        for idea_id in idea_ids:
+            if kind == CHANGE_DELETED:
+                self.remove_idea_row(idea_id)
+                continue
             
-            # 解析时间
-            timestamp = idea[0]
-            try:
-                dt = datetime.datetime.fromisoformat(timestamp)
-                time_str = dt.strftime("%Y-%m-%d %H:%M")
-            except Exception:
-                time_str = timestamp
-                
-            # 解析标签
-            tags_str = ""
-            if idea[3]:  # 标签列
-                try:
-                    tags = json.loads(idea[3])
-                    tags_str = ", ".join(tags)
-                except Exception:
-                    tags_str = str(idea[3])
-            
-            # 设置各列数据
-            time_item = QTableWidgetItem(time_str)
+            row_data = rows.get(idea_id)
+            if row_data is None:
+                continue
             
-            # 截断内容，避免过长
-            content = idea[1]
-            max_display_length = 100
-            content_display = content if len(content) <= max_display_length else content[:max_display_length] + "..."
-            content_item = QTableWidgetItem(content_display)
+            if kind == CHANGE_INSERTED:
+                self.insert_idea_row(row_data)
+                continue
             
-            tags_item = QTableWidgetItem(tags_str)
-            summary_item = QTableWidgetItem(idea[4] or "")
+            row = self.find_row(idea_id)
+            if row < 0:
+                # 修改后可能开始符合搜索条件（模糊结果按匹配程度排列，不插入）
+                if self.current_query and not self.fuzzy_count:
+                    self.insert_idea_row(row_data)
+                continue
             
-            # 存储完整数据
-            time_item.setData(Qt.ItemDataRole.UserRole, idea[2])  # 存储ID
-            content_item.setData(Qt.ItemDataRole.UserRole, content)  # 存储完整内容
+            # 补充的模糊结果不按搜索条件和排序键排列，原地更新即可
+            fuzzy = row >= self.idea_table.rowCount() - self.fuzzy_count
+            if (not fuzzy and self.current_query
+                    and not self.idea_manager.idea_matches(self.current_query, idea_id)):
+                self.remove_idea_row(idea_id)
+                continue
             
-            self.idea_table.setItem(i, 0, time_item)
-            self.idea_table.setItem(i, 1, content_item)
-            self.idea_table.setItem(i, 2, tags_item)
-            self.idea_table.setItem(i, 3, summary_item)
+            if kind == CHANGE_CONTENT_UPDATED:
+                content_item = self.idea_table.item(row, 1)
+                sort_key = (row_data[6] or "", idea_id)
+                if (not fuzzy and self.current_sort == 'keyword'
+                        and content_item.data(self.SORT_KEY_ROLE) != sort_key):
+                    # 排序键变化后移到新的位置
+                    self.remove_idea_row(idea_id)
+                    self.insert_idea_row(row_data)
+                    continue
+                content_item.setText(row_data[1])
+                content_item.setData(SNIPPET_ROLE, None)
+                content_item.setData(self.SORT_KEY_ROLE, sort_key)
+            elif kind == CHANGE_ANALYSIS_UPDATED:
+                self.idea_table.item(row, 2).setText(row_data[3] or "")
+                self.idea_table.item(row, 3).setText(row_data[4] or "")
+        
+        if self.cached_ids is not None:
+            self.refresh_cached_ids()
+
+    def refresh_cached_ids(self):
+        """数据变化后重新从元数据缓存取得结果，从表格最后一行之后继续分页"""
+        ids = self.idea_manager.metadata_query(self.current_query, self.current_sort)
+        if ids is None:
+            # 缓存不可用，之后按已加载的行数从数据库分页
+            self.cached_ids = None
+            return
+        
+        position = self.idea_table.rowCount()
+        if position:
+            last_id = self.idea_table.item(position - 1, 0).data(Qt.ItemDataRole.UserRole)
+            try:
+                position = ids.index(last_id) + 1
+            except ValueError:
+                pass
+        self.cached_ids = ids
+        self.cached_pos = position
+        self.has_more = position < len(ids)
+
+    def remove_idea_row(self, idea_id):
+        """从表格中移除想法所在的行，不在表格中时不做任何事"""
+        row = self.find_row(idea_id)
+        if row < 0:
+            return
+        if row >= self.idea_table.rowCount() - self.fuzzy_count:
+            self.fuzzy_count -= 1
+        else:
+            self.loaded_count -= 1
+        self.idea_table.removeRow(row)
+        del self.row_items[idea_id]
+
+    def insert_idea_row(self, idea):
+        """
+        把新想法插入到当前排序下的正确位置
+        
+        Args:
+            idea: 想法元组，格式同set_row
+        """
+        if self.find_row(idea[2]) >= 0:
+            return
+        
+        # 有搜索条件时，只插入符合条件的想法
+        if self.current_query and not self.idea_manager.idea_matches(self.current_query, idea[2]):
+            return
+        
+        # 已加载的行按当前排序排列，二分查找第一个应排在新想法之后的行
+        low, high = 0, self.idea_table.rowCount()
+        while low < high:
+            row = (low + high) // 2
+            if self.current_sort == 'keyword':
+                before = (idea[6] or "", idea[2]) < self.idea_table.item(row, 1).data(self.SORT_KEY_ROLE)
+            else:
+                before = idea[0] >= self.idea_table.item(row, 0).data(self.TIMESTAMP_ROLE)
+            if before:
+                high = row
+            else:
+                low = row + 1
+        position = low
+        
+        # 排在已加载范围之后的想法留给后续分页加载
+        if position == self.idea_table.rowCount() and self.has_more:
+            return
+        
+        self.idea_table.insertRow(position)
+        self.set_row(position, idea)
+        self.loaded_count += 1
+
+    def on_table_scrolled(self, value):
+        """滚动到表格底部时加载下一页"""
+        if self.has_more and value >= self.idea_table.verticalScrollBar().maximum():
+            self.load_more_ideas()
 
     def sort_by_time(self):
         """按时间排序"""
@@ -219,9 +506,13 @@ class IdeaManagerUI(QWidget):
         """按关键词排序"""
         self.update_idea_list(self.search_edit.text(), 'keyword')
 
+    def sort_by_relevance(self):
+        """按相关度排序，显示匹配词附近的摘录"""
+        self.update_idea_list(self.search_edit.text(), 'relevance')
+
     def search_ideas(self, query: str):
-        """搜索想法"""
-        self.update_idea_list(query)
+        """搜索想法，由数据库分页查询精确匹配，普通词语的匹配很少时再补充模糊搜索的结果"""
+        self.update_idea_list(query, 'relevance' if self.current_sort == 'relevance' else 'time')
 
     def edit_idea(self, index=None):
         """编辑想法"""
@@ -235,7 +526,11 @@ class IdeaManagerUI(QWidget):
         # 获取想法ID和内容
         row = index.row()
         idea_id = self.idea_table.item(row, 0).data(Qt.ItemDataRole.UserRole)
-        content = self.idea_table.item(row, 1).data(Qt.ItemDataRole.UserRole)
+        # 表格中只有内容预览，编辑时读取完整内容
+        idea = self.idea_manager.get_idea_details(idea_id)
+        if not idea:
+            return
+        content = idea['content']
         
         # 创建编辑对话框
         dialog = IdeaEditDialog(idea_id, content, self)
@@ -243,8 +538,8 @@ class IdeaManagerUI(QWidget):
             # 更新想法内容
             new_content = dialog.get_content()
             if new_content and new_content != content:
+                # 想法管理器会发出内容变更通知，只更新这一行
                 self.idea_manager.update_idea(idea_id, new_content)
-                self.update_idea_list(self.search_edit.text())
 
     def show_context_menu(self, position):
         """显示上下文菜单"""
@@ -1,11 +1,11 @@
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
-    QScrollArea, QPushButton, QFrame, QSplitter,
-    QTabWidget
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel,
+    QPushButton, QTabWidget, QListView, QStyledItemDelegate,
+    QStyle, QAbstractItemView
 )
-from PyQt6.QtCore import Qt, QSize, QDate
-from PyQt6.QtGui import QFont
-from core.idea_manager import IdeaManager
+from PyQt6.QtCore import Qt, QSize, QRect, QRectF, QAbstractListModel, QModelIndex
+from PyQt6.QtGui import QFont, QColor, QPainter, QPen, QFontMetrics
+from core.idea_manager import IdeaManager, CHANGE_INSIGHTS_UPDATED
 from typing import TYPE_CHECKING
 import datetime
 
@@ -13,118 +13,251 @@ if TYPE_CHECKING:
     from core.idea_manager import IdeaManager
 
 
-class InsightCard(QFrame):
-    """见解卡片组件"""
-    
-    def __init__(self, title, content, timestamp=None):
-        super().__init__()
-        self.setObjectName("insightCard")
-        self.setStyleSheet("""
-            #insightCard {
-                border: 1px solid rgba(0, 0, 0, 0.1);
-                border-radius: 8px;
-                padding: 10px;
-                margin: 5px;
-                background-color: rgba(255, 255, 255, 0.7);
-            }
-        """)
-        
-        # 创建布局
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(15, 15, 15, 15)
-        layout.setSpacing(10)
-        
-        # 添加标题
-        title_label = QLabel(title)
-        title_font = QFont()
+# 卡片数据所在的数据角色
+CARD_ROLE = Qt.ItemDataRole.UserRole + 1
+
+
+class CardListModel(QAbstractListModel):
+    """
+    卡片列表模型
+
+    完整数据保存在内存中，视图只按需取出前面的若干条（滚动到底部时再取更早的条目）。
+    更新数据时尽量以插入和局部更新的方式通知视图，避免重置整个列表。
+    """
+
+    # 每次向视图提供的条数
+    BATCH_SIZE = 50
+
+    def __init__(self, key_func, parent=None):
+        """
+        Args:
+            key_func: 从卡片数据中取出唯一键的函数，用于在刷新时识别同一条目
+        """
+        super().__init__(parent)
+        self.key_func = key_func
+        self._items = []
+        self._keys = []
+        self._loaded = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= self._loaded:
+            return None
+        item = self._items[index.row()]
+        if role == CARD_ROLE:
+            return item
+        if role == Qt.ItemDataRole.DisplayRole:
+            return item.get('title') or item.get('content', '')
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._items)
+
+    def fetchMore(self, parent=QModelIndex()):
+        count = min(self.BATCH_SIZE, len(self._items) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def set_items(self, items):
+        """
+        用新数据更新模型
+
+        新条目排在旧条目之前时（通常是新生成的见解），只在开头插入新行，历史条数达到上限后
+        从末尾挤出的旧条目只删除对应的行；条目集合不变时只通知内容有变化的行；其他情况才重置模型。
+        """
+        keys = [self.key_func(item) for item in items]
+        old_keys = self._keys
+
+        if keys == old_keys:
+            self._items = items
+            for row in range(self._loaded):
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+            return
+
+        # 旧的第一条之前都是新条目，之后应与旧条目的开头一致（末尾可能有被挤出的旧条目）
+        added = keys.index(old_keys[0]) if old_keys and old_keys[0] in keys else -1
+        kept = len(keys) - added
+        if added >= 0 and kept <= len(old_keys) and keys[added:] == old_keys[:kept]:
+            if self._loaded > kept:
+                self.beginRemoveRows(QModelIndex(), kept, self._loaded - 1)
+                self._items = self._items[:kept]
+                self._keys = old_keys[:kept]
+                self._loaded = kept
+                self.endRemoveRows()
+            if added > 0:
+                self.beginInsertRows(QModelIndex(), 0, added - 1)
+                self._items = items
+                self._keys = keys
+                self._loaded += added
+                self.endInsertRows()
+            self._items = items
+            self._keys = keys
+            return
+
+        self.beginResetModel()
+        self._items = items
+        self._keys = keys
+        self._loaded = min(self.BATCH_SIZE, len(items))
+        self.endResetModel()
+
+
+class CardDelegate(QStyledItemDelegate):
+    """
+    绘制卡片的委托，替代每条数据一个 QFrame + 多个 QLabel 的做法
+
+    每张卡片由标题（可选）、正文和右下角的说明文字组成，尺寸按视图宽度计算并缓存。
+    """
+
+    MARGIN = 5
+    PADDING = 15
+    SPACING = 10
+
+    def __init__(self, background, parent=None):
+        """
+        Args:
+            background: 卡片背景色
+        """
+        super().__init__(parent)
+        self.background = background
+        self._size_cache = {}
+
+    def card_parts(self, item):
+        """
+        返回卡片的(标题, 正文, 说明文字, 说明文字颜色)，由子类实现
+        """
+        raise NotImplementedError
+
+    def _fonts(self, option):
+        title_font = QFont(option.font)
         title_font.setBold(True)
         title_font.setPointSize(12)
-        title_label.setFont(title_font)
-        layout.addWidget(title_label)
-        
-        # 添加内容
-        content_label = QLabel(content)
-        content_label.setWordWrap(True)
-        layout.addWidget(content_label)
-        
-        # 添加时间戳（如果有）
+        footer_font = QFont(option.font)
+        footer_font.setBold(True)
+        return title_font, option.font, footer_font
+
+    def _layout(self, option, item, width):
+        """计算卡片内各部分的矩形，返回(各部分列表, 总高度)"""
+        title, content, footer, footer_color = self.card_parts(item)
+        title_font, content_font, footer_font = self._fonts(option)
+        inner_width = max(1, width - 2 * (self.MARGIN + self.PADDING))
+        flags = int(Qt.TextFlag.TextWordWrap)
+
+        parts = []
+        y = self.MARGIN + self.PADDING
+        for text, font, align, color in (
+            (title, title_font, Qt.AlignmentFlag.AlignLeft, None),
+            (content, content_font, Qt.AlignmentFlag.AlignLeft, None),
+            (footer, footer_font, Qt.AlignmentFlag.AlignRight, footer_color)
+        ):
+            if not text:
+                continue
+            rect = QFontMetrics(font).boundingRect(QRect(0, 0, inner_width, 100000), flags, text)
+            parts.append((QRect(self.MARGIN + self.PADDING, y, inner_width, rect.height()),
+                          text, font, align, color))
+            y += rect.height() + self.SPACING
+        height = y - self.SPACING + self.PADDING + self.MARGIN
+        return parts, height
+
+    def sizeHint(self, option, index):
+        item = index.data(CARD_ROLE)
+        width = option.rect.width() or 400
+        key = (self.card_parts(item)[:3], width)
+        if key not in self._size_cache:
+            if len(self._size_cache) > 2000:
+                self._size_cache.clear()
+            self._size_cache[key] = self._layout(option, item, width)[1]
+        return QSize(width, self._size_cache[key])
+
+    def paint(self, painter: QPainter, option, index):
+        item = index.data(CARD_ROLE)
+        parts, _ = self._layout(option, item, option.rect.width())
+
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        card_rect = QRectF(option.rect.adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN))
+        border = QColor(0, 0, 0, 25)
+        if option.state & QStyle.StateFlag.State_Selected:
+            border = option.palette.highlight().color()
+        painter.setPen(QPen(border, 1))
+        painter.setBrush(self.background)
+        painter.drawRoundedRect(card_rect, 8, 8)
+
+        for rect, text, font, align, color in parts:
+            painter.setFont(font)
+            painter.setPen(color or option.palette.text().color())
+            painter.drawText(rect.translated(option.rect.topLeft()),
+                             int(align) | int(Qt.TextFlag.TextWordWrap), text)
+        painter.restore()
+
+
+class InsightDelegate(CardDelegate):
+    """见解卡片"""
+
+    def __init__(self, parent=None):
+        super().__init__(QColor(255, 255, 255, 178), parent)
+
+    def card_parts(self, item):
+        time_str = ""
+        timestamp = item.get('timestamp')
         if timestamp:
             try:
                 dt = datetime.datetime.fromisoformat(timestamp)
                 time_str = dt.strftime("%Y-%m-%d %H:%M")
-            except:
+            except Exception:
                 time_str = timestamp
-                
-            time_label = QLabel(f"生成于: {time_str}")
-            time_label.setAlignment(Qt.AlignmentFlag.AlignRight)
-            layout.addWidget(time_label)
+        return (
+            item.get('title', '未命名见解'),
+            item.get('content', '无内容'),
+            f"生成于: {time_str}" if time_str else "",
+            None
+        )
 
 
-class ReminderCard(QFrame):
-    """提醒卡片组件"""
-    
-    def __init__(self, content, due_date):
-        super().__init__()
-        self.setObjectName("reminderCard")
-        self.setStyleSheet("""
-            #reminderCard {
-                border: 1px solid rgba(0, 0, 0, 0.1);
-                border-radius: 8px;
-                padding: 10px;
-                margin: 5px;
-                background-color: rgba(255, 255, 230, 0.7);
-            }
-        """)
-        
-        # 创建布局
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(15, 15, 15, 15)
-        layout.setSpacing(10)
-        
-        # 添加内容
-        content_label = QLabel(content)
-        content_label.setWordWrap(True)
-        layout.addWidget(content_label)
-        
-        # 添加日期
-        date_layout = QHBoxLayout()
-        date_layout.addStretch()
-        
-        date_label = QLabel(f"截止日期: {due_date}")
-        date_font = QFont()
-        date_font.setBold(True)
-        date_label.setFont(date_font)
-        
+class ReminderDelegate(CardDelegate):
+    """提醒卡片，截止日期按接近程度显示不同颜色"""
+
+    def __init__(self, parent=None):
+        super().__init__(QColor(255, 255, 230, 178), parent)
+
+    def card_parts(self, item):
+        due_date = item.get('due_date', '未知日期')
+
         # 计算日期接近程度，设置不同颜色
+        color = None
         try:
             due_date_obj = datetime.datetime.strptime(due_date, "%Y-%m-%d").date()
-            today = datetime.date.today()
-            days_left = (due_date_obj - today).days
-            
+            days_left = (due_date_obj - datetime.date.today()).days
+
             if days_left < 0:
-                date_label.setStyleSheet("color: gray;")  # 过期
+                color = QColor("gray")  # 过期
             elif days_left <= 1:
-                date_label.setStyleSheet("color: red;")  # 紧急
+                color = QColor("red")  # 紧急
             elif days_left <= 3:
-                date_label.setStyleSheet("color: orange;")  # 注意
+                color = QColor("orange")  # 注意
             else:
-                date_label.setStyleSheet("color: green;")  # 正常
-                
+                color = QColor("green")  # 正常
         except Exception:
             pass
-            
-        date_layout.addWidget(date_label)
-        layout.addLayout(date_layout)
+
+        return None, item.get('content', '无内容'), f"截止日期: {due_date}", color
 
 
 class InsightsUI(QWidget):
     def __init__(self, idea_manager: 'IdeaManager'):
         super().__init__()
         self.idea_manager = idea_manager
-        
+        # 见解内容已同步到的数据版本
+        self.data_version = 0
+
         # 设置布局
         self.setup_ui()
-        
+
         # 加载数据
         self.update_insights()
 
@@ -133,7 +266,7 @@ class InsightsUI(QWidget):
         layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(15)
-        
+
         # 创建标题
         title_label = QLabel("见解与提醒")
         title_font = QFont()
@@ -141,95 +274,88 @@ class InsightsUI(QWidget):
         title_font.setBold(True)
         title_label.setFont(title_font)
         layout.addWidget(title_label)
-        
+
         # 创建说明
         desc_label = QLabel("AI根据你的想法生成的见解和提醒，帮助你发现模式和机会。")
         desc_label.setWordWrap(True)
         layout.addWidget(desc_label)
-        
+
         # 创建刷新按钮
         refresh_button = QPushButton("刷新数据")
-        refresh_button.clicked.connect(self.update_insights)
+        refresh_button.clicked.connect(self.refresh_changes)
         layout.addWidget(refresh_button)
-        
+
         # 创建选项卡
         self.tab_widget = QTabWidget()
-        
+
         # 见解选项卡
-        insights_tab = QWidget()
-        insights_layout = QVBoxLayout(insights_tab)
-        
-        self.insights_scroll = QScrollArea()
-        self.insights_scroll.setWidgetResizable(True)
-        self.insights_content = QWidget()
-        self.insights_layout = QVBoxLayout(self.insights_content)
-        self.insights_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.insights_scroll.setWidget(self.insights_content)
-        
-        insights_layout.addWidget(self.insights_scroll)
-        self.tab_widget.addTab(insights_tab, "见解")
-        
+        self.insights_model = CardListModel(
+            lambda insight: (insight.get('timestamp'), insight.get('title'), insight.get('content')), self
+        )
+        self.insights_empty_label = QLabel("暂无见解数据。触发AI分析后将在这里显示见解。")
+        self.insights_view = self._create_list_view(self.insights_model, InsightDelegate(self))
+        self.tab_widget.addTab(
+            self._create_tab(self.insights_view, self.insights_empty_label), "见解"
+        )
+
         # 提醒选项卡
-        reminders_tab = QWidget()
-        reminders_layout = QVBoxLayout(reminders_tab)
-        
-        self.reminders_scroll = QScrollArea()
-        self.reminders_scroll.setWidgetResizable(True)
-        self.reminders_content = QWidget()
-        self.reminders_layout = QVBoxLayout(self.reminders_content)
-        self.reminders_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.reminders_scroll.setWidget(self.reminders_content)
-        
-        reminders_layout.addWidget(self.reminders_scroll)
-        self.tab_widget.addTab(reminders_tab, "提醒")
-        
+        self.reminders_model = CardListModel(
+            lambda reminder: (reminder.get('due_date'), reminder.get('content')), self
+        )
+        self.reminders_empty_label = QLabel("暂无提醒数据。触发AI分析后将在这里显示提醒。")
+        self.reminders_view = self._create_list_view(self.reminders_model, ReminderDelegate(self))
+        self.tab_widget.addTab(
+            self._create_tab(self.reminders_view, self.reminders_empty_label), "提醒"
+        )
+
         layout.addWidget(self.tab_widget)
 
+    def _create_list_view(self, model, delegate):
+        """创建使用委托绘制卡片的列表视图"""
+        view = QListView()
+        view.setModel(model)
+        view.setItemDelegate(delegate)
+        view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        view.setResizeMode(QListView.ResizeMode.Adjust)
+        view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        view.setFrameShape(QListView.Shape.NoFrame)
+        return view
+
+    def _create_tab(self, view, empty_label):
+        """创建包含列表视图和空数据提示的选项卡页"""
+        tab = QWidget()
+        tab_layout = QVBoxLayout(tab)
+        empty_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        tab_layout.addWidget(empty_label)
+        tab_layout.addWidget(view)
+        return tab
+
+    def refresh_changes(self):
+        """只在上次同步之后见解有更新时重新加载"""
+        result = self.idea_manager.get_changes_since(self.data_version)
+        if result is None:
+            self.update_insights()
+            return
+
+        self.data_version, changes = result
+        if CHANGE_INSIGHTS_UPDATED in changes:
+            self.update_insights()
+
     def update_insights(self):
-        """更新见解和提醒数据"""
-        # 清空现有内容
-        self._clear_layout(self.insights_layout)
-        self._clear_layout(self.reminders_layout)
-        
+        """更新见解和提醒数据，已显示的卡片不会被销毁重建"""
+        self.data_version = self.idea_manager.get_change_version()
+
         # 获取见解
         insights = self.idea_manager.get_insights()
-        if insights:
-            for insight in insights:
-                title = insight.get('title', '未命名见解')
-                content = insight.get('content', '无内容')
-                timestamp = insight.get('timestamp')
-                
-                card = InsightCard(title, content, timestamp)
-                self.insights_layout.addWidget(card)
-        else:
-            no_data_label = QLabel("暂无见解数据。触发AI分析后将在这里显示见解。")
-            no_data_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.insights_layout.addWidget(no_data_label)
-            
-        # 获取提醒
-        reminders = self.idea_manager.get_upcoming_reminders()
-        if reminders:
-            # 按日期排序
-            sorted_reminders = sorted(
-                reminders,
-                key=lambda r: r.get('due_date', '9999-12-31')
-            )
-            
-            for reminder in sorted_reminders:
-                content = reminder.get('content', '无内容')
-                due_date = reminder.get('due_date', '未知日期')
-                
-                card = ReminderCard(content, due_date)
-                self.reminders_layout.addWidget(card)
-        else:
-            no_data_label = QLabel("暂无提醒数据。触发AI分析后将在这里显示提醒。")
-            no_data_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.reminders_layout.addWidget(no_data_label)
-
-    def _clear_layout(self, layout):
-        """清空布局中的所有组件"""
-        while layout.count():
-            item = layout.takeAt(0)
-            widget = item.widget()
-            if widget:
-                widget.deleteLater()
\ No newline at end of file
+        self.insights_model.set_items(insights)
+        self.insights_empty_label.setVisible(not insights)
+        self.insights_view.setVisible(bool(insights))
+
+        # 获取提醒，按日期排序
+        reminders = sorted(
+            self.idea_manager.get_upcoming_reminders(),
+            key=lambda r: r.get('due_date', '9999-12-31')
+        )
+        self.reminders_model.set_items(reminders)
+        self.reminders_empty_label.setVisible(not reminders)
+        self.reminders_view.setVisible(bool(reminders))
@@ -3,21 +3,36 @@ from PyQt6.QtWidgets import (
     QLabel, QStackedWidget, QMessageBox, QSplitter
 )
 from PyQt6.QtGui import QIcon, QCloseEvent, QFont
-from PyQt6.QtCore import Qt, QPropertyAnimation, QEasingCurve, QSize
+from PyQt6.QtCore import Qt, QPropertyAnimation, QEasingCurve, QSize, QTimer, pyqtSignal
 import os
+import threading
 
 from ui.idea_input import IdeaInputWindow
 from ui.idea_manager_ui import IdeaManagerUI
-from ui.settings_ui import SettingsUI
-from ui.ai_console_ui import AIConsoleUI
-from ui.insights_ui import InsightsUI
 from ui.styles import get_style_sheet
+from utils.config_service import ConfigService
 from core.db_handler import DBHandler
 from core.idea_manager import IdeaManager
 from core.ai_processor import AIProcessor
+from core.llm_backend import create_backend
+from core.capture import CaptureServer, CMD_CAPTURE, CMD_SHOW, CMD_INPUT
 
 
 class MainWindow(QMainWindow):
+    # 想法发生变更（可能由写后队列或AI分析的后台线程发出），参数为变更类型和想法ID列表
+    ideas_changed = pyqtSignal(str, list)
+    # 写后队列多次重试仍未写入想法（在写线程中发出），参数为未写入的想法数和错误信息
+    write_failed = pyqtSignal(int, str)
+    # 快速记录服务（后台线程）收到的显示主窗口、打开输入窗口的请求
+    show_requested = pyqtSignal()
+    input_requested = pyqtSignal()
+
+    # 轮询数据库变化的间隔（毫秒）
+    DATA_POLL_INTERVAL_MS = 1000
+
+    # 变化时需要重建LLM后端的配置项
+    BACKEND_CONFIG_KEYS = ('llm_backend', 'api_base', 'llm_timeout', 'llm_pool_size')
+
     def __init__(self, config):
         super().__init__()
         self.config = config
@@ -35,18 +50,53 @@ class MainWindow(QMainWindow):
         
         # 初始化核心组件
         self.db_handler = DBHandler()
+        self.db_handler.search_debug = self.config.get('search_debug', False)
+        self.db_handler.compress_threshold = self.config.get('compress_threshold', 0)
         self.ai_processor = AIProcessor(
             self.db_handler, 
-            self.config.get('openai_api_key', '')
+            self.config.get('openai_api_key', ''),
+            config=self.config
         )
         self.idea_manager = IdeaManager(self.db_handler, self.ai_processor)
-        
-        # 启动AI定时任务，如果API键已设置
-        if self.config.get('openai_api_key'):
-            self.ai_processor.schedule_ai_task(3600)  # 每小时处理一次
+        # 后台任务（含定时备份）在首次绘制后由start_background_tasks启动
+        self._background_started = False
+        # 修复外部写入的后台线程同一时间只有一个，运行期间的新请求由它在完成后接着处理
+        self._repair_lock = threading.Lock()
+        self._repair_running = False
+        self._repair_requested = False
         
         # 创建主界面
         self.setup_ui()
+        
+        # 预先创建并隐藏想法输入窗口，快捷键触发时直接复用
+        self.idea_input_window = IdeaInputWindow(self.idea_manager)
+        
+        # 想法变更通知经信号切换到主线程后，立即增量更新想法列表
+        self.ideas_changed.connect(self.on_ideas_changed)
+        self.idea_manager.add_change_listener(self.ideas_changed.emit)
+        self.write_failed.connect(self.show_write_error)
+        self.idea_manager.add_write_error_listener(self.write_failed.emit)
+        
+        # 定时检查数据库是否变化（包括其他进程的写入），有变化时各页面只刷新变化的部分
+        self.data_token = self.idea_manager.get_data_token()
+        self.data_poll_timer = QTimer(self)
+        self.data_poll_timer.timeout.connect(self.poll_data_changes)
+        self.data_poll_timer.start(self.DATA_POLL_INTERVAL_MS)
+        
+        # 接收命令行（python -m core.capture）发送的想法，想法直接放入写后队列
+        self.show_requested.connect(self.show_from_background)
+        self.input_requested.connect(self.show_idea_input_window)
+        self.capture_server = CaptureServer({
+            CMD_CAPTURE: self.capture_idea,
+            CMD_SHOW: lambda _: self.show_requested.emit(),
+            CMD_INPUT: lambda _: self.input_requested.emit(),
+        })
+        self.capture_server.start()
+        
+        # 配置变化（含外部编辑配置文件）时由配置服务通知
+        config_service = ConfigService.instance()
+        config_service.config_changed.connect(self.apply_config)
+        config_service.theme_changed.connect(self.apply_theme)
 
     def setup_ui(self):
         # 创建中央部件
@@ -86,17 +136,17 @@ class MainWindow(QMainWindow):
         
         self.idea_manager_button = QPushButton('📚 想法管理')
         self.idea_manager_button.setObjectName("sidebarButton")
-        self.idea_manager_button.clicked.connect(lambda: self.stack_widget.setCurrentIndex(0))
+        self.idea_manager_button.clicked.connect(lambda: self.show_page(0))
         sidebar_layout.addWidget(self.idea_manager_button)
         
         self.ai_console_button = QPushButton('🤖 AI对话')
         self.ai_console_button.setObjectName("sidebarButton")
-        self.ai_console_button.clicked.connect(lambda: self.stack_widget.setCurrentIndex(1))
+        self.ai_console_button.clicked.connect(lambda: self.show_page(1))
         sidebar_layout.addWidget(self.ai_console_button)
         
         self.insights_button = QPushButton('💡 见解与提醒')
         self.insights_button.setObjectName("sidebarButton")
-        self.insights_button.clicked.connect(lambda: self.stack_widget.setCurrentIndex(2))
+        self.insights_button.clicked.connect(lambda: self.show_page(2))
         sidebar_layout.addWidget(self.insights_button)
         
         sidebar_layout.addStretch()
@@ -117,17 +167,19 @@ class MainWindow(QMainWindow):
         # 创建堆叠小部件以切换不同页面
         self.stack_widget = QStackedWidget()
         
-        # 创建想法管理页面
+        # 创建想法管理页面（启动后首先显示，只加载最新一页想法）
         self.idea_manager_ui = IdeaManagerUI(self.idea_manager)
         self.stack_widget.addWidget(self.idea_manager_ui)
         
-        # 创建AI控制台页面
-        self.ai_console_ui = AIConsoleUI(self.idea_manager)
-        self.stack_widget.addWidget(self.ai_console_ui)
-        
-        # 创建见解页面
-        self.insights_ui = InsightsUI(self.idea_manager)
-        self.stack_widget.addWidget(self.insights_ui)
+        # AI控制台和见解页面在第一次切换到时才创建，先放置空白占位页
+        self.ai_console_ui = None
+        self.insights_ui = None
+        self.page_factories = {
+            1: self.create_ai_console_page,
+            2: self.create_insights_page
+        }
+        for _ in self.page_factories:
+            self.stack_widget.addWidget(QWidget())
         
         content_layout.addWidget(self.stack_widget)
         
@@ -138,6 +190,28 @@ class MainWindow(QMainWindow):
         if self.config.get('enable_animations', True):
             self.setup_animations()
 
+    def create_ai_console_page(self):
+        """创建AI控制台页面"""
+        from ui.ai_console_ui import AIConsoleUI
+        self.ai_console_ui = AIConsoleUI(self.idea_manager)
+        return self.ai_console_ui
+
+    def create_insights_page(self):
+        """创建见解页面"""
+        from ui.insights_ui import InsightsUI
+        self.insights_ui = InsightsUI(self.idea_manager)
+        return self.insights_ui
+
+    def show_page(self, index):
+        """切换到指定页面，页面尚未创建时先创建并替换占位页"""
+        factory = self.page_factories.pop(index, None)
+        if factory is not None:
+            placeholder = self.stack_widget.widget(index)
+            self.stack_widget.insertWidget(index, factory())
+            self.stack_widget.removeWidget(placeholder)
+            placeholder.deleteLater()
+        self.stack_widget.setCurrentIndex(index)
+
     def setup_animations(self):
         """设置UI动画效果"""
         # 侧边栏按钮悬停效果
@@ -161,38 +235,160 @@ class MainWindow(QMainWindow):
         animation.start()
 
     def show_idea_input_window(self):
-        """显示想法输入窗口"""
-        self.idea_input_window = IdeaInputWindow(self.idea_manager)
-        self.idea_input_window.accepted.connect(self.idea_manager_ui.update_idea_list)
-        self.idea_input_window.exec()
+        """显示预先创建的想法输入窗口"""
+        if self.idea_input_window.isVisible():
+            self.idea_input_window.activateWindow()
+            return
+        self.idea_input_window.prepare()
+        self.idea_input_window.show()
+        self.idea_input_window.raise_()
+        self.idea_input_window.activateWindow()
+
+    def show_from_background(self):
+        """再次启动程序时显示并激活已运行的主窗口"""
+        if self.isMinimized():
+            self.showNormal()
+        self.show()
+        self.raise_()
+        self.activateWindow()
+
+    def capture_idea(self, content):
+        """保存命令行发送的想法（在快速记录服务线程中调用）"""
+        if not isinstance(content, str) or not content.strip():
+            raise ValueError("想法内容不能为空")
+        self.idea_manager.add_idea_async(content.strip())
+
+    def show_write_error(self, unsaved_count, error):
+        """提示用户想法暂时没有写入数据库，提示框打开期间的重复错误不再提示"""
+        if getattr(self, '_write_error_shown', False):
+            return
+        self._write_error_shown = True
+        try:
+            QMessageBox.warning(
+                self, "想法未保存",
+                f"有 {unsaved_count} 条想法暂时无法写入数据库（{error}）。\n"
+                "这些想法已保存在 data/unsaved_ideas.jsonl 中，程序会自动重试写入，下次启动时也会继续写入。"
+            )
+        finally:
+            self._write_error_shown = False
+
+    def on_ideas_changed(self, kind, idea_ids):
+        """
+        想法变更通知只用于立即刷新：变化与轮询一样从变更日志读取并推进列表的数据版本，
+        之后的轮询不会再次应用同一个变化
+        """
+        self.idea_manager_ui.refresh_changes()
+
+    def poll_data_changes(self):
+        """数据库有变化时通知已创建的页面增量刷新"""
+        token = self.idea_manager.get_data_token()
+        if token == self.data_token:
+            return
+        # PRAGMA data_version只在其他连接提交后变化，本程序自己的写入不需要检查是否要修复
+        external = token[0] != self.data_token[0]
+        self.data_token = token
+        if external:
+            self.start_repair_external_writes()
+        self.idea_manager_ui.refresh_changes()
+        if self.insights_ui is not None:
+            self.insights_ui.refresh_changes()
+
+    def start_background_tasks(self):
+        """
+        启动后台任务，由main在主窗口首次绘制后调用，避免与首屏的查询和绘制争抢CPU和数据库锁
+        """
+        if self._background_started:
+            return
+        self._background_started = True
+        # 按压缩阈值在后台重新编码已有内容，没有需要重新编码的内容时只扫描一遍
+        self.db_handler.start_recompression()
+        self.start_repair_external_writes()
+        self.idea_manager.start_background_tasks()
+        self.apply_backup_config(self.config)
+        # 启动AI定时任务，如果API键已设置
+        if self.config.get('openai_api_key'):
+            self.ai_processor.schedule_ai_task(3600)  # 每小时处理一次
+
+    def start_repair_external_writes(self):
+        """在后台修复其他程序（没有本程序的SQL函数）写入后过期的全文索引和显示列，没有外部写入时不做任何事"""
+        if not self.db_handler.has_external_writes():
+            return
+        with self._repair_lock:
+            self._repair_requested = True
+            if self._repair_running:
+                return
+            self._repair_running = True
+        threading.Thread(target=self._repair_external_writes, name="repair-external", daemon=True).start()
+
+    def _repair_external_writes(self):
+        while True:
+            with self._repair_lock:
+                if not self._repair_requested:
+                    self._repair_running = False
+                    return
+                self._repair_requested = False
+            try:
+                self.db_handler.repair_external_writes()
+            except Exception as e:
+                print(f"修复其他程序写入的数据时出错: {e}")
 
     def show_settings_window(self):
-        """显示设置窗口"""
-        self.settings_ui = SettingsUI()
+        """显示设置窗口，保存后的配置通过配置服务的信号应用"""
+        from ui.settings_ui import SettingsUI
+        self.settings_ui = SettingsUI(self.idea_manager)
         if self.settings_ui.exec() == SettingsUI.DialogCode.Accepted:
-            # 重新读取配置
-            from utils.config_manager import ConfigManager
-            self.config = ConfigManager().read_config()
-            
-            # 更新界面样式
-            self.setStyleSheet(get_style_sheet())
-            
-            # 更新AI处理器配置
-            self.ai_processor.update_config(
-            #self.ai_processor.openai_api_key = self.config.get('openai_api_key', '')
-            api_key=self.config.get('openai_api_key', ''),
-            model=self.config.get('ai_model','gpt-3.5-turbo')
-            )
-            # 如果设置了API密钥，启动AI任务
-            if self.config.get('openai_api_key'):
-                self.ai_processor.schedule_ai_task(3600)
-                
             # 提示用户设置已保存
             QMessageBox.information(self, "设置", "设置已保存")
 
+    def apply_theme(self, theme):
+        """主题变化时更新界面样式"""
+        style_sheet = get_style_sheet(theme)
+        self.setStyleSheet(style_sheet)
+        self.idea_input_window.setStyleSheet(style_sheet)
+
+    def apply_config(self, config):
+        """配置变化时（设置界面保存或外部编辑配置文件）更新AI处理器"""
+        old_config = self.config
+        self.config = config
+        self.db_handler.search_debug = config.get('search_debug', False)
+        if config.get('compress_threshold', 0) != old_config.get('compress_threshold', 0):
+            self.db_handler.compress_threshold = config.get('compress_threshold', 0)
+            self.db_handler.start_recompression()
+        self.apply_backup_config(config)
+        
+        # 只有后端相关配置变化时才重建后端，避免打断进行中的请求
+        backend = None
+        if any(old_config.get(key) != config.get(key) for key in self.BACKEND_CONFIG_KEYS):
+            backend = create_backend(self.config)
+        
+        # 更新AI处理器配置
+        self.ai_processor.update_config(
+            api_key=self.config.get('openai_api_key', ''),
+            model=self.config.get('ai_model', 'gpt-3.5-turbo'),
+            backend=backend,
+            config=self.config
+        )
+        # 如果设置了API密钥，启动AI任务
+        if self.config.get('openai_api_key'):
+            self.ai_processor.schedule_ai_task(3600)
+
+    def apply_backup_config(self, config):
+        """按配置设置备份目录和定时备份"""
+        from core.backup import DEFAULT_BACKUP_DIR, DEFAULT_BACKUP_KEEP
+        backup_manager = self.idea_manager.backup_manager
+        backup_manager.backup_dir = config.get('backup_dir', DEFAULT_BACKUP_DIR)
+        backup_manager.schedule(config.get('backup_interval_hours', 0),
+                                config.get('backup_keep', DEFAULT_BACKUP_KEEP))
+
     def closeEvent(self, event: QCloseEvent):
         """处理窗口关闭事件"""
-        # 关闭数据库连接
+        # 停止快速记录服务、轮询和定时备份，等待写后队列中的想法写入，再关闭数据库连接
+        if hasattr(self, 'capture_server'):
+            self.capture_server.close()
+        if hasattr(self, 'data_poll_timer'):
+            self.data_poll_timer.stop()
+        if hasattr(self, 'idea_manager'):
+            self.idea_manager.close()
         if hasattr(self, 'db_handler'):
             self.db_handler.close()
         
@@ -2,22 +2,47 @@ from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QLabel, QLineEdit, 
     QCheckBox, QPushButton, QHBoxLayout,
     QComboBox, QGroupBox, QTabWidget,
-    QMessageBox,QWidget
+    QMessageBox,QWidget, QSpinBox, QTableWidget,
+    QTableWidgetItem, QHeaderView, QFileDialog, QProgressBar
 )
 from PyQt6.QtGui import QFont
-from PyQt6.QtCore import Qt
-from utils.config_manager import ConfigManager
+from PyQt6.QtCore import Qt, pyqtSignal
+import threading
+from utils.config_service import ConfigService
+from core.importer import ImportStateError
+from core.backup import DEFAULT_BACKUP_KEEP
+
+# 任务类型在界面上的显示名称
+TASK_DISPLAY_NAMES = {
+    "tags": "标签生成",
+    "summary": "摘要生成",
+    "insights": "见解分析",
+    "chat": "AI对话"
+}
 
 
 class SettingsUI(QDialog):
-    def __init__(self):
+    # 后台导入的进度(已读取字节数, 文件总字节数, 已导入条数)和结果（结果字典或异常）
+    import_progress = pyqtSignal(int, int, int)
+    import_finished = pyqtSignal(object)
+    # 后台备份或导出的进度文字和完成时的结果文字
+    backup_message = pyqtSignal(str)
+    backup_finished = pyqtSignal(str)
+
+    def __init__(self, idea_manager=None):
         super().__init__()
+        self.idea_manager = idea_manager
+        # 设置为停止时，后台导入在当前一批写入后停止
+        self.import_stop = threading.Event()
+        self.import_progress.connect(self.show_import_progress)
+        self.import_finished.connect(self.on_import_finished)
+        self.backup_finished.connect(self.on_backup_finished)
         self.setWindowTitle("设置")
         self.resize(500, 400)
         
         # 读取配置
-        self.config_manager = ConfigManager()
-        self.config = self.config_manager.read_config()
+        self.config_service = ConfigService.instance()
+        self.config = self.config_service.config()
         
         # 设置样式
         from ui.styles import get_style_sheet
@@ -70,6 +95,21 @@ class SettingsUI(QDialog):
         theme_layout.addLayout(animation_layout)
         
         general_layout.addWidget(theme_group)
+        
+        # 存储设置
+        storage_group = QGroupBox("存储设置")
+        storage_layout = QHBoxLayout(storage_group)
+        storage_layout.addWidget(QLabel("压缩超过该大小的想法内容（KB，0为不压缩）:"))
+        self.compress_spin = QSpinBox()
+        self.compress_spin.setRange(0, 102400)
+        self.compress_spin.setValue(self.config.get('compress_threshold', 0) // 1024)
+        storage_layout.addWidget(self.compress_spin)
+        general_layout.addWidget(storage_group)
+        general_layout.addWidget(self.create_backup_group())
+        
+        # 批量导入
+        if self.idea_manager is not None:
+            general_layout.addWidget(self.create_import_group())
         general_layout.addStretch()
         
         # AI设置选项卡
@@ -88,6 +128,14 @@ class SettingsUI(QDialog):
         api_layout.addWidget(api_label)
         api_layout.addWidget(self.api_edit)
         
+        # API地址设置
+        api_base_label = QLabel("API地址:")
+        self.api_base_edit = QLineEdit()
+        self.api_base_edit.setText(self.config.get('api_base', 'http://127.0.0.1:1234/v1'))
+        self.api_base_edit.setPlaceholderText("OpenAI兼容接口地址，如 https://api.openai.com/v1")
+        api_layout.addWidget(api_base_label)
+        api_layout.addWidget(self.api_base_edit)
+        
         # 显示密钥复选框
         self.show_api_checkbox = QCheckBox("显示API密钥")
         self.show_api_checkbox.stateChanged.connect(self.toggle_api_visibility)
@@ -114,11 +162,37 @@ class SettingsUI(QDialog):
         api_layout.addLayout(auto_analyze_layout)
         
         ai_layout.addWidget(api_group)
+        
+        # token预算设置
+        budget_group = QGroupBox("每日token上限（0为不限制）")
+        budget_layout = QVBoxLayout(budget_group)
+        
+        batch_cap_layout = QHBoxLayout()
+        batch_cap_layout.addWidget(QLabel("后台分析:"))
+        self.batch_cap_spin = QSpinBox()
+        self.batch_cap_spin.setRange(0, 100000000)
+        self.batch_cap_spin.setSingleStep(10000)
+        self.batch_cap_spin.setValue(self.config.get('daily_token_cap', 0))
+        batch_cap_layout.addWidget(self.batch_cap_spin)
+        budget_layout.addLayout(batch_cap_layout)
+        
+        chat_cap_layout = QHBoxLayout()
+        chat_cap_layout.addWidget(QLabel("AI对话:"))
+        self.chat_cap_spin = QSpinBox()
+        self.chat_cap_spin.setRange(0, 100000000)
+        self.chat_cap_spin.setSingleStep(10000)
+        self.chat_cap_spin.setValue(self.config.get('daily_chat_token_cap', 0))
+        chat_cap_layout.addWidget(self.chat_cap_spin)
+        budget_layout.addLayout(chat_cap_layout)
+        
+        ai_layout.addWidget(budget_group)
         ai_layout.addStretch()
         
         # 添加选项卡
         tab_widget.addTab(general_tab, "常规")
         tab_widget.addTab(ai_tab, "AI设置")
+        if self.idea_manager is not None:
+            tab_widget.addTab(self.create_usage_tab(), "用量统计")
         
         layout.addWidget(tab_widget)
         
@@ -136,6 +210,269 @@ class SettingsUI(QDialog):
         
         layout.addLayout(button_layout)
 
+    def create_backup_group(self):
+        """创建定时备份和导出的设置组"""
+        backup_group = QGroupBox("备份和导出")
+        backup_layout = QVBoxLayout(backup_group)
+        
+        schedule_layout = QHBoxLayout()
+        schedule_layout.addWidget(QLabel("定时备份间隔（小时，0为不定时备份）:"))
+        self.backup_interval_spin = QSpinBox()
+        self.backup_interval_spin.setRange(0, 720)
+        self.backup_interval_spin.setValue(self.config.get('backup_interval_hours', 0))
+        schedule_layout.addWidget(self.backup_interval_spin)
+        schedule_layout.addWidget(QLabel("保留份数:"))
+        self.backup_keep_spin = QSpinBox()
+        self.backup_keep_spin.setRange(1, 100)
+        self.backup_keep_spin.setValue(self.config.get('backup_keep', DEFAULT_BACKUP_KEEP))
+        schedule_layout.addWidget(self.backup_keep_spin)
+        schedule_layout.addStretch()
+        backup_layout.addLayout(schedule_layout)
+        
+        if self.idea_manager is not None:
+            action_layout = QHBoxLayout()
+            self.backup_label = QLabel("")
+            self.backup_label.setWordWrap(True)
+            self.backup_message.connect(self.backup_label.setText)
+            action_layout.addWidget(self.backup_label, 1)
+            self.backup_button = QPushButton("立即备份")
+            self.backup_button.clicked.connect(self.backup_now)
+            action_layout.addWidget(self.backup_button)
+            self.export_button = QPushButton("导出想法...")
+            self.export_button.clicked.connect(self.export_ideas)
+            action_layout.addWidget(self.export_button)
+            backup_layout.addLayout(action_layout)
+            
+            site_layout = QHBoxLayout()
+            site_layout.addWidget(QLabel("静态网站格式:"))
+            self.site_format_combo = QComboBox()
+            self.site_format_combo.addItem("HTML", 'html')
+            self.site_format_combo.addItem("Markdown", 'markdown')
+            site_layout.addWidget(self.site_format_combo)
+            site_layout.addStretch()
+            self.site_button = QPushButton("导出静态网站...")
+            self.site_button.setToolTip("再次导出到同一目录时只重写有变化的页面")
+            self.site_button.clicked.connect(self.export_site)
+            site_layout.addWidget(self.site_button)
+            backup_layout.addLayout(site_layout)
+        return backup_group
+
+    def backup_now(self):
+        """在后台线程中立即备份数据库"""
+        def task():
+            path = self.idea_manager.backup_now(
+                lambda done, total: self.backup_message.emit(f"正在备份... {done * 100 // max(total, 1)}%")
+            )
+            return f"已备份到 {path}"
+        self.run_backup_task(task)
+
+    def export_ideas(self):
+        """选择文件并在后台线程中导出全部想法"""
+        path, selected_filter = QFileDialog.getSaveFileName(
+            self, "导出想法", "ideas.jsonl", "JSONL (*.jsonl);;Markdown (*.md)"
+        )
+        if not path:
+            return
+        fmt = 'markdown' if selected_filter.startswith('Markdown') else 'jsonl'
+        
+        def task():
+            count = self.idea_manager.export_ideas(
+                path, fmt, lambda done: self.backup_message.emit(f"已导出 {done} 条想法...")
+            )
+            return f"已导出 {count} 条想法到 {path}"
+        self.run_backup_task(task)
+
+    def export_site(self):
+        """选择目录并在后台线程中增量导出静态网站"""
+        output_dir = QFileDialog.getExistingDirectory(self, "导出静态网站到")
+        if not output_dir:
+            return
+        fmt = self.site_format_combo.currentData()
+        
+        def task():
+            result = self.idea_manager.export_site(
+                output_dir, fmt,
+                lambda done, total: self.backup_message.emit(f"正在生成网站... {done}/{total} 页")
+            )
+            return (f"网站共 {result['pages']} 页，更新 {result['written']} 页，"
+                    f"删除 {result['deleted']} 页：{output_dir}")
+        self.run_backup_task(task)
+
+    def run_backup_task(self, task):
+        """在后台线程中执行备份或导出，完成后通过信号显示结果"""
+        self.backup_button.setEnabled(False)
+        self.export_button.setEnabled(False)
+        self.site_button.setEnabled(False)
+        
+        def run():
+            try:
+                message = task()
+            except Exception as e:
+                print(f"备份或导出时出错: {e}")
+                message = f"失败: {e}"
+            self.backup_finished.emit(message)
+        
+        threading.Thread(target=run, daemon=True).start()
+
+    def on_backup_finished(self, message):
+        """显示备份或导出的结果"""
+        self.backup_button.setEnabled(True)
+        self.export_button.setEnabled(True)
+        self.site_button.setEnabled(True)
+        self.backup_label.setText(message)
+
+    def create_import_group(self):
+        """创建批量导入想法的设置组"""
+        import_group = QGroupBox("导入想法")
+        import_layout = QVBoxLayout(import_group)
+        
+        self.import_label = QLabel("支持JSONL、Markdown和CSV文件，中断后再次导入同一文件会从中断处继续")
+        self.import_label.setWordWrap(True)
+        import_layout.addWidget(self.import_label)
+        
+        progress_layout = QHBoxLayout()
+        self.import_progress_bar = QProgressBar()
+        self.import_progress_bar.setRange(0, 1000)
+        self.import_progress_bar.setTextVisible(False)
+        self.import_progress_bar.hide()
+        progress_layout.addWidget(self.import_progress_bar)
+        progress_layout.addStretch()
+        self.import_button = QPushButton("从文件导入...")
+        self.import_button.clicked.connect(self.import_ideas)
+        progress_layout.addWidget(self.import_button)
+        import_layout.addLayout(progress_layout)
+        return import_group
+
+    def import_ideas(self, restart=False, path=None):
+        """选择文件并在后台线程中导入"""
+        if not path:
+            path, _ = QFileDialog.getOpenFileName(
+                self, "导入想法", "", "想法文件 (*.jsonl *.ndjson *.md *.markdown *.csv)"
+            )
+            if not path:
+                return
+        self.import_path = path
+        self.import_stop.clear()
+        self.import_button.setEnabled(False)
+        self.import_progress_bar.setValue(0)
+        self.import_progress_bar.show()
+        self.import_label.setText("正在导入...")
+        threading.Thread(target=self.run_import, args=(path, restart), daemon=True).start()
+
+    def run_import(self, path, restart):
+        """在后台线程中导入，进度和结果通过信号回到主线程"""
+        try:
+            result = self.idea_manager.import_ideas(
+                path, restart=restart, progress=self.import_progress.emit,
+                should_stop=self.import_stop.is_set
+            )
+        except Exception as e:
+            result = e
+        self.import_finished.emit(result)
+
+    def show_import_progress(self, done, total, count):
+        """显示导入进度"""
+        self.import_progress_bar.setValue(done * 1000 // total if total else 1000)
+        self.import_label.setText(f"已导入 {count} 条想法...")
+
+    def on_import_finished(self, result):
+        """显示导入结果"""
+        self.import_button.setEnabled(True)
+        self.import_progress_bar.hide()
+        if isinstance(result, ImportStateError):
+            self.import_label.setText(str(result))
+            reply = QMessageBox.question(self, "导入想法", f"{result}\n\n是否从头重新导入？")
+            if reply == QMessageBox.StandardButton.Yes:
+                self.import_ideas(restart=True, path=self.import_path)
+            return
+        if isinstance(result, Exception):
+            print(f"导入想法时出错: {result}")
+            self.import_label.setText(f"导入失败: {result}")
+            return
+        
+        seconds = max(result['seconds'], 1e-6)
+        status = "已完成" if result['finished'] else "已暂停（再次导入同一文件会继续）"
+        self.import_label.setText(
+            f"导入{status}：本次导入 {result['imported']} 条想法（{result['imported'] / seconds:.0f} 条/秒），"
+            f"跳过 {result['skipped']} 条无效记录"
+        )
+
+    def done(self, result):
+        """关闭对话框时停止后台导入，之后可以继续"""
+        self.import_stop.set()
+        super().done(result)
+
+    def create_usage_tab(self):
+        """创建token用量统计选项卡"""
+        usage_tab = QWidget()
+        usage_layout = QVBoxLayout(usage_tab)
+        
+        range_layout = QHBoxLayout()
+        range_layout.addWidget(QLabel("统计范围:"))
+        self.usage_range_combo = QComboBox()
+        self.usage_range_combo.addItems(["今天", "最近7天", "最近30天"])
+        self.usage_range_combo.currentIndexChanged.connect(self.update_usage_table)
+        range_layout.addWidget(self.usage_range_combo)
+        range_layout.addStretch()
+        usage_layout.addLayout(range_layout)
+        
+        self.usage_table = QTableWidget()
+        self.usage_table.setColumnCount(5)
+        self.usage_table.setHorizontalHeaderLabels(["任务", "调用次数", "提示词", "生成", "合计"])
+        self.usage_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.usage_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        usage_layout.addWidget(self.usage_table)
+        
+        # 内容压缩的统计需要解压全部压缩内容，点击按钮时才计算
+        storage_layout = QHBoxLayout()
+        self.storage_stats_label = QLabel("")
+        storage_layout.addWidget(self.storage_stats_label)
+        storage_layout.addStretch()
+        storage_button = QPushButton("统计压缩效果")
+        storage_button.clicked.connect(self.update_storage_stats)
+        storage_layout.addWidget(storage_button)
+        usage_layout.addLayout(storage_layout)
+        
+        self.update_usage_table()
+        return usage_tab
+
+    def update_usage_table(self):
+        """刷新token用量表格"""
+        days = [1, 7, 30][self.usage_range_combo.currentIndex()]
+        try:
+            usage = self.idea_manager.get_token_usage(days)
+        except Exception as e:
+            print(f"获取token用量时出错: {e}")
+            usage = []
+        
+        self.usage_table.setRowCount(0)
+        for i, item in enumerate(usage):
+            self.usage_table.insertRow(i)
+            values = [
+                TASK_DISPLAY_NAMES.get(item['task'], item['task']),
+                item['calls'],
+                item['prompt_tokens'],
+                item['completion_tokens'],
+                item['total_tokens']
+            ]
+            for column, value in enumerate(values):
+                self.usage_table.setItem(i, column, QTableWidgetItem(str(value)))
+
+    def update_storage_stats(self):
+        """统计内容压缩节省的空间和解压开销"""
+        try:
+            stats = self.idea_manager.get_compression_stats()
+        except Exception as e:
+            print(f"统计内容压缩时出错: {e}")
+            return
+        
+        self.storage_stats_label.setText(
+            f"{stats['compressed_rows']}/{stats['rows']} 条想法压缩保存，"
+            f"内容 {stats['raw_bytes'] / 1048576:.1f} MB → {stats['stored_bytes'] / 1048576:.1f} MB"
+            f"（节省 {stats['saved_bytes'] / 1048576:.1f} MB），"
+            f"平均每条解压 {stats['decode_ms_per_row']:.2f} ms"
+        )
+
     def toggle_api_visibility(self, state):
         """切换API密钥显示模式"""
         if state == Qt.CheckState.Checked:
@@ -148,13 +485,19 @@ class SettingsUI(QDialog):
         try:
             # 更新配置
             self.config['openai_api_key'] = self.api_edit.text()
+            self.config['api_base'] = self.api_base_edit.text().strip() or 'http://127.0.0.1:1234/v1'
             self.config['theme'] = 'light' if self.theme_combo.currentIndex() == 0 else 'dark'
             self.config['enable_animations'] = self.animation_checkbox.isChecked()
             self.config['ai_model'] = self.model_combo.currentText()
             self.config['enable_auto_analyze'] = self.auto_analyze_checkbox.isChecked()
+            self.config['daily_token_cap'] = self.batch_cap_spin.value()
+            self.config['daily_chat_token_cap'] = self.chat_cap_spin.value()
+            self.config['compress_threshold'] = self.compress_spin.value() * 1024
+            self.config['backup_interval_hours'] = self.backup_interval_spin.value()
+            self.config['backup_keep'] = self.backup_keep_spin.value()
             
-            # 保存到文件
-            self.config_manager.write_config(self.config)
+            # 保存到文件，并通知各组件配置已变化
+            self.config_service.update(self.config)
             
             # 关闭对话框
             self.accept()
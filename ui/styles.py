@@ -1,12 +1,26 @@
+from functools import lru_cache
 from PyQt6.QtWidgets import QApplication
-from utils.config_manager import ConfigManager
+from utils.config_service import ConfigService
 
 
-def get_style_sheet():
-    """获取应用样式表"""
-    config = ConfigManager().read_config()
-    theme = config.get('theme', 'light')
+def get_style_sheet(theme: str = None):
+    """
+    获取应用样式表
     
+    Args:
+        theme: 主题名，为None时使用当前配置的主题
+        
+    Returns:
+        样式表字符串，每个主题只构建一次
+    """
+    if theme is None:
+        theme = ConfigService.instance().get('theme', 'light')
+    return build_style_sheet(theme)
+
+
+@lru_cache(maxsize=None)
+def build_style_sheet(theme: str):
+    """构建指定主题的样式表"""
     # 通用样式
     common_style = """
     QWidget {
@@ -0,0 +1,104 @@
+# 文件位置：.\utils\config_service.py
+"""
+进程级配置服务，统一缓存配置并在配置变化时通知各组件。
+
+本文件主要实现以下功能：
+1. 只在启动和配置文件变化时解析一次配置文件，其余时间直接返回缓存的配置，避免各组件反复打开和解析 config.json。
+2. 通过 `QFileSystemWatcher` 监视配置文件，外部编辑配置文件后自动重新加载。
+3. 配置内容发生变化时发出 `config_changed` 信号，主题变化时额外发出 `theme_changed` 信号，组件据此刷新而不是轮询文件。
+
+需要导入的库：
+- `os`：用于处理配置文件路径。
+- `PyQt6.QtCore`：用于信号、文件监视和去抖定时器。
+- `utils.config_manager.ConfigManager`：底层的配置文件读写。
+
+类：
+- `ConfigService`: 配置服务（单例）。
+    - 类函数`instance(cls)`：获取进程内唯一的配置服务实例。
+    - 函数`config(self)`：返回缓存配置的副本。
+    - 函数`get(self, key, default)`：读取单个配置项。
+    - 函数`update(self, changes)`：合并修改并写入配置文件，内容有变化时发出信号。
+    - 函数`reload(self)`：重新读取配置文件，内容有变化时发出信号。
+"""
+import os
+from PyQt6.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+from utils.config_manager import ConfigManager
+
+
+class ConfigService(QObject):
+    # 配置内容变化，参数为新的配置字典
+    config_changed = pyqtSignal(dict)
+    # 主题变化，参数为新的主题名
+    theme_changed = pyqtSignal(str)
+
+    # 文件变化后等待的毫秒数，合并编辑器保存时的多次写入
+    RELOAD_DELAY_MS = 200
+
+    _instance = None
+
+    @classmethod
+    def instance(cls) -> 'ConfigService':
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        super().__init__()
+        self._manager = ConfigManager()
+        self._path = os.path.abspath(self._manager.config_file_path)
+        self._config = self._manager.read_config()
+
+        self._reload_timer = QTimer(self)
+        self._reload_timer.setSingleShot(True)
+        self._reload_timer.setInterval(self.RELOAD_DELAY_MS)
+        self._reload_timer.timeout.connect(self.reload)
+
+        # 同时监视目录，配置文件被编辑器替换或首次创建时也能收到通知
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_path_changed)
+        self._watcher.fileChanged.connect(self._on_path_changed)
+        self._watch()
+
+    def _watch(self):
+        directory = os.path.dirname(self._path)
+        if directory not in self._watcher.directories():
+            self._watcher.addPath(directory)
+        if os.path.exists(self._path) and self._path not in self._watcher.files():
+            self._watcher.addPath(self._path)
+
+    def _on_path_changed(self, path):
+        self._reload_timer.start()
+
+    def config(self) -> dict:
+        """获取缓存配置的副本"""
+        return dict(self._config)
+
+    def get(self, key, default=None):
+        """读取单个配置项"""
+        return self._config.get(key, default)
+
+    def update(self, changes: dict):
+        """
+        合并修改并写入配置文件
+
+        Args:
+            changes: 需要修改的配置项
+        """
+        new_config = dict(self._config)
+        new_config.update(changes)
+        self._manager.write_config(new_config)
+        self._apply(new_config)
+
+    def reload(self):
+        """重新读取配置文件"""
+        self._watch()
+        self._apply(self._manager.read_config())
+
+    def _apply(self, new_config: dict):
+        if new_config == self._config:
+            return
+        old_theme = self._config.get('theme', 'light')
+        self._config = new_config
+        self.config_changed.emit(self.config())
+        if new_config.get('theme', 'light') != old_theme:
+            self.theme_changed.emit(new_config.get('theme', 'light'))
@@ -0,0 +1,97 @@
+# 文件位置：.\utils\startup_check.py
+"""
+启动性能检查，在生成的测试数据库上运行 `main.py --startup-check`，首次绘制超出预算时返回非零退出码。
+
+本文件主要实现以下功能：
+1. 在临时目录中生成含指定数量想法的 `data/ideas.db` 和写有启动预算的 `config.json`。
+2. 在该目录下启动 `main.py --startup-check`（没有显示器时使用offscreen平台），转发其输出和退出码。
+
+build.bat 在打包前调用本检查，启动耗时回退时构建失败。用法：
+
+    python -m utils.startup_check                      # 20000条想法，预算1500毫秒
+    python -m utils.startup_check --ideas 50000 --budget-ms 2000
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import List, Optional
+
+# 项目根目录（main.py所在目录）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 生成测试数据时每个事务导入的想法数
+FIXTURE_BATCH = 5000
+# 测试数据中轮流使用的标签
+FIXTURE_TAGS = ["工作", "产品", "阅读", "生活", "灵感", "待办"]
+
+
+def build_fixture(directory: str, idea_count: int, budget_ms: int):
+    """在directory下生成含idea_count条想法的数据库和配置文件"""
+    from core.db_handler import DBHandler
+
+    with open(os.path.join(directory, 'config.json'), 'w', encoding='utf-8') as f:
+        json.dump({'startup_budget_ms': budget_ms}, f)
+
+    old_cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        db_handler = DBHandler()
+        try:
+            start = datetime.datetime(2020, 1, 1)
+            for first in range(0, idea_count, FIXTURE_BATCH):
+                items = [
+                    (f"测试想法 {i}：关于{FIXTURE_TAGS[i % len(FIXTURE_TAGS)]}的一些想法和计划。" * (1 + i % 5),
+                     (start + datetime.timedelta(minutes=i)).isoformat(),
+                     [FIXTURE_TAGS[i % len(FIXTURE_TAGS)]] if i % 3 else None,
+                     None)
+                    for i in range(first, min(first + FIXTURE_BATCH, idea_count))
+                ]
+                db_handler.import_ideas(items, 'startup_check', str(first + len(items)))
+        finally:
+            db_handler.close()
+    finally:
+        os.chdir(old_cwd)
+
+
+def run_check(directory: str, timeout: float, offscreen: bool) -> int:
+    """在directory下运行main.py --startup-check，返回其退出码（超时返回1）"""
+    env = dict(os.environ)
+    if offscreen:
+        env['QT_QPA_PLATFORM'] = 'offscreen'
+    try:
+        return subprocess.run(
+            [sys.executable, os.path.join(ROOT_DIR, 'main.py'), '--startup-check'],
+            cwd=directory, env=env, timeout=timeout
+        ).returncode
+    except subprocess.TimeoutExpired:
+        print(f"启动检查在 {timeout:.0f} 秒内没有完成")
+        return 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.startup_check", description="检查启动耗时是否超出预算")
+    parser.add_argument('--ideas', type=int, default=20000, help="测试数据库中的想法数")
+    parser.add_argument('--budget-ms', type=int, default=1500, help="启动预算（毫秒）")
+    parser.add_argument('--timeout', type=float, default=120, help="等待程序启动的最长秒数")
+    parser.add_argument('--offscreen', action='store_true',
+                        help="不显示窗口（没有显示器的Linux环境下自动启用）")
+    args = parser.parse_args(argv)
+
+    offscreen = args.offscreen or (sys.platform.startswith('linux') and not os.environ.get('DISPLAY')
+                                   and not os.environ.get('WAYLAND_DISPLAY'))
+    directory = tempfile.mkdtemp(prefix="ideaSystemXS-startup-")
+    try:
+        build_fixture(directory, args.ideas, args.budget_ms)
+        code = run_check(directory, args.timeout, offscreen)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    print("启动检查通过" if code == 0 else "启动检查未通过")
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,37 @@
+# 文件位置：.\utils\startup_timer.py
+"""
+启动耗时测量模块，记录从进程启动到主窗口首次绘制（time to first paint）的时间。
+
+本文件主要实现以下功能：
+1. 在应用上安装事件过滤器，捕获主窗口或其子部件收到的第一个绘制事件。
+2. 计算从进程启动到首次绘制的耗时，并通过回调交给调用方处理（打印、与预算比较等）。
+
+需要导入的库：
+- `time`：用于获取高精度计时。
+- `PyQt6.QtCore`：用于事件过滤。
+
+类：
+- `FirstPaintTimer`: 首次绘制计时器。
+    - 构造函数`__init__(self, window, start_time, callback)`：安装事件过滤器，开始等待首次绘制。
+    - 函数`eventFilter(self, obj, event)`：收到主窗口内的第一个绘制事件后移除过滤器，调用回调并传入耗时（毫秒）。
+"""
+import time
+from PyQt6.QtCore import QObject, QEvent
+from PyQt6.QtWidgets import QApplication, QWidget
+
+
+class FirstPaintTimer(QObject):
+    def __init__(self, window: QWidget, start_time: float, callback):
+        super().__init__(window)
+        self.window = window
+        self.start_time = start_time
+        self.callback = callback
+        QApplication.instance().installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if (event.type() == QEvent.Type.Paint
+                and isinstance(obj, QWidget) and obj.window() is self.window):
+            QApplication.instance().removeEventFilter(self)
+            elapsed_ms = (time.perf_counter() - self.start_time) * 1000
+            self.callback(elapsed_ms)
+        return False